@@ -1,19 +1,42 @@
 # server.py — Game Hub WS Sunucusu (Pictionary + TTT + Codenames + PixelWar)
-import asyncio, json, secrets, random, re, os, math, time
+import asyncio, json, secrets, random, re, os, math, time, sys, logging, logging.config, contextlib
+import base64, struct, zlib, multiprocessing, mmap, bisect, pickle, sqlite3, signal, threading
+import socket, hashlib, subprocess, shutil, tempfile, argparse, urllib.parse, fcntl, glob
+from collections import deque
+from array import array
+from concurrent.futures import ProcessPoolExecutor
 from typing import Dict
 from datetime import datetime
 
+import numpy as np
+import uvicorn
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 
-app = FastAPI()
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    """Açılış ve kapanış sırası (adımlar kendi bölümlerinde tanımlı)."""
+    timer_start()               # çark: aşağıdaki her adım timer_after kullanır
+    await bp_startup()          # yayın arka düzlemi
+    await ckpt_startup()        # odalar geri yüklenir
+    await hub_worker_startup()  # yönlendiricinin devrettiği bağlantılar ancak şimdi kabul edilir
+    yield
+    await ckpt_shutdown()       # son durum, tuvaller ve çark kapanmadan yazılır
+    await pixel_canvas_shutdown()
+    cpu_pool_shutdown()
+    timer_stop()
+
+app = FastAPI(lifespan=lifespan)
 app.add_middleware(CORSMMiddleware := CORSMiddleware,
                    allow_origins=["*"],
                    allow_headers=["*"],
                    allow_methods=["*"])
 
+# uvicorn'un hata günlüğü (seviye / biçim uvicorn ayarlarından gelir)
+log = logging.getLogger("uvicorn.error")
+
 # ====== Pictionary ======
 pic_rooms: Dict[str, dict] = {}
 
@@ -22,6 +45,7 @@ cn_rooms: Dict[str, dict] = {}
 
 # ====== Tic Tac Toe ======
 ttt_rooms: Dict[str, dict] = {}
+ttt_tours: Dict[str, dict] = {}
 
 # ====== Pixelwar ======
 pixel_rooms: Dict[str, dict] = {}
@@ -30,6 +54,541 @@ pixel_rooms: Dict[str, dict] = {}
 sumo_rooms: Dict[str, dict] = {}
 spyfall_rooms: Dict[str, dict] = {}
 
+# ==========================
+# Ortak yayın (fan-out) motoru
+# ==========================
+# Tüm oyunların broadcast yardımcıları buraya gelir: payload bir kez encode edilir,
+# alıcılara eşzamanlı gönderilir; yavaş istemci tüm odayı bekletmez.
+FANOUT_SEND_TIMEOUT = 2.0   # tek bir send_text için saniye
+FANOUT_MAX_STRIKES = 3      # üst üste bu kadar timeout -> istemci odadan atılır
+
+def fanout_encode(payload) -> str | bytes:
+    return payload if isinstance(payload, (str, bytes)) else json.dumps(payload)
+
+async def fanout_send_one(ws, msg: str | bytes) -> bool:
+    """Tek istemciye zaman aşımıyla gönderir; istemci ölü sayılacaksa False döner.
+    bytes mesajlar ikili (binary) frame olarak gider."""
+    send = ws.send_bytes(msg) if isinstance(msg, bytes) else ws.send_text(msg)
+    try:
+        await asyncio.wait_for(send, FANOUT_SEND_TIMEOUT)
+    except asyncio.TimeoutError:
+        strikes = getattr(ws, "fanout_strikes", 0) + 1
+        ws.fanout_strikes = strikes
+        if strikes < FANOUT_MAX_STRIKES:
+            return True
+        try:
+            asyncio.create_task(ws.close())
+        except Exception:
+            pass
+        return False
+    except Exception:
+        return False
+    ws.fanout_strikes = 0
+    return True
+
+# ---- Bağlantı başına giden kuyruk (outbox) ----
+# "state" sınıfı mesajlar birleşir (kuyrukta en fazla bir tane, hep en yenisi),
+# "event" sınıfı mesajlar (chat, info, round_end...) sırasını korur.
+# "snapshot" sınıfı event gibi sıralanır; kuyruk taşıp düşerse outbox bunu
+# işaretler (snapshot_lost) ki oyun sonraki gönderimde tam state'i yenilesin.
+# Oturumlu (resume jetonu verilmiş) bağlantıda kuyruk soketten bağımsızdır:
+# soket düşünce yazıcı durur ama kuyruk dolmaya devam eder, yazılan mesajlar
+# sıra numarasıyla halkaya (ring) girer; yeni soket gelince eksikler oradan gider.
+OUTBOX_MAX = 256
+outboxes: Dict[int, dict] = {}   # id(ws) -> outbox
+
+def outbox_open(ws, pid=None) -> dict:
+    ob = {
+        "pid": pid,
+        "queue": deque(),       # [sınıf, mesaj] girdileri
+        "state_entry": None,    # kuyruktaki bekleyen state girdisi
+        "wake": asyncio.Event(),
+        "dead": False,
+        "max_depth": 0,
+        "sent": 0,
+        "coalesced": 0,
+        "dropped": 0,
+        "sock": ws,             # mesajların yazıldığı gerçek soket (resume'da değişir)
+        "session": None,
+        "ring": None,           # oturumluysa: yazılmış son SESSION_RING girdi
+        "seq": 0,               # "session" mesajından bu yana yazılan mesaj sayısı
+        "detached": False,      # soket yok, kuyruk bekliyor
+        "lossy": False,         # kopukken kuyruktan mesaj düştü -> replay yetmez
+        "snapshot_lost": False, # "snapshot" sınıfı bir girdi taşmada düştü
+    }
+    ob["task"] = asyncio.create_task(outbox_writer(ob))
+    ws.outbox = ob
+    outboxes[id(ws)] = ob
+    return ob
+
+def outbox_close(ws):
+    ob = outboxes.pop(id(ws), None)
+    if ob:
+        ob["dead"] = True
+        ob["task"].cancel()
+
+def outbox_push(ws, msg: str, cls: str = "event") -> bool:
+    """Mesajı kuyruğa koyar; bağlantı ölmüşse False döner."""
+    ob = getattr(ws, "outbox", None)
+    if ob is None or ob["dead"]:
+        return False
+    q = ob["queue"]
+    if cls == "state" and ob["state_entry"] is not None:
+        # latest-wins: bekleyen eski snapshot atılır, yenisi sona eklenir
+        # (arada kuyruğa girmiş event'lerden sonra gitsin diye)
+        q.remove(ob["state_entry"])
+        ob["state_entry"] = None
+        ob["coalesced"] += 1
+    if len(q) >= OUTBOX_MAX:
+        old = q.popleft()
+        if old is ob["state_entry"]:
+            ob["state_entry"] = None
+        if old[0] == "snapshot":
+            ob["snapshot_lost"] = True
+        ob["dropped"] += 1
+        if ob["detached"]:
+            ob["lossy"] = True
+    entry = [cls, msg]
+    q.append(entry)
+    if cls == "state":
+        ob["state_entry"] = entry
+    ob["max_depth"] = max(ob["max_depth"], len(q))
+    ob["wake"].set()
+    return True
+
+async def outbox_writer(ob):
+    q = ob["queue"]
+    while True:
+        if not q:
+            ob["wake"].clear()
+            await ob["wake"].wait()
+            continue
+        entry = q.popleft()
+        if entry is ob["state_entry"]:
+            ob["state_entry"] = None
+        if not await fanout_send_one(ob["sock"], entry[1]):
+            if ob["session"] is not None:
+                # oturum sürüyor: mesaj kaybolmaz, yeni soketle ilk o gider
+                if entry[0] != "state" or ob["state_entry"] is None:
+                    q.appendleft(entry)
+                    if entry[0] == "state":
+                        ob["state_entry"] = entry
+                ob["detached"] = True
+                return
+            ob["dead"] = True
+            q.clear()
+            return
+        ob["sent"] += 1
+        if ob["ring"] is not None:
+            if entry[0] == "session":
+                ob["ring"].clear()
+                ob["seq"] = 0
+            else:
+                ob["ring"].append(entry)
+                ob["seq"] += 1
+
+def outbox_stats() -> list:
+    return [{"pid": ob["pid"], "depth": len(ob["queue"]), "maxDepth": ob["max_depth"], "sent": ob["sent"],
+             "coalesced": ob["coalesced"], "dropped": ob["dropped"], "dead": ob["dead"],
+             "seq": ob["seq"], "detached": ob["detached"]}
+            for ob in list(outboxes.values())]
+
+def fanout_record(room: dict, n: int, started: float):
+    ms = (time.perf_counter() - started) * 1000.0
+    st = room.setdefault("fanout_stats", {"sends": 0, "msgs": 0, "last_ms": 0.0, "avg_ms": 0.0, "max_ms": 0.0, "evicted": 0})
+    st["sends"] += 1
+    st["msgs"] += n
+    st["last_ms"] = round(ms, 3)
+    st["avg_ms"] = round(ms if st["sends"] == 1 else st["avg_ms"] * 0.9 + ms * 0.1, 3)
+    st["max_ms"] = max(st["max_ms"], st["last_ms"])
+
+async def fanout_many(room: dict, pairs, cls: str = "event") -> list:
+    """(ws, payload) çiftlerini eşzamanlı gönderir, atılması gereken ws listesini döner.
+    Outbox'ı olan bağlantılarda gönderim kuyruğa bırakılır (bekleme yok)."""
+    pairs = [(ws, fanout_encode(p)) for ws, p in pairs if ws is not None]
+    if not pairs:
+        return []
+    started = time.perf_counter()
+    dead, direct = [], []
+    for ws, msg in pairs:
+        if getattr(ws, "outbox", None) is None:
+            direct.append((ws, msg))
+        elif not outbox_push(ws, msg, cls):
+            dead.append(ws)
+    if direct:
+        results = await asyncio.gather(*(fanout_send_one(ws, msg) for ws, msg in direct))
+        dead += [ws for (ws, _), ok in zip(direct, results) if not ok]
+    fanout_record(room, len(pairs), started)
+    if dead:
+        room["fanout_stats"]["evicted"] += len(dead)
+    return dead
+
+async def fanout_broadcast(room: dict, sockets, payload, cls: str = "event") -> list:
+    """Aynı payload'ı tüm soketlere yollar (json.dumps sadece bir kez)."""
+    msg = fanout_encode(payload)
+    return await fanout_many(room, [(ws, msg) for ws in list(sockets)], cls)
+
+# ==========================
+# Yayın arka düzlemi (pub/sub: süreçler arası oda yayınları)
+# ==========================
+# Üyeleri birden çok worker'a dağılmış odalarda (ör. büyük Pixel War tuvali)
+# yayın bir konuya ("oyun/oda") süreç başına bir kez yayınlanır; her süreç
+# kendi yerel soketlerine kendisi dağıtır (yayınlayan süreç dahil). Gerçekleme
+# BACKPLANE ile seçilir:
+#  - "local": tek süreç; yayın yalnızca bu süreçteki abonelere gider.
+#  - "unix" : worker'lar arası unix soket ağı (aracı yok). Her worker diğer her
+#    birine tek bir akış açar; olay döngüsü turu boyunca biriken yayınlar tek
+#    frame'de gider (batch). Akış sırayı koruduğundan aynı yayıncının aynı
+#    konudaki mesajları yayınlandığı sırayla teslim edilir. Alıcı, abonesi
+#    olmayan konuları atar.
+# Boşsa: çok süreçli dağıtımda "unix", değilse "local".
+BACKPLANE = os.environ.get("BACKPLANE", "")
+BP_BATCH_BYTES = 256 * 1024         # bekleyen yayın bu boyu aşınca tur beklenmeden gider
+BP_PEER_BUFFER = 8 * 1024 * 1024    # yetişemeyen komşu için biriken üst sınır (aşınca batch düşer)
+BP_FRAME = struct.Struct("<I")          # frame boyu
+BP_BATCH_HEAD = struct.Struct("<dI")    # batch'teki ilk yayının zamanı, girdi sayısı
+BP_ENTRY_HEAD = struct.Struct("<HIB")   # konu boyu, mesaj boyu, ikili mi
+
+bp = {"impl": "local", "subs": {}, "pending": [], "pending_bytes": 0, "first_at": 0.0, "scheduled": False,
+      "peers": {}, "server": None, "timer": None, "last": (0, 0)}
+bp_stats = {"published": 0, "batches": 0, "bytes_out": 0, "delivered": 0, "received": 0, "batches_in": 0,
+            "bytes_in": 0, "unrouted": 0, "dropped": 0, "lat_avg_ms": 0.0, "lat_max_ms": 0.0,
+            "rate_pub": 0.0, "rate_in": 0.0}
+
+def bp_subscribe(topic: str, fn):
+    """fn(topic, msg) bu süreçte konunun her yayını için çağrılır (coroutine dönerse görev olur)."""
+    bp["subs"].setdefault(topic, []).append(fn)
+
+def bp_unsubscribe(topic: str, fn):
+    subs = bp["subs"].get(topic)
+    if subs and fn in subs:
+        subs.remove(fn)
+        if not subs:
+            del bp["subs"][topic]
+
+def bp_publish(topic: str, msg: str | bytes):
+    if not bp["pending"]:
+        bp["first_at"] = time.time()
+    bp["pending"].append((topic, msg))
+    bp["pending_bytes"] += len(msg)
+    bp_stats["published"] += 1
+    if bp["pending_bytes"] >= BP_BATCH_BYTES:
+        bp_flush()
+    elif not bp["scheduled"]:
+        bp["scheduled"] = True
+        asyncio.get_running_loop().call_soon(bp_flush)
+
+def bp_flush():
+    bp["scheduled"] = False
+    batch, bp["pending"] = bp["pending"], []
+    if not batch:
+        return
+    bp["pending_bytes"] = 0
+    BACKPLANES[bp["impl"]][1](batch, bp["first_at"])
+    bp_stats["batches"] += 1
+    bp_latency(bp["first_at"])
+    bp_deliver(batch)
+
+def bp_deliver(batch):
+    subs = bp["subs"]
+    for topic, msg in batch:
+        fns = subs.get(topic)
+        if not fns:
+            bp_stats["unrouted"] += 1
+            continue
+        for fn in list(fns):
+            r = fn(topic, msg)
+            if asyncio.iscoroutine(r):
+                # görevler oluşturulma sırasıyla başlar: yerel kuyruklara sıra korunarak girer
+                asyncio.create_task(r)
+        bp_stats["delivered"] += 1
+
+def bp_latency(first_at: float):
+    ms = (time.time() - first_at) * 1000.0
+    n = bp_stats["batches"] + bp_stats["batches_in"]
+    bp_stats["lat_avg_ms"] = round(ms if n <= 1 else bp_stats["lat_avg_ms"] * 0.95 + ms * 0.05, 3)
+    bp_stats["lat_max_ms"] = max(bp_stats["lat_max_ms"], round(ms, 3))
+
+async def bp_tick():
+    bp["timer"] = timer_after(1.0, bp_tick)
+    now = (bp_stats["published"], bp_stats["received"])
+    bp_stats["rate_pub"], bp_stats["rate_in"] = now[0] - bp["last"][0], now[1] - bp["last"][1]
+    bp["last"] = now
+
+# ---- "local" ----
+async def bp_local_start():
+    pass
+
+def bp_local_send(batch, first_at):
+    pass
+
+# ---- "unix" ----
+def bp_encode(batch, first_at: float) -> bytes:
+    parts = [BP_BATCH_HEAD.pack(first_at, len(batch))]
+    for topic, msg in batch:
+        t = topic.encode()
+        binary = isinstance(msg, bytes)
+        m = msg if binary else msg.encode()
+        parts += (BP_ENTRY_HEAD.pack(len(t), len(m), binary), t, m)
+    body = b"".join(parts)
+    return BP_FRAME.pack(len(body)) + body
+
+def bp_decode(body: bytes):
+    first_at, n = BP_BATCH_HEAD.unpack_from(body)
+    off = BP_BATCH_HEAD.size
+    batch = []
+    for _ in range(n):
+        tlen, mlen, binary = BP_ENTRY_HEAD.unpack_from(body, off)
+        off += BP_ENTRY_HEAD.size
+        topic = body[off:off + tlen].decode()
+        msg = body[off + tlen:off + tlen + mlen]
+        off += tlen + mlen
+        batch.append((topic, msg if binary else msg.decode()))
+    return first_at, batch
+
+def bp_unix_send(batch, first_at):
+    frame = None
+    for peer in bp["peers"].values():
+        writer = peer["writer"]
+        if writer is None or writer.is_closing():
+            continue
+        if writer.transport.get_write_buffer_size() > BP_PEER_BUFFER:
+            peer["dropped"] += len(batch)
+            bp_stats["dropped"] += len(batch)
+            continue
+        frame = frame or bp_encode(batch, first_at)     # tüm komşulara aynı baytlar
+        writer.write(frame)
+        peer["sent"] += len(batch)
+        bp_stats["bytes_out"] += len(frame)
+
+async def bp_unix_inbound(reader, writer):
+    try:
+        while True:
+            n = BP_FRAME.unpack(await reader.readexactly(BP_FRAME.size))[0]
+            first_at, batch = bp_decode(await reader.readexactly(n))
+            bp_stats["batches_in"] += 1
+            bp_stats["bytes_in"] += BP_FRAME.size + n
+            bp_stats["received"] += len(batch)
+            bp_latency(first_at)
+            bp_deliver(batch)
+    except (asyncio.IncompleteReadError, OSError, asyncio.CancelledError):
+        pass    # komşu koptu / kapanış (iptal sessiz biter: sunucu geri çağrısı hata basmasın)
+    finally:
+        writer.close()
+
+async def bp_unix_link(shard: int):
+    """Komşuya giden akış; komşu ölüp yeniden başlarsa yeniden bağlanır."""
+    peer = bp["peers"][shard]
+    while True:
+        try:
+            reader, writer = await asyncio.open_unix_connection(hub_path(shard, "bp"))
+        except OSError:
+            await asyncio.sleep(0.2)
+            continue
+        peer["writer"] = writer
+        peer["connects"] += 1
+        try:
+            await reader.read()     # komşu bu akışa yazmaz: dönüş = koptu
+        except OSError:
+            pass
+        peer["writer"] = None
+        writer.close()
+
+async def bp_unix_start():
+    bp["server"] = await asyncio.start_unix_server(bp_unix_inbound, hub_path(hub["shard"], "bp"))
+    for shard in range(hub["shards"]):
+        if shard != hub["shard"]:
+            bp["peers"][shard] = {"writer": None, "sent": 0, "dropped": 0, "connects": 0}
+            asyncio.create_task(bp_unix_link(shard))
+
+# ad -> (başlat, batch'i diğer süreçlere gönder)
+BACKPLANES = {
+    "local": (bp_local_start, bp_local_send),
+    "unix": (bp_unix_start, bp_unix_send),
+}
+
+async def bp_startup():
+    multi = hub["dir"] is not None and hub["shards"] > 1
+    bp["impl"] = BACKPLANE if BACKPLANE and (multi or BACKPLANE == "local") else ("unix" if multi else "local")
+    await BACKPLANES[bp["impl"]][0]()
+    bp["timer"] = timer_after(1.0, bp_tick)
+
+def bp_view() -> dict:
+    return dict(bp_stats, impl=bp["impl"], topics=len(bp["subs"]),
+                peers={shard: {"connected": p["writer"] is not None, "sent": p["sent"], "dropped": p["dropped"],
+                               "connects": p["connects"]} for shard, p in bp["peers"].items()})
+
+# ==========================
+# Worker havuzu (CPU ağırlıklı işler event loop dışında)
+# ==========================
+CPU_WORKERS = max(1, min(4, (os.cpu_count() or 2) - 1))
+_cpu_pool = None
+
+def cpu_pool():
+    global _cpu_pool
+    if _cpu_pool is None:
+        # spawn: çalışan event loop'u / thread'leri fork'lamamak için
+        _cpu_pool = ProcessPoolExecutor(max_workers=CPU_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _cpu_pool
+
+async def run_cpu(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(cpu_pool(), fn, *args)
+
+def cpu_pool_shutdown():
+    global _cpu_pool
+    if _cpu_pool is not None:
+        _cpu_pool.shutdown(cancel_futures=True)
+        _cpu_pool = None
+
+# ==========================
+# Zamanlayıcı çarkı (tüm oda geri sayımları için tek süreç geneli)
+# ==========================
+# Hiyerarşik timer wheel: 3 seviye x 64 slot, TIMER_TICK çözünürlük
+# (seviye 0: 6.4 s, seviye 1: ~7 dk, seviye 2: ~7.3 saat, ötesi overflow).
+# Tek bir sürücü görev her tick'te süresi dolanları toplu çalıştırır; async
+# callback'ler tick başına tek bir gather görevinde birleşir, böylece aynı
+# saniyede düşen yüzlerce odanın tick yayını tek partide gider.
+TIMER_TICK = 0.1
+TIMER_SLOTS = 64
+TIMER_LEVELS = 3
+
+timer_wheel = {
+    "levels": [[[] for _ in range(TIMER_SLOTS)] for _ in range(TIMER_LEVELS)],
+    "overflow": [],
+    "now": 0,           # işlenmiş son tick
+    "start": None,      # tick 0'ın loop zamanı
+    "pending": 0,
+    "fired": 0,
+    "batches": 0,
+    "task": None,
+    "wake": None,
+}
+
+def timer_place(entry):
+    tw = timer_wheel
+    delta = entry[0] - tw["now"]
+    if delta <= 0:
+        delta, entry[0] = 1, tw["now"] + 1
+    for lvl in range(TIMER_LEVELS):
+        if delta < TIMER_SLOTS ** (lvl + 1):
+            tw["levels"][lvl][(entry[0] // TIMER_SLOTS ** lvl) % TIMER_SLOTS].append(entry)
+            return
+    tw["overflow"].append(entry)
+
+def timer_start():
+    """Sürücü görevi bu loop'ta başlat (çalışıyorsa bir şey yapmaz)."""
+    tw = timer_wheel
+    if tw["task"] is None or tw["task"].done():
+        tw["start"] = asyncio.get_running_loop().time() - tw["now"] * TIMER_TICK
+        tw["wake"] = asyncio.Event()
+        tw["task"] = asyncio.create_task(timer_driver())
+
+def timer_stop():
+    if timer_wheel["task"] is not None:
+        timer_wheel["task"].cancel()
+        timer_wheel["task"] = None
+
+def timer_at(when, fn, *args):
+    """Loop zamanı `when` anında fn(*args) çalıştırır; iptal için handle döner.
+    fn async ise coroutine'i tick partisine eklenir."""
+    tw = timer_wheel
+    timer_start()     # app dışında (testler, ölçüm betikleri) ilk timer sürücüyü başlatır
+    tick = math.ceil((when - tw["start"]) / TIMER_TICK - 1e-9)
+    entry = [tick, fn, args, True]
+    timer_place(entry)
+    tw["pending"] += 1
+    tw["wake"].set()
+    return entry
+
+def timer_after(delay, fn, *args):
+    return timer_at(asyncio.get_running_loop().time() + delay, fn, *args)
+
+def timer_cancel(entry):
+    if entry and entry[3]:
+        entry[3] = False
+        timer_wheel["pending"] -= 1
+
+def timer_left(entry):
+    """Canlı zamanlayıcının kalan süresi (s); yoksa / iptal edildiyse None."""
+    if not entry or not entry[3]:
+        return None
+    return max(0.0, (entry[0] - timer_wheel["now"]) * TIMER_TICK)
+
+def timer_advance():
+    """Bir tick ilerler, süresi dolan (canlı) girdileri döner."""
+    tw = timer_wheel
+    tw["now"] += 1
+    now = tw["now"]
+    if now % TIMER_SLOTS == 0:
+        # üst seviyelerden aşağı kaydır (en üstten başlayarak)
+        for lvl in range(TIMER_LEVELS - 1, 0, -1):
+            span = TIMER_SLOTS ** lvl
+            if now % span:
+                continue
+            if lvl == TIMER_LEVELS - 1 and (now // span) % TIMER_SLOTS == 0:
+                over, tw["overflow"] = tw["overflow"], []
+                for e in over:
+                    if e[3]:
+                        timer_place(e)
+            slot = tw["levels"][lvl][(now // span) % TIMER_SLOTS]
+            tw["levels"][lvl][(now // span) % TIMER_SLOTS] = []
+            for e in slot:
+                if e[3]:
+                    timer_place(e)
+    slot = tw["levels"][0][now % TIMER_SLOTS]
+    tw["levels"][0][now % TIMER_SLOTS] = []
+    due = []
+    for e in slot:
+        if not e[3]:
+            continue
+        if e[0] > now:
+            timer_place(e)
+        else:
+            due.append(e)
+    return due
+
+async def timer_driver():
+    tw = timer_wheel
+    loop = asyncio.get_running_loop()
+    while True:
+        if tw["pending"] <= 0:
+            # boşta: uyuyan tick yok, yeni timer gelince uyan
+            tw["wake"].clear()
+            await tw["wake"].wait()
+            continue
+        target = int((loop.time() - tw["start"]) / TIMER_TICK)
+        if target <= tw["now"]:
+            await asyncio.sleep(tw["start"] + (tw["now"] + 1) * TIMER_TICK - loop.time())
+            continue
+        coros = []
+        while tw["now"] < target:
+            for e in timer_advance():
+                e[3] = False
+                tw["pending"] -= 1
+                tw["fired"] += 1
+                try:
+                    r = e[1](*e[2])
+                except Exception:
+                    continue
+                if asyncio.iscoroutine(r):
+                    coros.append(r)
+        if coros:
+            tw["batches"] += 1
+            asyncio.create_task(timer_run_batch(coros))
+
+async def timer_run_batch(coros):
+    await asyncio.gather(*coros, return_exceptions=True)
+
+def timer_stats() -> dict:
+    tw = timer_wheel
+    return {
+        "pending": tw["pending"],
+        "fired": tw["fired"],
+        "batches": tw["batches"],
+        "perLevel": [sum(1 for slot in lvl for e in slot if e[3]) for lvl in tw["levels"]],
+        "overflow": sum(1 for e in tw["overflow"] if e[3]),
+    }
+
 # ==========================
 # Pictionary (çok odalı)
 # ==========================
@@ -52,16 +611,20 @@ def mask_word(w):
     return " ".join(["_" if ch != " " else " " for ch in w])
 
 async def ws_send(ws, payload):
-    await ws.send_text(json.dumps(payload))
+    msg = fanout_encode(payload)
+    if getattr(ws, "outbox", None) is not None:
+        outbox_push(ws, msg)
+        return
+    await (ws.send_bytes(msg) if isinstance(msg, bytes) else ws.send_text(msg))
 
-async def pic_broadcast(room, payload):
-    msg = json.dumps(payload)
-    dead = []
-    for ws in list(room["clients"]):
-        try:
-            await ws.send_text(msg)
-        except Exception:
-            dead.append(ws)
+async def ws_close(ws):
+    """Bağlantıyı kapatır; oturumlu bağlantıda o an bağlı olan soketi."""
+    ob = getattr(ws, "outbox", None)
+    await (ob["sock"] if ob else ws).close()
+
+async def pic_broadcast(room, payload, sockets=None):
+    ckpt_touch(room)
+    dead = await fanout_broadcast(room, room["clients"] if sockets is None else sockets, payload)
     for ws in dead:
         room["clients"].discard(ws)
         pid = getattr(ws, "state_pid", None)
@@ -83,7 +646,10 @@ def pic_room(room_id):
             "strokes": [],
             "started": False,
             "seconds_left": 0,
-            "round_task": None,
+            "phase": "idle",        # idle / choosing / drawing / intermission
+            "timer": None,          # fazın tek zamanlanmış deadline'ı
+            "timer_gen": 0,         # iptal edilen/eskimiş deadline'ları ayırt eder
+            "deadline": None,
             "password": None,
             "invite_key": None,
             # yeni alanlar
@@ -91,9 +657,377 @@ def pic_room(room_id):
             "total_rounds": PIC_TOTAL_ROUNDS,
             "hint_mask": None,
             "hint_used": False,
+            # sürümlü senkron: her değişiklik version'ı artırır,
+            # stroke id'si = eklendiği version
+            "version": 0,
+            "ops": [],              # (version, "del", stroke_id) / (version, "clear", None)
+            "scalars": None,        # son gönderilen skaler alanlar
+            "field_ver": {},        # alan -> son değiştiği version
+            "pen": None,            # çizenin o an açık (pen-down) stroke'u
+            "raster": pic_new_raster(),
         }
     return pic_rooms[room_id]
 
+# ---- Kompakt stroke codec ----
+# Bir stroke = bir pen-down: {"id", "ver", "c", "w", "p"}; "p" tamsayı piksel
+# koordinatlarının delta kodlu düz listesi [x0, y0, dx1, dy1, dx2, dy2, ...].
+# "ver" stroke'un son değiştiği version'dır (pen_move ile uzadıkça artar).
+PIC_STROKE_MAX_POINTS = 4096
+PIC_MOVE_MAX_VALUES = 512     # tek pen_move mesajındaki en fazla değer
+PIC_SIMPLIFY_EPS = 0.75       # pen_up'ta Douglas-Peucker toleransı (px), 0 = kapalı
+PIC_MAX_WIDTH = 64
+
+def pic_decode_points(p):
+    pts = []
+    x = y = 0
+    for i in range(0, len(p) - 1, 2):
+        x += p[i]
+        y += p[i + 1]
+        pts.append((x, y))
+    return pts
+
+def pic_encode_points(pts):
+    out = []
+    px = py = 0
+    for x, y in pts:
+        out.append(x - px)
+        out.append(y - py)
+        px, py = x, y
+    return out
+
+def pic_simplify(pts, eps):
+    """Douglas-Peucker (özyinelemesiz); uç noktalar korunur."""
+    n = len(pts)
+    if n < 3 or eps <= 0:
+        return pts
+    keep = [False] * n
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    eps2 = eps * eps
+    while stack:
+        a, b = stack.pop()
+        ax, ay = pts[a]
+        bx, by = pts[b]
+        dx, dy = bx - ax, by - ay
+        ll = dx * dx + dy * dy
+        best, best_i = -1.0, -1
+        for i in range(a + 1, b):
+            x, y = pts[i]
+            if ll == 0:
+                d2 = (x - ax) ** 2 + (y - ay) ** 2
+            else:
+                cr = dx * (y - ay) - dy * (x - ax)
+                d2 = cr * cr / ll
+            if d2 > best:
+                best, best_i = d2, i
+        if best > eps2:
+            keep[best_i] = True
+            stack.append((a, best_i))
+            stack.append((best_i, b))
+    return [pt for pt, k in zip(pts, keep) if k]
+
+def pic_clean_style(w, c):
+    try:
+        w = max(1, min(PIC_MAX_WIDTH, int(round(float(w)))))
+    except (TypeError, ValueError):
+        w = 2
+    c = c if isinstance(c, str) and len(c) <= 16 else "#000"
+    return w, sys.intern(c)
+
+def pic_clean_deltas(p):
+    """pen_move'dan gelen delta listesini doğrular (çift uzunluk, tamsayı)."""
+    if not isinstance(p, list):
+        return None
+    p = p[:PIC_MOVE_MAX_VALUES]
+    if len(p) % 2:
+        p = p[:-1]
+    try:
+        return [int(round(float(v))) for v in p]
+    except (TypeError, ValueError):
+        return None
+
+def pic_add_stroke(room, x, y, w, c, deltas=()):
+    w, c = pic_clean_style(w, c)
+    room["version"] += 1
+    s = {"id": room["version"], "ver": room["version"], "c": c, "w": w,
+         "p": [int(round(float(x))), int(round(float(y)))] + list(deltas)}
+    room["strokes"].append(s)
+    return s
+
+def pic_extend_stroke(room, s, deltas):
+    if len(s["p"]) // 2 + len(deltas) // 2 > PIC_STROKE_MAX_POINTS:
+        return False
+    room["version"] += 1
+    s["ver"] = room["version"]
+    s["p"].extend(deltas)
+    return True
+
+def pic_finish_stroke(room):
+    # sadece depodaki kopya sadeleşir; canlı izleyen istemcinin çizimi aynı kalır
+    s = room.get("pen")
+    room["pen"] = None
+    if s and PIC_SIMPLIFY_EPS > 0 and len(s["p"]) > 4:
+        s["p"] = pic_encode_points(pic_simplify(pic_decode_points(s["p"]), PIC_SIMPLIFY_EPS))
+    pic_raster_maybe_bake(room)
+
+def pic_stroke_segments(s, start=0):
+    """Eski istemciler için stroke'u {x0,y0,x1,y1,w,c} segmentlerine açar."""
+    pts = pic_decode_points(s["p"])
+    if len(pts) == 1:
+        pts = pts * 2
+    return [{"x0": a[0], "y0": a[1], "x1": b[0], "y1": b[1], "w": s["w"], "c": s["c"]}
+            for a, b in zip(pts[max(0, start - 1):], pts[max(1, start):])]
+
+def pic_wire_strokes(room, poly):
+    if poly:
+        return room["strokes"]
+    return [seg for st in room["strokes"] for seg in pic_stroke_segments(st)]
+
+# ---- Sunucu tarafı raster ----
+# Eski stroke'lar palet indeksli bir bytearray'e (1 bayt/piksel) gömülür; geç
+# katılan istemci PNG + son PIC_RASTER_TAIL stroke'u alır. Geri alınabilecek
+# kuyruk her zaman raster dışında kalır, böylece undo raster'a dokunmaz.
+PIC_CANVAS_W, PIC_CANVAS_H = 800, 560
+PIC_RASTER_TAIL = 24          # raster'a gömülmeden tutulan son stroke sayısı
+PIC_RASTER_BATCH = 16         # bir seferde gömülen en az stroke sayısı
+
+def pic_new_raster():
+    return {
+        "buf": None,            # None = boş tuval
+        "upto": 0,              # room["strokes"][:upto] raster'da
+        "epoch": 0,             # clear / kuyruğu aşan undo'da artar
+        "busy": False,
+        "palette": [""],        # 0 = şeffaf arka plan
+        "png": None,            # (upto, base64 png)
+    }
+
+def pic_color_index(raster, c):
+    pal = raster["palette"]
+    try:
+        return pal.index(c)
+    except ValueError:
+        if len(pal) >= 256:
+            return 1
+        pal.append(c)
+        return len(pal) - 1
+
+def pic_hex_rgb(c):
+    c = c.lstrip("#")
+    if len(c) == 3:
+        c = "".join(ch * 2 for ch in c)
+    try:
+        return bytes.fromhex(c[:6].ljust(6, "0"))
+    except ValueError:
+        return b"\x00\x00\x00"
+
+def pic_rasterize(buf, w, h, strokes):
+    """strokes: [(renk indeksi, kalınlık, delta kodlu p)]; yeni buf döner (worker'da çalışır)."""
+    buf = bytearray(buf) if buf else bytearray(w * h)
+    for ci, width, p in strokes:
+        r = max(0.5, width / 2.0)
+        R = int(math.ceil(r))
+        spans = [(dy, int(math.sqrt(max(0.0, r * r - dy * dy)))) for dy in range(-R, R + 1)]
+        fill = bytes([ci]) * (2 * R + 1)
+        step = max(1.0, r / 2.0)
+        pts = pic_decode_points(p)
+        if len(pts) == 1:
+            pts = pts * 2
+        for (ax, ay), (bx, by) in zip(pts, pts[1:]):
+            n = max(1, int(math.hypot(bx - ax, by - ay) / step))
+            for t in range(n + 1):
+                cx = int(round(ax + (bx - ax) * t / n))
+                cy = int(round(ay + (by - ay) * t / n))
+                for dy, half in spans:
+                    y = cy + dy
+                    if y < 0 or y >= h:
+                        continue
+                    x0 = max(0, cx - half)
+                    x1 = min(w, cx + half + 1)
+                    if x1 > x0:
+                        buf[y * w + x0:y * w + x1] = fill[:x1 - x0]
+    return bytes(buf)
+
+def pic_encode_png(buf, w, h, palette_rgb):
+    """Palet indeksli (color type 3) PNG, base64 (worker'da çalışır)."""
+    def chunk(tag, data):
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xffffffff)
+    raw = b"".join(b"\x00" + buf[y * w:(y + 1) * w] for y in range(h))
+    png = (b"\x89PNG\r\n\x1a\n"
+           + chunk(b"IHDR", struct.pack(">IIBBBBB", w, h, 8, 3, 0, 0, 0))
+           + chunk(b"PLTE", palette_rgb)
+           + chunk(b"tRNS", b"\x00")
+           + chunk(b"IDAT", zlib.compress(raw, 6))
+           + chunk(b"IEND", b""))
+    return base64.b64encode(png).decode()
+
+def pic_raster_reset(room):
+    r = room["raster"]
+    r["buf"] = None
+    r["upto"] = 0
+    r["epoch"] += 1
+    r["png"] = None
+
+def pic_raster_maybe_bake(room):
+    r = room["raster"]
+    if not r["busy"] and len(room["strokes"]) - r["upto"] >= PIC_RASTER_TAIL + PIC_RASTER_BATCH:
+        r["busy"] = True
+        asyncio.create_task(pic_raster_bake(room))
+
+async def pic_raster_bake(room):
+    r = room["raster"]
+    try:
+        while len(room["strokes"]) - r["upto"] >= PIC_RASTER_TAIL + PIC_RASTER_BATCH:
+            epoch, upto = r["epoch"], r["upto"]
+            target = len(room["strokes"]) - PIC_RASTER_TAIL
+            baked = room["strokes"][upto:target]
+            batch = [(pic_color_index(r, st["c"]), st["w"], list(st["p"])) for st in baked]
+            buf = await run_cpu(pic_rasterize, r["buf"], PIC_CANVAS_W, PIC_CANVAS_H, batch)
+            # clear / derin undo oldu ya da dilimdeki stroke'lar geri alınıp yerine
+            # yenileri çizildi: gömülen buf artık tuvali temsil etmez
+            current = room["strokes"][upto:target]
+            if r["epoch"] != epoch or len(current) != len(baked) or any(a is not b for a, b in zip(current, baked)):
+                continue
+            r["buf"], r["upto"], r["png"] = buf, target, None
+    finally:
+        r["busy"] = False
+
+async def pic_raster_snapshot(room):
+    """(png base64, upto) ya da raster yoksa None; PNG upto başına önbelleklenir."""
+    r = room["raster"]
+    if not r["buf"] or not r["upto"]:
+        return None
+    if r["png"] and r["png"][0] == r["upto"]:
+        return r["png"][1], r["upto"]
+    epoch, upto, buf = r["epoch"], r["upto"], r["buf"]
+    pal = b"".join(pic_hex_rgb(c) if c else b"\xff\xff\xff" for c in r["palette"])
+    png = await run_cpu(pic_encode_png, buf, PIC_CANVAS_W, PIC_CANVAS_H, pal)
+    if r["epoch"] != epoch:
+        return None
+    if r["upto"] == upto:
+        r["png"] = (upto, png)
+    return png, upto
+
+async def pic_broadcast_stroke(room, payload, s, start):
+    """Kompakt olayı yeni istemcilere, segmentleri eski istemcilere yollar."""
+    poly, legacy = [], []
+    for ws in list(room["clients"]):
+        (poly if getattr(ws, "pic_delta", False) else legacy).append(ws)
+    if poly:
+        await pic_broadcast(room, payload, poly)
+    if legacy:
+        for seg in pic_stroke_segments(s, start):
+            await pic_broadcast(room, {"type": "stroke", "stroke": seg}, legacy)
+
+def pic_clear_strokes(room):
+    room["version"] += 1
+    room["strokes"].clear()
+    room["pen"] = None
+    pic_raster_reset(room)
+    # clear öncesi op'lar artık anlamsız: istemci zaten her şeyi silecek
+    room["ops"] = [(room["version"], "clear", None)]
+    return room["version"]
+
+def pic_pop_stroke(room):
+    s = room["strokes"].pop()
+    if room.get("pen") is s:
+        room["pen"] = None
+    room["version"] += 1
+    room["ops"].append((room["version"], "del", s["id"]))
+    if len(room["strokes"]) < room["raster"]["upto"]:
+        # undo kuyruğu aştı: raster baştan kurulur, raster'lı istemciler tam state alır
+        pic_raster_reset(room)
+        for ws in room["clients"]:
+            if getattr(ws, "pic_raster", False):
+                ws.pic_ack = None
+        pic_raster_maybe_bake(room)
+    return s
+
+def pic_word_view(room, pid):
+    # Kelime görünümü: çizen tam kelimeyi görür, diğerleri maske / ipucu maskesi
+    if room["chosen"] and room["word"]:
+        if pid == room.get("current_drawer"):
+            return room["word"]
+        # ipucu maskesi varsa onu kullan, yoksa klasik mask_word
+        if room.get("hint_mask"):
+            return room["hint_mask"]
+        return mask_word(room["word"])
+    if pid == room.get("current_drawer"):
+        return "(kelime seçiliyor)"
+    return ""
+
+def pic_track_scalars(room):
+    """Skaler alanlardaki değişiklikleri bulup version'a işler."""
+    cur = {
+        "players": {p: dict(v) for p, v in room["players"].items()},
+        "drawer": room.get("current_drawer"),
+        "word": (room["chosen"], room["word"], room.get("hint_mask")),
+        "secondsLeft": room.get("seconds_left", 0),
+        "started": room["started"],
+        "round": room.get("round_index", 1),
+        "totalRounds": room.get("total_rounds") or 0,
+        "hintUsed": room.get("hint_used", False),
+    }
+    prev = room["scalars"] or {}
+    changed = [k for k, v in cur.items() if prev.get(k) != v]
+    if changed:
+        room["version"] += 1
+        for k in changed:
+            room["field_ver"][k] = room["version"]
+        room["scalars"] = cur
+
+def pic_full_state(room, pid, poly=False, raster=None):
+    if raster:
+        # raster + raster'a gömülmemiş stroke kuyruğu
+        png, upto = raster
+        return {
+            **pic_full_state(room, pid, poly),
+            "strokes": room["strokes"][upto:],
+            "raster": {"png": png, "w": PIC_CANVAS_W, "h": PIC_CANVAS_H,
+                       "upto": room["strokes"][upto - 1]["id"]},
+        }
+    return {
+        "type": "state",
+        "v": room["version"],
+        "players": room["players"],
+        "drawer": room.get("current_drawer"),
+        "word": pic_word_view(room, pid),
+        "secondsLeft": room.get("seconds_left", 0),
+        "strokes": pic_wire_strokes(room, poly),
+        "started": room["started"],
+        "round": room.get("round_index", 1),
+        "totalRounds": room.get("total_rounds") or 0,
+        "hintUsed": room.get("hint_used", False),
+    }
+
+def pic_delta(room, pid, base):
+    """İstemcinin onayladığı base version'dan bu yana değişenler (yoksa None)."""
+    if base >= room["version"]:
+        return None
+    d = {"type": "delta", "from": base, "v": room["version"]}
+    clear = any(kind == "clear" and v > base for v, kind, _ in room["ops"])
+    add = []
+    for st in reversed(room["strokes"]):
+        if st["ver"] <= base:
+            break
+        add.append(st)
+    add.reverse()
+    if clear:
+        d["clear"] = True
+    if add:
+        d["add"] = add
+    if not clear:
+        # istemci stroke'u canlı yayından almış olabilir; silinenlerin hepsi gider
+        dels = [sid for v, kind, sid in room["ops"] if kind == "del" and v > base]
+        if dels:
+            d["del"] = dels
+    fv = room["field_ver"]
+    for k in ("players", "drawer", "secondsLeft", "started", "round", "totalRounds", "hintUsed"):
+        if fv.get(k, 0) > base:
+            d[k] = room["scalars"][k]
+    if fv.get("word", 0) > base or fv.get("drawer", 0) > base:
+        d["word"] = pic_word_view(room, pid)
+    return d
+
 def pic_next_drawer(room):
     if not room["drawer_order"]:
         return None
@@ -106,47 +1040,118 @@ async def pic_state_push(room_id):
     if not room:
         return
 
+    ckpt_touch(room)
+    pic_track_scalars(room)
+
+    # Delta istemcileri: tam snapshot sadece join/resync'te (snapshot sınıfı, birleşmez),
+    # sonrasında onayladıkları version'dan itibaren sadece fark (state sınıfı).
+    # Eski istemciler (sync="delta" göndermeyen) her seferinde tam state alır.
+    for ws in room["clients"]:
+        ob = getattr(ws, "outbox", None)
+        if ob and ob["snapshot_lost"]:
+            # snapshot kuyruk taşmasında düştü: deltaların tabanı istemcide yok
+            ob["snapshot_lost"] = False
+            ws.pic_ack = None
+    need_full = [ws for ws in room["clients"]
+                 if getattr(ws, "pic_delta", False) and getattr(ws, "pic_ack", None) is None]
+    raster = await pic_raster_snapshot(room) if need_full else None
+    if raster and raster[1] > len(room["strokes"]):
+        raster = None
+
+    full, deltas, legacy = [], [], []
     for ws in list(room["clients"]):
         pid = getattr(ws, "state_pid", None)
-
-        # Kelime görünümü: çizen tam kelimeyi görür, diğerleri maske / ipucu maskesi
-        if room["chosen"] and room["word"]:
-            if pid == room.get("current_drawer"):
-                word_view = room["word"]
-            else:
-                # ipucu maskesi varsa onu kullan, yoksa klasik mask_word
-                if room.get("hint_mask"):
-                    word_view = room["hint_mask"]
-                else:
-                    word_view = mask_word(room["word"])
+        if not getattr(ws, "pic_delta", False):
+            legacy.append((ws, pic_full_state(room, pid)))
+        elif getattr(ws, "pic_ack", None) is None:
+            full.append((ws, pic_full_state(room, pid, poly=True, raster=raster)))
+            ws.pic_ack = room["version"]
+            ws.pic_raster = bool(raster)
         else:
-            if pid == room.get("current_drawer"):
-                word_view = "(kelime seçiliyor)"
-            else:
-                word_view = ""
+            d = pic_delta(room, pid, ws.pic_ack)
+            if d:
+                deltas.append((ws, d))
 
-        try:
-            await ws.send_text(json.dumps({
-                "type": "state",
-                "players": room["players"],
-                "drawer": room.get("current_drawer"),
-                "word": word_view,
-                "secondsLeft": room.get("seconds_left", 0),
-                "strokes": room["strokes"],
-                "started": room["started"],
-                "round": room.get("round_index", 1),
-                "totalRounds": room.get("total_rounds") or 0,
-                "hintUsed": room.get("hint_used", False),
-            }))
-        except Exception:
-            room["clients"].discard(ws)
+    dead = await fanout_many(room, full, "snapshot")
+    dead += await fanout_many(room, deltas + legacy, "state")
+    for ws in dead:
+        room["clients"].discard(ws)
+
+# ---- Tur fazları ----
+# idle -> choosing -> drawing -> intermission -> choosing ...
+# Her oda zamanlayıcı çarkında en fazla bir deadline tutar (uyuyan coroutine yok);
+# deadline dolunca pic_phase_step o tick'in partisinde çalışır.
+# Handler'lar hiçbir zaman beklemez, sadece fazı değiştirip yeni deadline kurar.
+
+def pic_cancel_timer(room):
+    timer_cancel(room.get("timer"))
+    room["timer"] = None
+    room["deadline"] = None
+    room["timer_gen"] += 1
+
+def pic_schedule_at(room_id, when):
+    room = pic_rooms[room_id]
+    pic_cancel_timer(room)
+    room["deadline"] = when
+    room["timer"] = timer_at(when, pic_deadline_fired, room_id, room["timer_gen"])
+
+def pic_schedule(room_id, delay):
+    pic_schedule_at(room_id, asyncio.get_running_loop().time() + delay)
+
+def pic_deadline_fired(room_id, gen):
+    room = pic_rooms.get(room_id)
+    if not room or room["timer_gen"] != gen:
+        return None
+    room["timer"] = None
+    return pic_phase_step(room_id)
+
+async def pic_phase_step(room_id):
+    room = pic_rooms.get(room_id)
+    if not room:
+        return
+    phase = room["phase"]
+
+    if phase == "choosing":
+        # Kelime seçilmediyse otomatik seç
+        if not room["chosen"] and room["choices"]:
+            room["word"] = random.choice(room["choices"])
+            room["chosen"] = True
+            room["hint_mask"] = mask_word(room["word"])
+            await pic_broadcast(room, {"type": "info", "msg": "Kelime otomatik seçildi."})
+        await pic_begin_drawing(room_id)
+
+    elif phase == "drawing":
+        # Tur süresi geri sayımı (bir sonraki saniye mutlak zamana göre kurulur, kayma olmaz)
+        room["seconds_left"] -= 1
+        if room["seconds_left"] <= 0:
+            room["phase"] = "intermission"
+            pic_schedule(room_id, INTERMISSION)
+            await pic_broadcast(room, {"type": "round_end", "result": "timeup", "word": room["word"]})
+            return
+        pic_schedule_at(room_id, room["deadline"] + 1)
+        if room["seconds_left"] % 5 == 0 or room["seconds_left"] <= 5:
+            await pic_state_push(room_id)
+
+    elif phase == "intermission":
+        await pic_start_round(room_id)
+
+async def pic_begin_drawing(room_id):
+    room = pic_rooms[room_id]
+    room["phase"] = "drawing"
+    room["seconds_left"] = ROUND_SECONDS
+    pic_schedule(room_id, 1)
+    await pic_state_push(room_id)
 
 async def pic_start_round(room_id):
     room = pic_rooms.get(room_id)
-    if not room or len(room["players"]) < 2:
+    if not room:
+        return
+    if len(room["players"]) < 2:
+        pic_cancel_timer(room)
+        room["phase"] = "idle"
         room["started"] = False
         room["word"] = None
-        room["strokes"].clear()
+        pic_clear_strokes(room)
         room["seconds_left"] = 0
         room["choices"] = None
         room["chosen"] = False
@@ -163,13 +1168,17 @@ async def pic_start_round(room_id):
 
     drawer = pic_next_drawer(room)
     room["current_drawer"] = drawer
-    room["strokes"].clear()
+    pic_clear_strokes(room)
     room["started"] = True
     room["seconds_left"] = 0
     room["chosen"] = False
     room["word"] = None
     room["choices"] = random.sample(PIC_WORDS, 3)
 
+    # Kelime seçilmesi için süre
+    room["phase"] = "choosing"
+    pic_schedule(room_id, CHOICE_SECONDS)
+
     await pic_broadcast(room, {"type": "round_start", "drawer": drawer, "round": room["round_index"]})
     await pic_state_push(room_id)
 
@@ -178,42 +1187,15 @@ async def pic_start_round(room_id):
     if ws:
         await ws_send(ws, {"type": "choose_word", "choices": room["choices"], "timeout": CHOICE_SECONDS})
 
-    # Kelime seçilmesi için süre
-    try:
-        for _ in range(CHOICE_SECONDS):
-            await asyncio.sleep(1)
-            if room["chosen"]:
-                break
-        if not room["chosen"] and room["choices"]:
-            room["word"] = random.choice(room["choices"])
-            room["chosen"] = True
-            room["hint_mask"] = mask_word(room["word"])
-            await pic_broadcast(room, {"type": "info", "msg": "Kelime otomatik seçildi."})
-    except asyncio.CancelledError:
-        return
-
-    room["seconds_left"] = ROUND_SECONDS
-    await pic_state_push(room_id)
-
-    # Tur süresi geri sayımı
-    try:
-        while room["seconds_left"] > 0:
-            await asyncio.sleep(1)
-            room["seconds_left"] -= 1
-            if room["seconds_left"] % 5 == 0 or room["seconds_left"] <= 5:
-                await pic_state_push(room_id)
-        await pic_broadcast(room, {"type": "round_end", "result": "timeup", "word": room["word"]})
-    except asyncio.CancelledError:
-        return
-
-    await asyncio.sleep(INTERMISSION)
-    room["round_task"] = asyncio.create_task(pic_start_round(room_id))
-
 async def pic_end_round_with_winner(room_id, winner_pid):
     room = pic_rooms.get(room_id)
-    if not room:
+    if not room or room["phase"] != "drawing":
         return
 
+    # Ara vereceğiz; bir sonraki tur deadline ile başlar
+    room["phase"] = "intermission"
+    pic_schedule(room_id, INTERMISSION)
+
     # Skor güncelleme
     if winner_pid in room["players"]:
         room["players"][winner_pid]["score"] += 10
@@ -231,30 +1213,66 @@ async def pic_end_round_with_winner(room_id, winner_pid):
         "word": room["word"]
     })
 
-    task = room.get("round_task")
-    if task and not task.done():
-        task.cancel()
+async def pic_resync(room_id, pid, ws):
+    """Bağlantıya baştan tam state (delta tabanı sıfırlanır)."""
+    ws.pic_ack = None
+    await pic_state_push(room_id)
 
-    await asyncio.sleep(INTERMISSION)
-    room["round_task"] = asyncio.create_task(pic_start_round(room_id))
+async def pic_leave(room_id, pid, ws=None):
+    """Oyuncu ayrıldı (bağlantı koptu ya da restore edilen koltuğu geri alınmadı)."""
+    room = pic_rooms.get(room_id)
+    if not room:
+        return
+    info = room["players"].pop(pid, None)
+    room["clients"].discard(ws or room["ws_by_pid"].get(pid))
+    room["ws_by_pid"].pop(pid, None)
+    if pid in room["drawer_order"]:
+        room["drawer_order"].remove(pid)
+    if not room["clients"]:
+        pic_cancel_timer(room)
+        pic_rooms.pop(room_id, None)
+    else:
+        await pic_broadcast(room, {
+            "type": "system",
+            "msg": f"{(info or {}).get('name','?')} ayrıldı",
+            "players": room["players"]
+        })
+        if room.get("current_drawer") == pid:
+            pic_cancel_timer(room)
+            await pic_broadcast(room, {
+                "type": "info",
+                "msg": "Çizen çıktı, tur yeniden başlatılıyor."
+            })
+            await pic_start_round(room_id)
 
 @app.websocket("/ws/pictionary")
 async def pictionary_ws(ws: WebSocket):
     await ws.accept()
+    sock = ws
     room_id = None
     pid = secrets.token_hex(3)
+    outbox_open(ws, pid)
     ws.state_pid = pid
     try:
         while True:
-            data = json.loads(await ws.receive_text())
+            data = json.loads(await sock.receive_text())
             typ = data.get("type")
 
+            if typ == "resume" and room_id is None:
+                # kısa kopmadan dönüş: koltuk, oturumun ilk soketi üzerinden sürer
+                sess = await session_resume(sock, data, "pictionary")
+                if sess:
+                    ws, room_id, pid = sess["ws"], sess["room_id"], sess["pid"]
+                continue
+
             if typ == "join":
                 room_id = data["roomId"]
                 name = data.get("name", "anon")[:24]
                 provided_pwd = data.get("password")
                 provided_key = data.get("inviteKey")
                 mode = data.get("mode", "join")   # create / join
+                ws.pic_delta = data.get("sync") == "delta"
+                ws.pic_ack = None
 
                 if room_id not in pic_rooms and mode != "create":
                     await ws_send(ws, {"type": "join_error", "reason": "no_such_room"})
@@ -262,12 +1280,17 @@ async def pictionary_ws(ws: WebSocket):
 
                 new_room = room_id not in pic_rooms
                 room = pic_room(room_id)
+                # yeniden başlatma öncesindeki koltuk (puanıyla) geri alınır
+                old_pid = ckpt_reclaim("pictionary", room_id, room["players"], data.get("token"))
+                if old_pid:
+                    pid = ws.state_pid = old_pid
 
                 # Şifre kontrolü (varsayılan logic'i istersen buraya ekleyebiliriz;
                 # şimdilik sadece odanın password alanını dolduruyoruz)
                 room["clients"].add(ws)
                 room["ws_by_pid"][pid] = ws
-                room["players"][pid] = {"name": name, "score": 0}
+                if not old_pid:
+                    room["players"][pid] = {"name": name, "score": 0}
                 if pid not in room["drawer_order"]:
                     room["drawer_order"].append(pid)
 
@@ -282,6 +1305,7 @@ async def pictionary_ws(ws: WebSocket):
                     "hasPassword": room["password"] is not None,
                     "inviteKey": room.get("invite_key")
                 })
+                session_open(ws, "pictionary", room_id, pid)
 
                 await pic_broadcast(room, {
                     "type": "system",
@@ -289,8 +1313,8 @@ async def pictionary_ws(ws: WebSocket):
                     "players": room["players"]
                 })
 
-                if not room["started"] and len(room["players"]) >= 2:
-                    room["round_task"] = asyncio.create_task(pic_start_round(room_id))
+                if room["phase"] == "idle" and len(room["players"]) >= 2:
+                    await pic_start_round(room_id)
                 else:
                     await pic_state_push(room_id)
 
@@ -304,32 +1328,79 @@ async def pictionary_ws(ws: WebSocket):
                     room["chosen"] = True
                     room["hint_mask"] = mask_word(room["word"])
                     await pic_broadcast(room, {"type": "info", "msg": "Kelime seçildi!"})
-                    await pic_state_push(room_id)
+                    if room["phase"] == "choosing":
+                        await pic_begin_drawing(room_id)
+                    else:
+                        await pic_state_push(room_id)
 
             elif typ == "leave" and room_id:
+                session_end(ws)
                 break
 
+            elif typ == "ack" and room_id:
+                # istemcinin elindeki son version
+                room = pic_rooms.get(room_id)
+                try:
+                    v = int(data.get("v", -1))
+                except (TypeError, ValueError):
+                    continue
+                if room and getattr(ws, "pic_ack", None) is not None and ws.pic_ack <= v <= room["version"]:
+                    ws.pic_ack = v
+
+            elif typ == "resync" and room_id:
+                ws.pic_ack = None
+                await pic_state_push(room_id)
+
             elif typ == "stroke" and room_id:
                 room = pic_rooms.get(room_id)
                 if not room or room.get("current_drawer") != pid or not room.get("chosen"):
                     continue
-                s = {
-                    "x0": data["x0"],
-                    "y0": data["y0"],
-                    "x1": data["x1"],
-                    "y1": data["y1"],
-                    "w": data.get("w", 2),
-                    "c": data.get("c", "#000")
-                }
-                room["strokes"].append(s)
-                await pic_broadcast(room, {"type": "stroke", "stroke": s})
+                # eski istemci: tek segment = 2 noktalı kompakt stroke
+                try:
+                    x0, y0 = int(round(float(data["x0"]))), int(round(float(data["y0"])))
+                    x1, y1 = int(round(float(data["x1"]))), int(round(float(data["y1"])))
+                except (KeyError, TypeError, ValueError):
+                    continue
+                pic_finish_stroke(room)
+                s = pic_add_stroke(room, x0, y0, data.get("w", 2), data.get("c", "#000"), (x1 - x0, y1 - y0))
+                await pic_broadcast_stroke(room, {"type": "pen_down", "stroke": s}, s, 0)
+
+            elif typ == "pen_down" and room_id:
+                room = pic_rooms.get(room_id)
+                if not room or room.get("current_drawer") != pid or not room.get("chosen"):
+                    continue
+                deltas = pic_clean_deltas(data.get("p", []))
+                if deltas is None or len(deltas) < 2:
+                    continue
+                pic_finish_stroke(room)
+                s = pic_add_stroke(room, deltas[0], deltas[1], data.get("w", 2), data.get("c", "#000"), deltas[2:])
+                room["pen"] = s
+                await pic_broadcast_stroke(room, {"type": "pen_down", "stroke": s}, s, 0)
+
+            elif typ == "pen_move" and room_id:
+                room = pic_rooms.get(room_id)
+                if not room or room.get("current_drawer") != pid or not room.get("pen"):
+                    continue
+                s = room["pen"]
+                deltas = pic_clean_deltas(data.get("p", []))
+                if not deltas:
+                    continue
+                start = len(s["p"]) // 2
+                if not pic_extend_stroke(room, s, deltas):
+                    continue
+                await pic_broadcast_stroke(room, {"type": "pen_move", "id": s["id"], "v": s["ver"], "p": deltas}, s, start)
+
+            elif typ == "pen_up" and room_id:
+                room = pic_rooms.get(room_id)
+                if room and room.get("current_drawer") == pid:
+                    pic_finish_stroke(room)
 
             elif typ == "clear" and room_id:
                 room = pic_rooms.get(room_id)
                 if not room or room.get("current_drawer") != pid or not room.get("chosen"):
                     continue
-                room["strokes"].clear()
-                await pic_broadcast(room, {"type": "clear"})
+                v = pic_clear_strokes(room)
+                await pic_broadcast(room, {"type": "clear", "v": v})
                 await pic_state_push(room_id)
 
             elif typ == "undo" and room_id:
@@ -338,7 +1409,7 @@ async def pictionary_ws(ws: WebSocket):
                 if not room or room.get("current_drawer") != pid or not room.get("chosen"):
                     continue
                 if room["strokes"]:
-                    room["strokes"].pop()
+                    pic_pop_stroke(room)
                     await pic_state_push(room_id)
 
             elif typ == "hint" and room_id:
@@ -388,7 +1459,7 @@ async def pictionary_ws(ws: WebSocket):
                     continue
                 text = str(data.get("text", ""))[:200]
 
-                if room.get("word") and room.get("chosen") and text.strip():
+                if room.get("word") and room.get("chosen") and room["phase"] == "drawing" and text.strip():
                     norm = lambda s: re.sub(r"\s+", "", s.lower())
                     if norm(text) == norm(room["word"]):
                         await pic_broadcast(room, {
@@ -407,36 +1478,14 @@ async def pictionary_ws(ws: WebSocket):
                     "text": text
                 })
 
-    except WebSocketDisconnect:
-        pass
+    except WebSocketDisconnect as e:
+        if e.code == 1000:      # istemci bilerek kapattı: koltuk beklemez
+            session_end(ws)
     finally:
-        if room_id and room_id in pic_rooms:
-            room = pic_rooms[room_id]
-            info = room["players"].pop(pid, None)
-            room["clients"].discard(ws)
-            room["ws_by_pid"].pop(pid, None)
-            if pid in room["drawer_order"]:
-                room["drawer_order"].remove(pid)
-            if not room["clients"]:
-                t = room.get("round_task")
-                if t and not t.done():
-                    t.cancel()
-                pic_rooms.pop(room_id, None)
-            else:
-                await pic_broadcast(room, {
-                    "type": "system",
-                    "msg": f"{(info or {}).get('name','?')} ayrıldı",
-                    "players": room["players"]
-                })
-                if room.get("current_drawer") == pid:
-                    t = room.get("round_task")
-                    if t and not t.done():
-                        t.cancel()
-                    await pic_broadcast(room, {
-                        "type": "info",
-                        "msg": "Çizen çıktı, tur yeniden başlatılıyor."
-                    })
-                    room["round_task"] = asyncio.create_task(pic_start_round(room_id))
+        if not session_detach(ws, sock):
+            outbox_close(ws)
+            if room_id:
+                await pic_leave(room_id, pid, ws)
 
 # ======================================================
 # SPYFALL ODA DEPOLARI
@@ -455,6 +1504,9 @@ def spyfall_new_room():
         "turn": None,
         "turn_order": [],
         "votes": {},            # pid -> voted_pid
+        "tally": {},            # voted_pid -> oy sayısı (oy geldikçe güncellenir)
+        "alive_count": 0,       # hayattaki oyuncu sayısı (katılma / atılma / ayrılmada güncellenir)
+        "public_json": None,    # herkese aynı giden "players" parçası, encode edilmiş (üyelik/alive değişince None)
         "vote_target": None,
         "vote_timer": None,
         "round_started": None,
@@ -480,65 +1532,104 @@ SPYFALL_LOCATIONS = {
 # HELPER FONKSIYONLAR
 # ======================================================
 
-def spyfall_get_alive(room):
-    return [p for p, info in room["players"].items() if info.get("alive", True)]
+def spyfall_add_player(room, pid, name, ws):
+    room["players"][pid] = {"name": name, "ws": ws, "alive": True}
+    room["alive_count"] += 1
+    room["public_json"] = None
 
 
-async def spyfall_broadcast(room, payload):
-    msg = json.dumps(payload)
-    dead = []
+def spyfall_remove_player(room, pid):
+    pl = room["players"].pop(pid, None)
+    if pl is None:
+        return
+    if pl.get("alive", True):
+        room["alive_count"] -= 1
+    spyfall_drop_votes(room, pid)
+    room["public_json"] = None
 
-    for pid, pl in list(room["players"].items()):
-        try:
-            await pl["ws"].send_text(msg)
-        except:
-            dead.append(pid)
 
-    for pid in dead:
-        room["players"].pop(pid, None)
+def spyfall_kill(room, pid):
+    pl = room["players"].get(pid)
+    if pl and pl["alive"]:
+        pl["alive"] = False
+        room["alive_count"] -= 1
+        room["public_json"] = None
 
 
-async def spyfall_push_state(room):
-    """Her oyuncuya rolünü ve state'i yollar."""
-    for pid, pl in room["players"].items():
-        my_role = pl.get("role")
-        my_location = None if my_role == "SPY" else room["location"]
-        my_location_role = pl.get("location_role")
+def spyfall_unvote(room, voter):
+    old = room["votes"].pop(voter, None)
+    if old is not None:
+        tally = room["tally"]
+        tally[old] -= 1
+        if not tally[old]:
+            del tally[old]
+
+
+def spyfall_cast_vote(room, voter, target):
+    spyfall_unvote(room, voter)
+    room["votes"][voter] = target
+    room["tally"][target] = room["tally"].get(target, 0) + 1
+
 
-        players_public = {
+def spyfall_drop_votes(room, pid):
+    """Ayrılan oyuncunun verdiği oyu ve ona verilen oyları düş."""
+    spyfall_unvote(room, pid)
+    if room["tally"].pop(pid, None):
+        room["votes"] = {v: t for v, t in room["votes"].items() if t != pid}
+
+
+def spyfall_lobby_payload(room):
+    return {
+        "type": "lobby_update",
+        "players": {
             p: {
                 "name": room["players"][p]["name"],
-                "alive": room["players"][p]["alive"]
-            } for p in room["players"]
-        }
+                "is_host": (p == room["host"])
+            }
+            for p in room["players"]
+        },
+        "host": room["host"]
+    }
 
-        payload = {
-            "type": "state",
-            "phase": room["phase"],
-            "host": room["host"],
-            "players": players_public,
-            "turn": room["turn"],
-            "me": {
-                "pid": pid,
-                "name": pl["name"],
-                "role": my_role,
-                "location": my_location,
-                "location_role": my_location_role,
-                "alive": pl["alive"]
-            },
-            "location_revealed": room["phase"] == "game_over"
-        }
+async def spyfall_broadcast(room, payload):
+    ckpt_touch(room)
+    by_ws = {id(pl["ws"]): pid for pid, pl in room["players"].items()}
+    dead = await fanout_broadcast(room, [pl["ws"] for pl in room["players"].values()], payload)
 
-        try:
-            await pl["ws"].send_text(json.dumps(payload))
-        except:
-            pass
+    for ws in dead:
+        spyfall_remove_player(room, by_ws.get(id(ws)))
+
+
+async def spyfall_push_state(room):
+    """Her oyuncuya rolünü ve state'i yollar. Ortak kısım bir kez encode edilir;
+    oyuncu listesi ayrıca önbellekte tutulur, yalnızca "me" bloğu kişiye özel."""
+    ckpt_touch(room)
+    if room["public_json"] is None:
+        room["public_json"] = json.dumps({p: {"name": pl["name"], "alive": pl["alive"]}
+                                          for p, pl in room["players"].items()})
+    head = '{"type": "state", "phase": %s, "host": %s, "players": %s, "turn": %s, "location_revealed": %s, "me": ' % (
+        json.dumps(room["phase"]), json.dumps(room["host"]), room["public_json"], json.dumps(room["turn"]),
+        json.dumps(room["phase"] == "game_over"))
+    pairs = []
+    for pid, pl in room["players"].items():
+        my_role = pl.get("role")
+        me = json.dumps({
+            "pid": pid,
+            "name": pl["name"],
+            "role": my_role,
+            "location": None if my_role == "SPY" else room["location"],
+            "location_role": pl.get("location_role"),
+            "alive": pl["alive"]
+        })
+        pairs.append((pl["ws"], head + me + "}"))
+
+    await fanout_many(room, pairs, "state")
 
 
 def spyfall_next_turn(room):
-    alive = spyfall_get_alive(room)
-    if len(alive) <= 1:
+    if room["alive_count"] <= 1:
         return
+    players = room["players"]
 
     order = room["turn_order"]
     if room["turn"] not in order:
@@ -548,7 +1639,7 @@ def spyfall_next_turn(room):
     idx = order.index(room["turn"])
     for i in range(1, len(order) + 1):
         nxt = order[(idx + i) % len(order)]
-        if nxt in alive:
+        if nxt in players and players[nxt]["alive"]:
             room["turn"] = nxt
             return
 
@@ -593,32 +1684,38 @@ def spyfall_start_game(room):
 # VOTING
 # ======================================================
 
+SPYFALL_VOTE_SECONDS = 40
+
 async def spyfall_start_voting(room):
     room["phase"] = "voting"
     room["votes"] = {}
+    room["tally"] = {}
     room["vote_target"] = None
 
+    # Süre dolunca oylama verilen oylarla kapanır
+    timer_cancel(room["vote_timer"])
+    room["vote_timer"] = timer_after(SPYFALL_VOTE_SECONDS, spyfall_finish_voting, room)
+
     await spyfall_broadcast(room, {
         "type": "voting_started",
-        "duration": 40
+        "duration": SPYFALL_VOTE_SECONDS
     })
 
 
 async def spyfall_finish_voting(room):
     if room["phase"] != "voting":
         return
+    timer_cancel(room["vote_timer"])
+    room["vote_timer"] = None
 
-    votes = {}
-    for voter, target in room["votes"].items():
-        votes[target] = votes.get(target, 0) + 1
-
+    votes = room["tally"]
     if not votes:
         await spyfall_broadcast(room, {"type": "voting_result", "result": "no_votes"})
         room["phase"] = "playing"
         return
 
     kicked = max(votes, key=votes.get)
-    room["players"][kicked]["alive"] = False
+    spyfall_kill(room, kicked)
 
     await spyfall_broadcast(room, {
         "type": "voting_result",
@@ -664,6 +1761,36 @@ async def spyfall_process_guess(room, pid, guess):
     room["phase"] = "game_over"
 
 
+async def spyfall_resync(room_id, pid, ws):
+    room = spyfall_rooms.get(room_id)
+    if not room:
+        return
+    if room["phase"] == "lobby":
+        await ws_send(ws, spyfall_lobby_payload(room))
+    else:
+        await spyfall_push_state(room)
+
+async def spyfall_leave(room_id, pid):
+    """Oyuncu ayrıldı: odadan çıkar, oda boşaldıysa kapat."""
+    room = spyfall_rooms.get(room_id)
+    if not room:
+        return
+    spyfall_remove_player(room, pid)
+
+    if not room["players"]:
+        timer_cancel(room["vote_timer"])
+        spyfall_rooms.pop(room_id, None)
+    else:
+        if room["host"] == pid:
+            keys = list(room["players"].keys())
+            room["host"] = keys[0]
+
+        if room["phase"] == "lobby":
+            await spyfall_broadcast(room, spyfall_lobby_payload(room))
+        else:
+            await spyfall_push_state(room)
+
+
 # ======================================================
 # SPYFALL WEBSOCKET SERVER
 # ======================================================
@@ -671,15 +1798,24 @@ async def spyfall_process_guess(room, pid, guess):
 @app.websocket("/ws/spyfall")
 async def spyfall_ws(ws: WebSocket):
     await ws.accept()
+    sock = ws
 
     pid = secrets.token_hex(3)
+    outbox_open(ws, pid)
     room_id = None
 
     try:
         while True:
-            data = json.loads(await ws.receive_text())
+            data = json.loads(await sock.receive_text())
             typ = data.get("type")
 
+            if typ == "resume" and room_id is None:
+                # kısa kopmadan dönüş: koltuk, oturumun ilk soketi üzerinden sürer
+                sess = await session_resume(sock, data, "spyfall")
+                if sess:
+                    ws, room_id, pid = sess["ws"], sess["room_id"], sess["pid"]
+                continue
+
             # ======================================================
             # JOIN
             # ======================================================
@@ -692,32 +1828,29 @@ async def spyfall_ws(ws: WebSocket):
 
                 room = spyfall_rooms[room_id]
 
-                if room["phase"] != "lobby":
+                old_pid = ckpt_reclaim("spyfall", room_id, room["players"], data.get("token"))
+                if old_pid:
+                    # yeniden başlatma öncesindeki koltuk: oyun sürüyorsa da geri dönülür
+                    pid = old_pid
+                    room["players"][pid]["ws"] = ws
+                    if room["phase"] != "lobby":
+                        await ws_send(ws, {"type": "joined", "pid": pid})
+                        session_open(ws, "spyfall", room_id, pid)
+                        await spyfall_push_state(room)
+                        continue
+                elif room["phase"] != "lobby":
                     await ws_send(ws, {"type": "join_error", "msg": "Oyun devam ediyor!"})
                     continue
-
-                room["players"][pid] = {
-                    "name": name,
-                    "ws": ws,
-                    "alive": True
-                }
+                else:
+                    spyfall_add_player(room, pid, name, ws)
 
                 if room["host"] is None:
                     room["host"] = pid
 
                 await ws_send(ws, {"type": "joined", "pid": pid})
+                session_open(ws, "spyfall", room_id, pid)
 
-                await spyfall_broadcast(room, {
-                    "type": "lobby_update",
-                    "players": {
-                        p: {
-                            "name": room["players"][p]["name"],
-                            "is_host": (p == room["host"])
-                        }
-                        for p in room["players"]
-                    },
-                    "host": room["host"]
-                })
+                await spyfall_broadcast(room, spyfall_lobby_payload(room))
 
             # ======================================================
             # START GAME
@@ -771,14 +1904,17 @@ async def spyfall_ws(ws: WebSocket):
                 if room["phase"] != "voting":
                     continue
 
+                # yalnızca hayattakiler, hayattaki birine oy verebilir
+                # (atılan / çıkan oyuncunun soketi odada kalmış olabilir: önce üyelik)
                 target = data.get("target")
-                if target is None:
+                players = room["players"]
+                if pid not in players or not isinstance(target, str) or target not in players:
+                    continue
+                if not players[target]["alive"] or not players[pid]["alive"]:
                     continue
 
-                room["votes"][pid] = target
-
-                alive_now = spyfall_get_alive(room)
-                if len(room["votes"]) >= len(alive_now):
+                spyfall_cast_vote(room, pid, target)
+                if len(room["votes"]) >= room["alive_count"]:
                     await spyfall_finish_voting(room)
 
             # ======================================================
@@ -802,46 +1938,30 @@ async def spyfall_ws(ws: WebSocket):
                 room = spyfall_rooms[room_id]
                 await spyfall_process_guess(room, pid, data.get("guess"))
 
-    except WebSocketDisconnect:
-        pass
+    except WebSocketDisconnect as e:
+        if e.code == 1000:      # istemci bilerek kapattı: koltuk beklemez
+            session_end(ws)
 
     finally:
-        if room_id and room_id in spyfall_rooms:
-            room = spyfall_rooms[room_id]
-
-            if pid in room["players"]:
-                room["players"].pop(pid)
-
-            if not room["players"]:
-                spyfall_rooms.pop(room_id, None)
-            else:
-                if room["host"] == pid:
-                    keys = list(room["players"].keys())
-                    room["host"] = keys[0]
-
-                if room["phase"] == "lobby":
-                    await spyfall_broadcast(room, {
-                        "type": "lobby_update",
-                        "players": {
-                            p: {
-                                "name": room["players"][p]["name"],
-                                "is_host": (p == room["host"])
-                            }
-                            for p in room["players"]
-                        },
-                        "host": room["host"]
-                    })
-                else:
-                    await spyfall_push_state(room)
+        if not session_detach(ws, sock):
+            outbox_close(ws)
+            if room_id:
+                await spyfall_leave(room_id, pid)
 
 
 # ==========================
 # TicTacToe (çok odalı)
 # ==========================
 
-def ttt_new_room(max_rounds: int = 1):
+def ttt_new_room(max_rounds: int = 1, size: int = 3, k: int = 3, ai=None):
     return {
-        "board": [None] * 9,
+        "size": size,
+        "k": k,                     # kazanmak için yan yana gereken taş
+        "cells": bytearray(size * size),    # 0 boş, 1 X, 2 O
+        "filled": 0,
+        "last": -1,                 # son hamlenin hücresi
+        "ai": ai,                   # yapay zekânın taşı (tek kişilik odada "O")
+        "ai_task": None,
         "players": {},              # pid -> {name, mark, ws}
         "turn": "X",
         "scores": {"X": 0, "O": 0},
@@ -850,30 +1970,194 @@ def ttt_new_room(max_rounds: int = 1):
         "host_pid": None
     }
 
-def ttt_winner(b):
-    wins = [
-        (0,1,2),(3,4,5),(6,7,8),
-        (0,3,6),(1,4,7),(2,5,8),
-        (0,4,8),(2,4,6)
-    ]
-    for a,b2,c in wins:
-        if b[a] and b[a] == b[b2] == b[c]:
-            return b[a]
-    if all(b):
-        return "draw"
-    return None
-
-async def ttt_broadcast(room, payload: dict):
-    msg = json.dumps(payload)
-    dead = []
-    for pid, pl in list(room["players"].items()):
-        ws = pl["ws"]
-        try:
-            await ws.send_text(msg)
-        except Exception:
-            dead.append(pid)
-    for pid in dead:
-        room["players"].pop(pid, None)
+# Tahta boyutu -> varsayılan k (3x3 klasik ... 15x15 gomoku)
+TTT_SIZES = {3: 3, 4: 3, 5: 4, 6: 4, 7: 4, 8: 5, 9: 5, 10: 5, 11: 5, 12: 5, 13: 5, 14: 5, 15: 5}
+TTT_MARK = {"X": 1, "O": 2}
+TTT_DIRS = ((0, 1), (1, 0), (1, 1), (1, -1))
+
+# 3x3 turnuva tahtaları: iki 9 bitlik maske
+TTT_LINES = (0b000000111, 0b000111000, 0b111000000,
+             0b001001001, 0b010010010, 0b100100100,
+             0b100010001, 0b001010100)
+TTT_FULL = 0b111111111
+# 512 girişlik tablo: bu maske tamamlanmış bir çizgi içeriyor mu
+TTT_WIN = bytes(any(m & line == line for line in TTT_LINES) for m in range(512))
+
+def ttt_board_list(x, o):
+    return ["X" if x >> i & 1 else "O" if o >> i & 1 else None for i in range(9)]
+
+def ttt_cells_list(cells):
+    return [None if v == 0 else "X" if v == 1 else "O" for v in cells]
+
+def ttt_line_win(cells, n, k, idx):
+    """idx'e konan taş, içinden geçen dört doğrultudan birinde k'lık sıra tamamlıyor mu.
+    Tüm tahta değil yalnızca bu doğrultular taranır (en fazla 4*2*(k-1) hücre)."""
+    v = cells[idx]
+    r, c = divmod(idx, n)
+    for dr, dc in TTT_DIRS:
+        run = 1
+        rr, cc = r + dr, c + dc
+        while 0 <= rr < n and 0 <= cc < n and cells[rr * n + cc] == v:
+            run += 1
+            rr += dr
+            cc += dc
+        rr, cc = r - dr, c - dc
+        while 0 <= rr < n and 0 <= cc < n and cells[rr * n + cc] == v:
+            run += 1
+            rr -= dr
+            cc -= dc
+        if run >= k:
+            return True
+    return False
+
+# ---- Yapay zekâ (tek kişilik oda) ----
+# Negamax + alfa-beta, Zobrist anahtarlı transpozisyon tablosu ve süre bütçeli
+# iteratif derinleştirme. run_cpu ile worker sürecinde çalışır; tablo o süreçte
+# hamleler (ve odalar) arasında korunur. Büyük tahtada yalnızca taşlara komşu
+# boş hücreler, komşu sayısına göre sıralanıp ilk TTT_AI_WIDTH tanesi denenir;
+# derinlik sınırında k'lık pencereler numpy ile puanlanır.
+TTT_AI_BUDGET = 0.5             # hamle başına saniye
+TTT_AI_WIDTH = 14               # büyük tahtada düğüm başına denenen aday hamle
+TTT_AI_TT_MAX = 1_000_000       # tablo bu boyutu aşınca boşaltılır
+TTT_AI_WIN = 1_000_000
+TTT_AI_INF = 10 ** 9
+
+_ttt_zobrist = None
+_ttt_tt = {}
+_ttt_windows = {}
+
+def ttt_ai_zobrist():
+    global _ttt_zobrist
+    if _ttt_zobrist is None:
+        rng = random.Random(0x7A7)
+        _ttt_zobrist = [(0, rng.getrandbits(64), rng.getrandbits(64)) for _ in range(15 * 15)]
+    return _ttt_zobrist
+
+def ttt_ai_windows(n, k):
+    """(n, k) için tüm k'lık doğru parçaları: pencere x k hücre indeks matrisi + ağırlıklar."""
+    w = _ttt_windows.get((n, k))
+    if w is None:
+        rows = []
+        for r in range(n):
+            for c in range(n):
+                for dr, dc in TTT_DIRS:
+                    if 0 <= r + dr * (k - 1) < n and 0 <= c + dc * (k - 1) < n:
+                        rows.append([(r + dr * i) * n + c + dc * i for i in range(k)])
+        weights = np.array([0] + [10 ** i for i in range(k)], dtype=np.int64)
+        w = _ttt_windows[(n, k)] = (np.array(rows, dtype=np.intp), weights)
+    return w
+
+def ttt_ai_eval(ctx, side):
+    """Hamle sırası `side`'da olan tarafın gözünden: yalnız bir tarafın taşı olan pencereler."""
+    v = ctx["board"][ctx["windows"]]
+    mine = (v == side).sum(axis=1)
+    theirs = (v == 3 - side).sum(axis=1)
+    w = ctx["weights"]
+    return int(w[mine[theirs == 0]].sum() - w[theirs[mine == 0]].sum())
+
+def ttt_ai_moves(ctx, first=-1, width=TTT_AI_WIDTH):
+    n, board = ctx["n"], ctx["board"]
+    if n <= 4:
+        moves = np.flatnonzero(board == 0).tolist()
+    else:
+        occ = (board != 0).reshape(n, n)
+        if not occ.any():
+            return [(n // 2) * n + n // 2]
+        pad = np.pad(occ, 1).astype(np.int8)
+        near = sum(pad[1 + dr:1 + dr + n, 1 + dc:1 + dc + n]
+                   for dr in (-1, 0, 1) for dc in (-1, 0, 1) if dr or dc).ravel()
+        near[occ.ravel()] = 0
+        cand = np.flatnonzero(near)
+        moves = cand[np.argsort(-near[cand], kind="stable")][:width].tolist()
+    if first >= 0 and first in moves:
+        moves.remove(first)
+        moves.insert(0, first)
+    return moves
+
+def ttt_ai_negamax(ctx, depth, alpha, beta, h, side):
+    """Değer (side'ın gözünden) ya da süre dolduysa None."""
+    ctx["nodes"] += 1
+    if not ctx["nodes"] & 255 and time.perf_counter() > ctx["deadline"]:
+        return None
+    tt = ctx["tt"]
+    hit = tt.get(h)
+    first = -1
+    if hit is not None:
+        d, val, flag, first = hit
+        if d >= depth and (flag == 0 or (flag == 1 and val >= beta) or (flag == 2 and val <= alpha)):
+            return val
+    if depth == 0:
+        return ttt_ai_eval(ctx, side)
+    cells, n, k, z = ctx["cells"], ctx["n"], ctx["k"], ctx["zobrist"]
+    moves = ttt_ai_moves(ctx, first)
+    if not moves:
+        return 0
+    alpha0, best, best_move = alpha, -TTT_AI_INF, moves[0]
+    for m in moves:
+        cells[m] = side
+        if ttt_line_win(cells, n, k, m):
+            val = TTT_AI_WIN
+        elif ctx["filled"] + 1 == n * n:
+            val = 0
+        else:
+            ctx["filled"] += 1
+            val = ttt_ai_negamax(ctx, depth - 1, -beta, -alpha, h ^ z[m][side], 3 - side)
+            ctx["filled"] -= 1
+            if val is None:
+                cells[m] = 0
+                return None
+            val = -val
+        cells[m] = 0
+        if val > best:
+            best, best_move = val, m
+        if val > alpha:
+            alpha = val
+        if alpha >= beta:
+            break
+    # 0 = kesin, 1 = alt sınır (beta kesmesi), 2 = üst sınır
+    tt[h] = (depth, best, 2 if best <= alpha0 else 1 if best >= beta else 0, best_move)
+    return best
+
+def ttt_ai_search(cells, n, k, side, budget):
+    """Worker sürecinde çalışır: `side` (1 = X, 2 = O) için hamle indeksi döner."""
+    global _ttt_tt
+    if len(_ttt_tt) > TTT_AI_TT_MAX:
+        _ttt_tt = {}
+    cells = bytearray(cells)
+    windows, weights = ttt_ai_windows(n, k)
+    z = ttt_ai_zobrist()
+    h = (n * 16 + k) * 0x9E3779B97F4A7C15 & 0xFFFFFFFFFFFFFFFF
+    for i, v in enumerate(cells):
+        if v:
+            h ^= z[i][v]
+    ctx = {"cells": cells, "board": np.frombuffer(cells, dtype=np.uint8), "n": n, "k": k,
+           "windows": windows, "weights": weights, "zobrist": z, "tt": _ttt_tt, "nodes": 0,
+           "filled": sum(1 for v in cells if v), "deadline": time.perf_counter() + budget}
+    # önce tek hamlelik kazanç, sonra rakibin tek hamlelik kazancını kesmek
+    # (kesilmemiş aday listesiyle: tehdit hücresi sıralamada geride kalmış olabilir)
+    for who in (side, 3 - side):
+        for m in ttt_ai_moves(ctx, width=None):
+            cells[m] = who
+            won = ttt_line_win(cells, n, k, m)
+            cells[m] = 0
+            if won:
+                return m
+    best = ttt_ai_moves(ctx)[0]
+    for depth in range(1, n * n - ctx["filled"] + 1):
+        val = ttt_ai_negamax(ctx, depth, -TTT_AI_INF, TTT_AI_INF, h, side)
+        if val is None:
+            break
+        best = _ttt_tt[h][3]
+        if abs(val) >= TTT_AI_WIN:
+            break
+    return best
+
+async def ttt_broadcast(room, payload: dict, cls: str = "event"):
+    ckpt_touch(room)
+    by_ws = {id(pl["ws"]): pid for pid, pl in room["players"].items()}
+    dead = await fanout_broadcast(room, [pl["ws"] for pl in room["players"].values()], payload, cls)
+    for ws in dead:
+        room["players"].pop(by_ws.get(id(ws)), None)
 
 async def ttt_push_state(room):
     host_mark = None
@@ -883,25 +2167,134 @@ async def ttt_push_state(room):
 
     payload = {
         "type": "state",
-        "board": room["board"],
+        "board": ttt_cells_list(room["cells"]),
+        "size": room["size"],
+        "k": room["k"],
+        "last": room["last"],
+        "ai": room["ai"],
         "turn": room["turn"],
         "round": room.get("round", 1),
         "maxRounds": room.get("max_rounds", 1),
         "scores": room.get("scores", {"X": 0, "O": 0}),
         "hostMark": host_mark
     }
-    await ttt_broadcast(room, payload)
+    await ttt_broadcast(room, payload, "state")
+
+def ttt_reset_board(room):
+    room["cells"] = bytearray(room["size"] * room["size"])
+    room["filled"] = 0
+    room["last"] = -1
+    room["turn"] = "X"
+
+async def ttt_play(room, mark, idx):
+    """Geçerli bir hamleyi uygula, tur/seri sonucunu yayınla. Uygulanırsa True."""
+    cells, n = room["cells"], room["size"]
+    if idx < 0 or idx >= n * n or cells[idx]:
+        return False
+
+    cells[idx] = TTT_MARK[mark]
+    room["filled"] += 1
+    room["last"] = idx
+    room["turn"] = "O" if mark == "X" else "X"
+
+    if ttt_line_win(cells, n, room["k"], idx):
+        w = mark
+    elif room["filled"] == n * n:
+        w = "draw"
+    else:
+        await ttt_push_state(room)
+        return True
+
+    if w != "draw":
+        room["scores"][w] = room["scores"].get(w, 0) + 1
+
+    current_round = room.get("round", 1)
+    max_rounds = room.get("max_rounds", 1)
+    msg = "Berabere!" if w == "draw" else f"Kazanan: {w}"
+    match_over = current_round >= max_rounds
+
+    result_payload = {
+        "type": "result",
+        "msg": msg,
+        "round": current_round,
+        "maxRounds": max_rounds,
+        "scores": room["scores"],
+        "matchOver": match_over
+    }
+    await ttt_broadcast(room, result_payload)
+
+    ttt_reset_board(room)
+
+    if match_over:
+        room["round"] = 1
+        room["scores"] = {"X": 0, "O": 0}
+    else:
+        room["round"] = current_round + 1
+
+    await ttt_push_state(room)
+    return True
+
+def ttt_ai_maybe(room_id):
+    """Sıra yapay zekâdaysa hamleyi worker havuzunda aramaya başla."""
+    room = ttt_rooms.get(room_id)
+    if not room or room["ai"] is None or room["turn"] != room["ai"] or room["ai_task"] or not room["players"]:
+        return
+    room["ai_task"] = asyncio.create_task(ttt_ai_turn(room_id, room))
+
+async def ttt_ai_turn(room_id, room):
+    cells, filled, mark = room["cells"], room["filled"], room["ai"]
+    try:
+        idx = await run_cpu(ttt_ai_search, bytes(cells), room["size"], room["k"], TTT_MARK[mark], TTT_AI_BUDGET)
+    except Exception:
+        log.exception("ttt ai: hamle araması başarısız (oda %s)", room_id)
+        idx = cells.find(0)
+    finally:
+        room["ai_task"] = None
+    # arama sürerken oda kapanmış / tahta sıfırlanmış olabilir
+    if ttt_rooms.get(room_id) is not room or room["cells"] is not cells or room["filled"] != filled:
+        return
+    if not await ttt_play(room, mark, idx):
+        await ttt_play(room, mark, cells.find(0))
+    ttt_ai_maybe(room_id)
+
+async def ttt_resync(room_id, pid, ws):
+    room = ttt_rooms.get(room_id)
+    if room:
+        await ttt_push_state(room)
+
+async def ttt_leave(room_id, pid):
+    """Oyuncu ayrıldı: odadan çıkar, gerekirse host'u devret."""
+    room = ttt_rooms.get(room_id)
+    if not room:
+        return
+    if pid in room["players"]:
+        room["players"].pop(pid, None)
+    if not room["players"]:
+        ttt_rooms.pop(room_id, None)
+    else:
+        if room.get("host_pid") == pid:
+            new_host = next(iter(room["players"].keys()), None)
+            room["host_pid"] = new_host
 
 @app.websocket("/ws/ttt")
 async def ttt_ws(ws: WebSocket):
     await ws.accept()
+    sock = ws
     pid = secrets.token_hex(3)
+    outbox_open(ws, pid)
     room_id = None
     try:
         while True:
-            data = json.loads(await ws.receive_text())
+            data = json.loads(await sock.receive_text())
             typ = data.get("type")
 
+            if typ == "resume" and room_id is None:
+                # kısa kopmadan dönüş: koltuk, oturumun ilk soketi üzerinden sürer
+                sess = await session_resume(sock, data, "ttt")
+                if sess:
+                    ws, room_id, pid = sess["ws"], sess["room_id"], sess["pid"]
+                continue
+
             if typ == "join":
                 room_id = data["roomId"]
                 name = data.get("name", "anon")[:24]
@@ -916,24 +2309,39 @@ async def ttt_ws(ws: WebSocket):
                     max_rounds = int(data.get("rounds", 1) or 1)
                     if max_rounds not in (1, 3, 5, 10):
                         max_rounds = 1
-                    ttt_rooms[room_id] = ttt_new_room(max_rounds)
+                    size = data.get("size", 3)
+                    if not isinstance(size, int) or size not in TTT_SIZES:
+                        size = 3
+                    k = data.get("k", TTT_SIZES[size])
+                    if not isinstance(k, int) or not 3 <= k <= min(size, 5):
+                        k = TTT_SIZES[size]
+                    ttt_rooms[room_id] = ttt_new_room(max_rounds, size, k, "O" if data.get("ai") else None)
                     new_room = True
 
                 room = ttt_rooms[room_id]
 
-                if len(room["players"]) >= 2:
-                    await ws_send(ws, {"type": "info","msg": "Oda dolu (2/2)"})
-                    continue
+                old_pid = ckpt_reclaim("ttt", room_id, room["players"], data.get("token"))
+                if old_pid:
+                    # yeniden başlatma öncesindeki koltuk
+                    pid = old_pid
+                    room["players"][pid]["ws"] = ws
+                    mark = room["players"][pid]["mark"]
+                else:
+                    if len(room["players"]) + (room["ai"] is not None) >= 2:
+                        await ws_send(ws, {"type": "info","msg": "Oda dolu (2/2)"})
+                        continue
 
-                used_marks = [p["mark"] for p in room["players"].values()]
-                mark = "X" if "X" not in used_marks else "O"
+                    used_marks = [p["mark"] for p in room["players"].values()] + [room["ai"]]
+                    mark = "X" if "X" not in used_marks else "O"
 
-                room["players"][pid] = {"name": name,"mark": mark,"ws": ws}
+                    room["players"][pid] = {"name": name,"mark": mark,"ws": ws}
 
                 if new_room:
                     room["host_pid"] = pid
 
-                await ws_send(ws, {"type": "joined","pid": pid,"mark": mark,"isHost": room.get("host_pid") == pid})
+                await ws_send(ws, {"type": "joined","pid": pid,"mark": mark,"isHost": room.get("host_pid") == pid,
+                                   "size": room["size"],"k": room["k"],"ai": room["ai"]})
+                session_open(ws, "ttt", room_id, pid)
                 await ttt_push_state(room)
 
             if typ == "move" and room_id:
@@ -943,45 +2351,12 @@ async def ttt_ws(ws: WebSocket):
                 mark = room["players"][pid]["mark"]
                 if room["turn"] != mark:
                     continue
-                idx = int(data.get("idx", -1))
-                if idx < 0 or idx > 8 or room["board"][idx]:
+                try:
+                    idx = int(data.get("idx", -1))
+                except (TypeError, ValueError):
                     continue
-
-                room["board"][idx] = mark
-                room["turn"] = "O" if mark == "X" else "X"
-
-                w = ttt_winner(room["board"])
-                if w:
-                    if w != "draw":
-                        room["scores"][w] = room["scores"].get(w, 0) + 1
-
-                    current_round = room.get("round", 1)
-                    max_rounds = room.get("max_rounds", 1)
-                    msg = "Berabere!" if w == "draw" else f"Kazanan: {w}"
-                    match_over = current_round >= max_rounds
-
-                    result_payload = {
-                        "type": "result",
-                        "msg": msg,
-                        "round": current_round,
-                        "maxRounds": max_rounds,
-                        "scores": room["scores"],
-                        "matchOver": match_over
-                    }
-                    await ttt_broadcast(room, result_payload)
-
-                    room["board"] = [None] * 9
-                    room["turn"] = "X"
-
-                    if match_over:
-                        room["round"] = 1
-                        room["scores"] = {"X": 0, "O": 0}
-                    else:
-                        room["round"] = current_round + 1
-
-                    await ttt_push_state(room)
-                else:
-                    await ttt_push_state(room)
+                if await ttt_play(room, mark, idx):
+                    ttt_ai_maybe(room_id)
 
             if typ == "rematch" and room_id:
                 room = ttt_rooms.get(room_id)
@@ -991,8 +2366,7 @@ async def ttt_ws(ws: WebSocket):
                     await ws_send(ws, {"type": "info","msg": "Yeni seri başlatma yetkisi sadece oda sahibinde."})
                     continue
 
-                room["board"] = [None] * 9
-                room["turn"] = "X"
+                ttt_reset_board(room)
                 room["scores"] = {"X": 0, "O": 0}
                 room["round"] = 1
 
@@ -1014,26 +2388,281 @@ async def ttt_ws(ws: WebSocket):
                     if other_pid == pid:
                         continue
                     try:
-                        await pl["ws"].close()
+                        await ws_close(pl["ws"])
                     except:
                         pass
 
                 ttt_rooms.pop(room_id, None)
+                session_end(ws)
                 break
 
+    except WebSocketDisconnect as e:
+        if e.code == 1000:      # istemci bilerek kapattı: koltuk beklemez
+            session_end(ws)
+    finally:
+        if not session_detach(ws, sock):
+            outbox_close(ws)
+            if room_id:
+                await ttt_leave(room_id, pid)
+
+# ---- Turnuva modu (eleme ağacı) ----
+# Binlerce eşzamanlı maç için tahtalar oda dict'i yerine ortak, sıkı dizilerde
+# durur (slot = maç): X/O maskeleri 2'şer bayt, sıra 1 bayt; biten maçın slotu
+# serbest listesine döner. Ağaç heap düzeninde: düğüm k'nin çocukları 2k ve 2k+1,
+# yapraklar [size, 2*size) oyuncular (boş yaprak = bay). İki çocuğu da sonuçlanan
+# düğümde maç hemen açılır; turun tamamının bitmesi beklenmez.
+TTT_TOUR_MAX_PLAYERS = 4096
+TTT_TOUR_STATUS_EVERY = 1.0     # turnuva özeti en fazla bu aralıkla yayınlanır
+
+ttt_boards = {
+    "x": array("H"),
+    "o": array("H"),
+    "turn": bytearray(),        # 0 = X, 1 = O
+    "px": [],                   # X oyuncusunun pid'i
+    "po": [],                   # O oyuncusunun pid'i
+    "tour": [],                 # slotun ait olduğu turnuva dict'i
+    "node": array("i"),         # ağaçtaki düğüm
+    "free": [],
+    "live": 0,
+    "moves": 0,
+}
+
+def ttt_board_alloc(tour, node, px, po):
+    b = ttt_boards
+    if b["free"]:
+        slot = b["free"].pop()
+        b["x"][slot] = b["o"][slot] = b["turn"][slot] = 0
+        b["px"][slot], b["po"][slot], b["tour"][slot], b["node"][slot] = px, po, tour, node
+    else:
+        slot = len(b["x"])
+        b["x"].append(0)
+        b["o"].append(0)
+        b["turn"].append(0)
+        b["px"].append(px)
+        b["po"].append(po)
+        b["tour"].append(tour)
+        b["node"].append(node)
+    b["live"] += 1
+    tour["live"] += 1
+    return slot
+
+def ttt_board_release(slot):
+    b = ttt_boards
+    b["tour"][slot]["live"] -= 1
+    b["px"][slot] = b["po"][slot] = b["tour"][slot] = None
+    b["free"].append(slot)
+    b["live"] -= 1
+
+def ttt_board_move(slot, pid, idx):
+    """Hamleyi uygula: None (geçersiz), "" (oyun sürüyor) ya da "X" / "O" / "draw"."""
+    b = ttt_boards
+    turn = b["turn"][slot]
+    if pid != (b["po"] if turn else b["px"])[slot] or not 0 <= idx < 9:
+        return None
+    bit = 1 << idx
+    both = b["x"][slot] | b["o"][slot]
+    if both & bit:
+        return None
+    masks = b["o"] if turn else b["x"]
+    mine = masks[slot] | bit
+    masks[slot] = mine
+    b["turn"][slot] = turn ^ 1
+    b["moves"] += 1
+    # çizgiyi ancak hamleyi yapan tamamlayabilir
+    if TTT_WIN[mine]:
+        return "XO"[turn]
+    return "draw" if both | bit == TTT_FULL else ""
+
+def ttt_board_state(slot):
+    b = ttt_boards
+    return {"type": "state", "board": ttt_board_list(b["x"][slot], b["o"][slot]), "turn": "XO"[b["turn"][slot]]}
+
+def ttt_tour_new(tour_id):
+    return {
+        "tourId": tour_id,
+        "phase": "lobby",           # lobby / playing / done
+        "players": {},              # pid -> {name, ws, slot}
+        "host": None,
+        "size": 0,
+        "win": [],                  # düğüm -> kazanan pid (None = bay / herkes ayrıldı)
+        "done": bytearray(),        # düğüm sonuçlandı mı
+        "live": 0,                  # süren maç sayısı
+        "champion": None,
+        "status_timer": None,
+    }
+
+def ttt_tour_round(tour, node):
+    return tour["size"].bit_length() - node.bit_length()
+
+def ttt_tour_settle(tour, k, winner, started):
+    """Düğüm k sonuçlandı: kazananı yukarı taşı, iki tarafı hazır olan maçı aç."""
+    win, done, players = tour["win"], tour["done"], tour["players"]
+    while True:
+        win[k] = winner
+        done[k] = 1
+        if k == 1:
+            tour["champion"] = winner
+            tour["phase"] = "done"
+            return
+        k >>= 1
+        if not (done[2 * k] and done[2 * k + 1]):
+            return
+        a = win[2 * k] if win[2 * k] in players else None    # beklerken ayrılan oyuncu: bay
+        b = win[2 * k + 1] if win[2 * k + 1] in players else None
+        if a and b:
+            slot = ttt_board_alloc(tour, k, a, b)
+            players[a]["slot"] = players[b]["slot"] = slot
+            started.append(slot)
+            return
+        winner = a or b
+
+def ttt_tour_start(tour):
+    pids = list(tour["players"])
+    random.shuffle(pids)
+    size = 1 << (len(pids) - 1).bit_length()
+    tour.update({"phase": "playing", "size": size, "win": [None] * (2 * size), "done": bytearray(2 * size)})
+    # önce çift, sonra tek yapraklar: baylar yalnızca ilk turda kalır
+    leaves = list(range(0, size, 2)) + list(range(1, size, 2))
+    started = []
+    for i, leaf in enumerate(leaves):
+        ttt_tour_settle(tour, size + leaf, pids[i] if i < len(pids) else None, started)
+    return started
+
+async def ttt_tour_announce(tour, slots):
+    """Yeni açılan maçların iki oyuncusuna eşleşme ve boş tahta gönder."""
+    b, players = ttt_boards, tour["players"]
+    rounds = tour["size"].bit_length() - 1
+    pairs = []
+    for slot in slots:
+        px, po = b["px"][slot], b["po"][slot]
+        rnd = ttt_tour_round(tour, b["node"][slot])
+        state = json.dumps(ttt_board_state(slot))
+        for pid, mark, opp in ((px, "X", po), (po, "O", px)):
+            ws = players[pid]["ws"]
+            pairs.append((ws, {"type": "match", "round": rnd, "rounds": rounds, "mark": mark,
+                               "opponent": players[opp]["name"]}))
+            pairs.append((ws, state))
+    await fanout_many(tour, pairs)
+    ttt_tour_status_soon(tour)
+
+async def ttt_tour_match_end(tour, slot, winner):
+    b, players = ttt_boards, tour["players"]
+    px, po, node = b["px"][slot], b["po"][slot], b["node"][slot]
+    state = json.dumps(ttt_board_state(slot))
+    name = players[winner]["name"] if winner in players else None
+    pairs = []
+    for pid in (px, po):
+        pl = players.get(pid)
+        if pl is None:
+            continue
+        pl["slot"] = -1
+        pairs += [(pl["ws"], state), (pl["ws"], {"type": "match_result", "won": pid == winner, "winner": name,
+                                                   "round": ttt_tour_round(tour, node)})]
+    ttt_board_release(slot)
+    started = []
+    ttt_tour_settle(tour, node, winner, started)
+    await fanout_many(tour, pairs)
+    if started:
+        await ttt_tour_announce(tour, started)
+    ttt_tour_status_soon(tour)
+
+def ttt_tour_status_soon(tour):
+    if tour["status_timer"] is None:
+        tour["status_timer"] = timer_after(TTT_TOUR_STATUS_EVERY, ttt_tour_status, tour)
+
+async def ttt_tour_status(tour):
+    """Binlerce oyunculu turnuvada özet her olayda değil, saniyede en fazla bir kez gider."""
+    tour["status_timer"] = None
+    champ = tour["champion"]
+    payload = {"type": "tour", "phase": tour["phase"], "players": len(tour["players"]), "host": tour["host"],
+               "live": tour["live"], "rounds": max(0, tour["size"].bit_length() - 1),
+               "champion": tour["players"][champ]["name"] if champ in tour["players"] else None}
+    await fanout_broadcast(tour, [pl["ws"] for pl in tour["players"].values()], payload)
+
+@app.websocket("/ws/ttt-tour")
+async def ttt_tour_ws(ws: WebSocket):
+    await ws.accept()
+    pid = secrets.token_hex(4)
+    outbox_open(ws, pid)
+    tour = None
+    try:
+        while True:
+            data = json.loads(await ws.receive_text())
+            typ = data.get("type")
+
+            if typ == "join" and tour is None:
+                tour_id = str(data.get("tourId", ""))[:64]
+                if not tour_id:
+                    continue
+                t = ttt_tours.get(tour_id)
+                if t is None:
+                    t = ttt_tours[tour_id] = ttt_tour_new(tour_id)
+                if t["phase"] != "lobby":
+                    await ws_send(ws, {"type": "join_error", "reason": "started"})
+                    continue
+                if len(t["players"]) >= TTT_TOUR_MAX_PLAYERS:
+                    await ws_send(ws, {"type": "join_error", "reason": "full"})
+                    continue
+                tour = t
+                tour["players"][pid] = {"name": str(data.get("name", "anon"))[:24], "ws": ws, "slot": -1}
+                if tour["host"] is None:
+                    tour["host"] = pid
+                await ws_send(ws, {"type": "joined", "pid": pid, "isHost": tour["host"] == pid})
+                ttt_tour_status_soon(tour)
+
+            elif typ == "start" and tour is not None:
+                if tour["host"] != pid or tour["phase"] != "lobby":
+                    continue
+                if len(tour["players"]) < 2:
+                    await ws_send(ws, {"type": "info", "msg": "Turnuva için en az 2 oyuncu gerekli."})
+                    continue
+                started = ttt_tour_start(tour)
+                await ttt_tour_announce(tour, started)
+
+            elif typ == "move" and tour is not None:
+                slot = tour["players"][pid]["slot"]
+                if slot < 0:
+                    continue
+                try:
+                    idx = int(data.get("idx", -1))
+                except (TypeError, ValueError):
+                    continue
+                res = ttt_board_move(slot, pid, idx)
+                if res is None:
+                    continue
+                b = ttt_boards
+                if res == "draw":
+                    # berabere: aynı eşleşme, taraflar yer değiştirip yeniden oynar
+                    b["px"][slot], b["po"][slot] = b["po"][slot], b["px"][slot]
+                    b["x"][slot] = b["o"][slot] = b["turn"][slot] = 0
+                    sockets = [tour["players"][p]["ws"] for p in (b["px"][slot], b["po"][slot])]
+                    await fanout_broadcast(tour, sockets, {"type": "info", "msg": "Berabere! Taraflar değişti, tekrar."})
+                    await ttt_tour_announce(tour, [slot])
+                elif res:
+                    await ttt_tour_match_end(tour, slot, b["px"][slot] if res == "X" else b["po"][slot])
+                else:
+                    sockets = [tour["players"][p]["ws"] for p in (b["px"][slot], b["po"][slot])]
+                    await fanout_broadcast(tour, sockets, ttt_board_state(slot), "state")
+
     except WebSocketDisconnect:
         pass
     finally:
-        if room_id and room_id in ttt_rooms:
-            room = ttt_rooms[room_id]
-            if pid in room["players"]:
-                room["players"].pop(pid, None)
-            if not room["players"]:
-                ttt_rooms.pop(room_id, None)
+        outbox_close(ws)
+        if tour is not None and pid in tour["players"]:
+            pl = tour["players"].pop(pid)
+            if pl["slot"] >= 0:
+                # maç ortasında ayrılan hükmen kaybeder
+                b = ttt_boards
+                opp = b["po"][pl["slot"]] if b["px"][pl["slot"]] == pid else b["px"][pl["slot"]]
+                await ttt_tour_match_end(tour, pl["slot"], opp)
+            if not tour["players"]:
+                timer_cancel(tour["status_timer"])
+                if ttt_tours.get(tour["tourId"]) is tour:
+                    ttt_tours.pop(tour["tourId"])
             else:
-                if room.get("host_pid") == pid:
-                    new_host = next(iter(room["players"].keys()), None)
-                    room["host_pid"] = new_host
+                if tour["host"] == pid:
+                    tour["host"] = next(iter(tour["players"]))
+                ttt_tour_status_soon(tour)
 
 # ==========================
 # Codenames
@@ -1043,9 +2672,206 @@ CN_WORDS = [
     "KAMERA","DAĞ","DENİZ","BALIK","KEDİ","KÖPEK","UÇAK","TREN","MASA","SANDALYE",
     "ORMAN","HARİTA","PİZZA","LİMON","KALP","YILDIZ","OKUL","OYUN","DÜĞME","BİLGİSAYAR",
     "RADYO","TELEFON","BAHÇE","MÜZİK","SPOR","FUTBOL","ZİL","KAPI","ELDİVEN","KULAK",
-    "BURUN","GÖZLÜK","İSKELE","TİLKİ","ASLAN","TAVŞAN","KAZAK","ELBİSE","KUPA","FİLM"
+    "BURUN","GÖZLÜK","İSKELE","TİLKİ","ASLAN","TAVŞAN","KAZAK","ELBİSE","KUPA","FİLM",
+    "KALE","KRAL","KRALİÇE","ŞAPKA","AYAKKABI","GEMİ","DENİZALTI","ROKET","UZAY","GEZEGEN",
+    "KİTAP","DEFTER","SAAT","ANAHTAR","KİLİT","LAMBA","MUM","ATEŞ","BUZ","KAR",
+    "YAĞMUR","RÜZGAR","ŞİMŞEK","NEHİR","GÖL","ADA","ÇÖL","MAĞARA","VOLKAN","ORMANCI",
+    "DOKTOR","HEMŞİRE","POLİS","ASKER","KORSAN","HAYALET","EJDERHA","BÜYÜCÜ","ÖRÜMCEK","ARI",
 ]
 
+# Tahta boyutu -> renk dağılımı (5x5 klasik, 7x7 büyük tahta)
+CN_BOARDS = {
+    5: {"red": 9, "blue": 8, "neut": 7, "ass": 1},
+    7: {"red": 17, "blue": 16, "neut": 14, "ass": 2},
+}
+
+# ---- Bot spymaster ----
+# İpuçları bir çağrışım matrisinden seçilir: satır = ipucu kelimesi, sütun = kart
+# kelimesi, değer = çağrışım gücü (0..1). Matris .npy olarak diskte durur, worker
+# süreçlerinde ilk ihtiyaçta mmap ile açılır (sayfa önbelleği süreçler arasında
+# paylaşılır). Yanındaki .json sözlüğü {"clues": [...], "words": [...]} satır/sütun
+# adlarını verir; dışarıdan (ör. gömme vektörlerinden) üretilmiş bir matris aynı
+# biçimde bırakılabilir. Dosya yoksa aşağıdaki gruplardan üretilir.
+CN_BOT = "bot"              # spymaster alanında bot yer tutucusu
+CN_ASSOC_PATH = os.environ.get("CN_ASSOC_PATH") or os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "codenames", "assoc.npy")
+CN_BOT_MIN_ASSOC = 0.3      # bundan zayıf çağrışım hedef sayılmaz
+CN_BOT_MARGIN = 0.15        # hedef, en güçlü rakip/suikastçı çağrışımını bu kadar geçmeli
+
+# ipucu -> kart kelimeleri ("~" zayıf çağrışım)
+CN_CLUE_GROUPS = {
+    "HAYVAN": "KEDİ KÖPEK TİLKİ ASLAN TAVŞAN BALIK ARI ÖRÜMCEK ~EJDERHA",
+    "EVCİL": "KEDİ KÖPEK ~TAVŞAN ~BALIK",
+    "SU": "DENİZ GÖL NEHİR YAĞMUR ~BALIK ~BUZ ~GEMİ ~İSKELE ~ADA",
+    "GÖKYÜZÜ": "AY GÜNEŞ BULUT YILDIZ ~UÇAK ~ŞİMŞEK ~ROKET",
+    "ASTRONOT": "UZAY ROKET GEZEGEN ~AY ~YILDIZ",
+    "ULAŞIM": "ARABA TREN UÇAK GEMİ ~KÖPRÜ ~DENİZALTI ~ROKET",
+    "LİMAN": "GEMİ İSKELE ~DENİZ ~KORSAN ~ADA",
+    "HAZİNE": "KORSAN HARİTA ADA ~ANAHTAR ~MAĞARA ~KUPA",
+    "SATRANÇ": "KALE KRAL KRALİÇE ~ASKER",
+    "MASAL": "EJDERHA BÜYÜCÜ KRALİÇE KRAL ~HAYALET ~KALE ~MAĞARA",
+    "KORKU": "HAYALET ÖRÜMCEK ~MAĞARA ~EJDERHA ~MUM",
+    "GİYSİ": "KAZAK ELBİSE ŞAPKA AYAKKABI ELDİVEN ~GÖZLÜK ~DÜĞME",
+    "KIŞ": "KAR BUZ KAZAK ELDİVEN ~RÜZGAR",
+    "FIRTINA": "RÜZGAR ŞİMŞEK YAĞMUR BULUT ~KAR",
+    "YÜZ": "KULAK BURUN GÖZLÜK ~KALP",
+    "HASTANE": "DOKTOR HEMŞİRE ~KALP ~KULAK",
+    "ÜNİFORMA": "POLİS ASKER HEMŞİRE ~DOKTOR",
+    "IŞIK": "LAMBA MUM GÜNEŞ ~ATEŞ ~YILDIZ ~ŞİMŞEK",
+    "ALEV": "ATEŞ MUM VOLKAN ~EJDERHA",
+    "SICAK": "ÇÖL GÜNEŞ ATEŞ VOLKAN ~PİZZA",
+    "DOĞA": "ORMAN DAĞ NEHİR GÖL ~ORMANCI ~BAHÇE ~MAĞARA",
+    "AĞAÇ": "ORMAN ORMANCI BAHÇE ~ELMA ~LİMON ~MASA",
+    "MEYVE": "ELMA LİMON ~BAHÇE ~PİZZA",
+    "YEMEK": "PİZZA ELMA LİMON BALIK ~MASA",
+    "MOBİLYA": "MASA SANDALYE ~LAMBA ~KAPI ~PENCERE",
+    "EV": "KAPI PENCERE MASA SANDALYE ANAHTAR ~LAMBA ~BAHÇE",
+    "GÜVENLİK": "KİLİT ANAHTAR POLİS ~KAPI ~KAMERA ~KALE",
+    "DERS": "KALEM DEFTER KİTAP OKUL ~ÇANTA ~ZİL ~BİLGİSAYAR",
+    "KIRTASİYE": "KALEM DEFTER ~KİTAP ~ÇANTA",
+    "TEKNOLOJİ": "BİLGİSAYAR TELEFON ROBOT KAMERA RADYO ~ROKET",
+    "MAKİNE": "ROBOT BİLGİSAYAR ~ARABA ~SAAT ~TREN",
+    "SES": "MÜZİK RADYO ZİL TELEFON ~KULAK ~ŞİMŞEK",
+    "ŞARKI": "MÜZİK RADYO ~KULAK ~FİLM",
+    "SİNEMA": "FİLM KAMERA ~MÜZİK ~HAYALET",
+    "MAÇ": "FUTBOL SPOR KUPA OYUN ~AYAKKABI",
+    "ŞAMPİYON": "KUPA ~FUTBOL ~SPOR ~KRAL ~ASLAN",
+    "ZAMAN": "SAAT ~ZİL ~GÜNEŞ ~AY",
+    "BAL": "ARI ~BAHÇE ~ELMA",
+    "AŞK": "KALP ~KRALİÇE ~YILDIZ ~MÜZİK",
+    "YÜKSEK": "DAĞ KÖPRÜ ~UÇAK ~VOLKAN ~ROKET ~YILDIZ",
+    "GEÇİT": "KÖPRÜ ~NEHİR ~DAĞ ~KAPI",
+    "TUŞ": "DÜĞME TELEFON BİLGİSAYAR ~ZİL ~KİLİT",
+    "GÖMLEK": "DÜĞME ~KAZAK ~ELBİSE",
+    "SEYAHAT": "ÇANTA HARİTA UÇAK TREN ~GEMİ ~ARABA ~ADA",
+    "DERİN": "DENİZALTI DENİZ MAĞARA ~GÖL ~NEHİR",
+    "ODUN": "ORMANCI ATEŞ ORMAN ~MUM",
+    "BAKIŞ": "GÖZLÜK KAMERA PENCERE ~FİLM",
+    "SAVAŞ": "ASKER KALE ~KORSAN ~EJDERHA ~KRAL",
+    "SİHİR": "BÜYÜCÜ ~EJDERHA ~HAYALET ~MUM",
+    "KUM": "ÇÖL ADA ~DENİZ ~SAAT",
+    "AĞ": "ÖRÜMCEK BALIK ~BİLGİSAYAR ~FUTBOL",
+}
+
+_cn_assoc = None            # süreç başına: (matris, ipuçları, kelime->sütun, ipucu->satır, sıralı ipuçları, sıra)
+
+def cn_assoc_digest():
+    return zlib.crc32(json.dumps([CN_WORDS, CN_CLUE_GROUPS], ensure_ascii=False).encode("utf-8"))
+
+def cn_assoc_build():
+    """Gömülü gruplardan matrisi üretip CN_ASSOC_PATH'e yaz (atomik)."""
+    clues = list(CN_CLUE_GROUPS)
+    col = {w: i for i, w in enumerate(CN_WORDS)}
+    m = np.zeros((len(clues), len(CN_WORDS)), dtype=np.float32)
+    for r, clue in enumerate(clues):
+        for w in CN_CLUE_GROUPS[clue].split():
+            m[r, col[w.lstrip("~")]] = 0.5 if w.startswith("~") else 1.0
+    os.makedirs(os.path.dirname(CN_ASSOC_PATH), exist_ok=True)
+    meta_path = os.path.splitext(CN_ASSOC_PATH)[0] + ".json"
+    tmp = ".%d.tmp" % os.getpid()
+    with open(CN_ASSOC_PATH + tmp, "wb") as f:
+        np.save(f, m)
+    with open(meta_path + tmp, "w", encoding="utf-8") as f:
+        json.dump({"clues": clues, "words": CN_WORDS, "builtin": cn_assoc_digest()}, f, ensure_ascii=False)
+    os.replace(CN_ASSOC_PATH + tmp, CN_ASSOC_PATH)
+    os.replace(meta_path + tmp, meta_path)
+
+def cn_assoc():
+    global _cn_assoc
+    if _cn_assoc is None:
+        meta_path = os.path.splitext(CN_ASSOC_PATH)[0] + ".json"
+        for attempt in (0, 1):
+            try:
+                with open(meta_path, encoding="utf-8") as f:
+                    meta = json.load(f)
+                m = np.load(CN_ASSOC_PATH, mmap_mode="r")
+                ok = (m.ndim == 2 and m.shape == (len(meta["clues"]), len(meta["words"]))
+                      and meta.get("builtin", cn_assoc_digest()) == cn_assoc_digest())
+            except (OSError, ValueError, KeyError):
+                ok = False
+            if ok or attempt:
+                break
+            cn_assoc_build()
+        if not ok:
+            raise RuntimeError("codenames çağrışım matrisi okunamadı: " + CN_ASSOC_PATH)
+        clues = [c.upper() for c in meta["clues"]]
+        order = sorted(range(len(clues)), key=clues.__getitem__)
+        _cn_assoc = (m, clues, {w.upper(): i for i, w in enumerate(meta["words"])},
+                     {c: i for i, c in enumerate(clues)}, [clues[i] for i in order], order)
+    return _cn_assoc
+
+def cn_bot_banned(words, pos, sorted_clues, order):
+    """Karttaki bir kelimeyle önek ilişkisi olan ipuçları (KAR/KARTAL, ORMAN/ORMANCI) yasak."""
+    banned = []
+    for w in words:
+        lo = bisect.bisect_left(sorted_clues, w)
+        while lo < len(sorted_clues) and sorted_clues[lo].startswith(w):
+            banned.append(order[lo])
+            lo += 1
+        banned += [pos[w[:k]] for k in range(1, len(w)) if w[:k] in pos]
+    return banned
+
+def cn_bot_clue(words, team, opp, neut, ass):
+    """Worker sürecinde çalışır. words: tahtadaki kelimeler; diğerleri açılmamış kart
+    indeksleri. Tüm ipuçları tek vektörel geçişte puanlanır -> (ipucu, sayı, ms)."""
+    started = time.perf_counter()
+    m, clues, col, pos, sorted_clues, order = cn_assoc()
+    cols = np.array([col.get(w, -1) for w in words])
+    a = np.array(m[:, np.maximum(cols, 0)], dtype=np.float32)
+    a[:, cols < 0] = 0.0                        # sözlükte olmayan kelime: çağrışım yok
+
+    def strongest(idx):
+        return a[:, idx].max(axis=1) if idx else np.zeros(len(clues), dtype=np.float32)
+    opp_max, neut_max, ass_max = strongest(opp), strongest(neut), strongest(ass)
+    cutoff = np.maximum(np.maximum(opp_max, ass_max) + CN_BOT_MARGIN, np.maximum(neut_max, CN_BOT_MIN_ASSOC))
+    g = a[:, team]
+    hit = g >= cutoff[:, None]
+    count = hit.sum(axis=1)
+    score = count + 0.1 * (g * hit).sum(axis=1) - 3.0 * ass_max - 1.0 * opp_max - 0.3 * neut_max
+    # hiçbir kartı güvenle işaret etmeyen ipucu yalnızca son çare
+    score = np.where(count > 0, score, g.max(axis=1, initial=0.0) - 3.0 * ass_max - opp_max - 100.0)
+    score[cn_bot_banned(words, pos, sorted_clues, order)] = -np.inf
+    best = int(np.argmax(score))
+    if not np.isfinite(score[best]):
+        return None, 0, (time.perf_counter() - started) * 1000.0
+    return clues[best], max(1, int(count[best])), (time.perf_counter() - started) * 1000.0
+
+cn_bot_stats = {"clues": 0, "failed": 0, "last_ms": 0.0, "max_ms": 0.0}
+
+def cn_bot_maybe(room_id):
+    """Sıra bot spymaster'da ve ipucu yoksa arka planda ipucu üret."""
+    room = cn_rooms.get(room_id)
+    if not room or room.get("phase") != "play" or room["spymaster"][room["turn"]] != CN_BOT:
+        return
+    if room["clue"]["word"] is not None or room.get("bot_task"):
+        return
+    room["bot_task"] = asyncio.create_task(cn_bot_turn(room_id, room, room["turn"]))
+
+async def cn_bot_turn(room_id, room, team):
+    groups = {"red": [], "blue": [], "neut": [], "ass": []}
+    mask = room["revealed_mask"]
+    for i, c in enumerate(room["colors"]):
+        if not mask >> i & 1:
+            groups[c].append(i)
+    opp = "blue" if team == "red" else "red"
+    try:
+        word, count, ms = await run_cpu(cn_bot_clue, room["words"], groups[team], groups[opp], groups["neut"], groups["ass"])
+    except Exception:
+        log.exception("codenames bot: ipucu araması başarısız (oda %s)", room_id)
+        word = None
+    finally:
+        room["bot_task"] = None
+    # bekerken oyun bitmiş / sıra değişmiş olabilir
+    if cn_rooms.get(room_id) is not room or room["turn"] != team or room["clue"]["word"] is not None:
+        return
+    if word is None:
+        cn_bot_stats["failed"] += 1
+        await cn_broadcast(room, {"type":"info","msg":"Bot ipucu bulamadı, sırayı bitirebilirsiniz."})
+        return
+    cn_bot_stats["clues"] += 1
+    cn_bot_stats["last_ms"] = round(ms, 3)
+    cn_bot_stats["max_ms"] = max(cn_bot_stats["max_ms"], cn_bot_stats["last_ms"])
+    await cn_give_clue(room, word, count)
+
 def cn_new_state_lobby():
     return {
         "phase":"lobby",
@@ -1053,15 +2879,21 @@ def cn_new_state_lobby():
         "spymaster": {"red":None,"blue":None}
     }
 
-def cn_new_board():
-    words = random.sample(CN_WORDS, 25)
-    colors = ['red']*9 + ['blue']*8 + ['neut']*7 + ['ass']*1
+def cn_new_board(size=5):
+    mix = CN_BOARDS[size]
+    n = size * size
+    words = random.sample(CN_WORDS, n)
+    colors = [c for c, k in mix.items() for _ in range(k)]
     random.shuffle(colors)
     return {
         "phase":"play",
+        "size": size,
         "words": words,
         "colors": colors,
-        "revealed": [],
+        "revealed": [],             # açılış sırası (istemciye giden liste)
+        "revealed_mask": 0,         # aynı küme bitmask olarak: O(1) "açıldı mı?"
+        "op_colors": ['neut']*n,    # operatif görünümü, açıldıkça güncellenir
+        "left": {"red": mix["red"], "blue": mix["blue"]},
         "turn": "red",
         "clue": {"word": None, "count": 0},
         "guessesLeft": 0,
@@ -1069,14 +2901,30 @@ def cn_new_board():
         "spymaster":{"red":None,"blue":None}
     }
 
+def cn_reveal(room, idx):
+    """Kartı aç; zaten açıksa None, değilse kartın rengini döner."""
+    bit = 1 << idx
+    if room["revealed_mask"] & bit:
+        return None
+    room["revealed_mask"] |= bit
+    room["revealed"].append(idx)
+    color = room["colors"][idx]
+    room["op_colors"][idx] = color
+    if color in room["left"]:
+        room["left"][color] -= 1
+    return color
 
 async def cn_broadcast(room, payload):
-    dead=[]
-    for pid, pl in list(room["players"].items()):
-        ws = pl["ws"]
-        try: await ws.send_text(json.dumps(payload))
-        except: dead.append(pid)
-    for pid in dead: room["players"].pop(pid, None)
+    ckpt_touch(room)
+    by_ws = {id(pl["ws"]): pid for pid, pl in room["players"].items()}
+    dead = await fanout_broadcast(room, [pl["ws"] for pl in room["players"].values()], payload)
+    for ws in dead: room["players"].pop(by_ws.get(id(ws)), None)
+
+async def cn_give_clue(room, word, count):
+    room["clue"] = {"word":word, "count":count}
+    room["guessesLeft"] = max(0,count) + 1
+    await cn_broadcast(room, {"type":"info","msg":f"İpucu: {word} ({count})"})
+    await cn_push_play(room)
 
 async def cn_push_lobby(room):
     lobby = {
@@ -1087,32 +2935,31 @@ async def cn_push_lobby(room):
     await cn_broadcast(room, {"type":"lobby_state","state":lobby})
 
 async def cn_push_play(room):
-    for pid, pl in list(room["players"].items()):
-        ws=pl["ws"]
-        try:
-            if pl.get("role")=="spymaster":
-                state = {
-                    "words": room["words"], "colors": room["colors"],
-                    "revealed": room["revealed"], "turn": room["turn"],
-                    "clue": room["clue"], "guessesLeft": room["guessesLeft"]
-                }
-            else:
-                colors_view=['neut']*25
-                for i in room["revealed"]: colors_view[i]=room["colors"][i]
-                state = {
-                    "words": room["words"], "colors": colors_view,
-                    "revealed": room["revealed"], "turn": room["turn"],
-                    "clue": room["clue"], "guessesLeft": room["guessesLeft"]
-                }
-            payload = {"type":"state","state":state,"you":{"team":pl.get("team"),"role":pl.get("role")}}
-            await ws.send_text(json.dumps(payload))
-        except: pass
+    """Yalnızca iki farklı tahta görünümü var (spymaster / operatif): her biri bir kez
+    encode edilir, aynı (görünüm, takım, rol) anahtarına düşen oyuncular aynı metni paylaşır."""
+    ckpt_touch(room)
+    common = {"words": room["words"], "revealed": room["revealed"], "turn": room["turn"],
+              "clue": room["clue"], "guessesLeft": room["guessesLeft"], "left": room["left"],
+              "cols": room.get("size", 5)}
+    views = {}
+    encoded = {}
+    pairs = []
+    for pl in list(room["players"].values()):
+        view = "spymaster" if pl.get("role") == "spymaster" else "operative"
+        key = (view, pl.get("team"), pl.get("role"))
+        msg = encoded.get(key)
+        if msg is None:
+            if view not in views:
+                colors = room["colors"] if view == "spymaster" else room["op_colors"]
+                views[view] = json.dumps(dict(common, colors=colors))
+            you = json.dumps({"team": pl.get("team"), "role": pl.get("role")})
+            msg = encoded[key] = '{"type": "state", "state": %s, "you": %s}' % (views[view], you)
+        pairs.append((pl["ws"], msg))
+    await fanout_many(room, pairs, "state")
 
 def cn_check_win(room):
-    red_left = sum(1 for i,c in enumerate(room["colors"]) if c=='red' and i not in room["revealed"])
-    blue_left = sum(1 for i,c in enumerate(room["colors"]) if c=='blue' and i not in room["revealed"])
-    if red_left==0: return "red"
-    if blue_left==0: return "blue"
+    if room["left"]["red"]==0: return "red"
+    if room["left"]["blue"]==0: return "blue"
     return None
 
 def cn_requirements_ok(room):
@@ -1124,16 +2971,49 @@ def cn_requirements_ok(room):
     blue_ops = any(pl.get("role")=="operative" for pl in blues)
     return red_spy and blue_spy and (red_ops or blue_ops) and len(room["players"])>=2
 
+async def cn_resync(room_id, pid, ws):
+    """Tek oyuncu için güncel lobi / oyun state'i."""
+    room = cn_rooms.get(room_id)
+    if not room:
+        return
+    if room.get("phase") == "play":
+        await cn_push_play(room)
+        return
+    pl = room["players"][pid]
+    await ws_send(ws, {"type":"you","team":pl["team"],"role":pl["role"]})
+    await cn_push_lobby(room)
+
+async def cn_leave(room_id, pid):
+    """Oyuncu ayrıldı: spymaster koltuğunu boşalt, oda boşaldıysa kapat."""
+    room = cn_rooms.get(room_id)
+    if not room:
+        return
+    for t in ("red","blue"):
+        if room.get("spymaster",{}).get(t)==pid:
+            room["spymaster"][t]=None
+    if "players" in room and pid in room["players"]:
+        room["players"].pop(pid, None)
+    if not room.get("players"): cn_rooms.pop(room_id, None)
+
 @app.websocket("/ws/codenames")
 async def cn_ws(ws: WebSocket):
     await ws.accept()
+    sock = ws
     pid = secrets.token_hex(3)
+    outbox_open(ws, pid)
     room_id = None
     try:
         while True:
-            data = json.loads(await ws.receive_text())
+            data = json.loads(await sock.receive_text())
             typ = data.get("type")
 
+            if typ == "resume" and room_id is None:
+                # kısa kopmadan dönüş: koltuk, oturumun ilk soketi üzerinden sürer
+                sess = await session_resume(sock, data, "codenames")
+                if sess:
+                    ws, room_id, pid = sess["ws"], sess["room_id"], sess["pid"]
+                continue
+
             if typ == "join":
                 room_id = data["roomId"]
                 name = data.get("name", "anon")[:24]
@@ -1147,9 +3027,19 @@ async def cn_ws(ws: WebSocket):
                     cn_rooms[room_id] = cn_new_state_lobby()
 
                 room = cn_rooms[room_id]
+                old_pid = ckpt_reclaim("codenames", room_id, room["players"], data.get("token"))
+                if old_pid:
+                    # yeniden başlatma öncesindeki koltuk (takım / rol korunur)
+                    pid = old_pid
+                    room["players"][pid]["ws"] = ws
+                    await ws_send(ws, {"type": "joined", "pid": pid})
+                    session_open(ws, "codenames", room_id, pid)
+                    await cn_resync(room_id, pid, ws)
+                    continue
                 room["players"][pid] = {"name": name,"team": None,"role": None,"ws": ws}
 
                 await ws_send(ws, {"type": "joined", "pid": pid})
+                session_open(ws, "codenames", room_id, pid)
                 await cn_push_lobby(room)
 
             if typ=="set_team_role" and room_id:
@@ -1181,11 +3071,29 @@ async def cn_ws(ws: WebSocket):
                 if not cn_requirements_ok(room):
                     await ws_send(ws, {"type":"info","msg":"Başlatmak için iki takımda da 1 spymaster ve oyuncular olmalı."})
                     continue
-                play = cn_new_board()
+                size = data.get("size", 5)
+                # liste / dict gibi hash'lenemeyen değerler dict aramasında TypeError atar
+                play = cn_new_board(size if isinstance(size, int) and size in CN_BOARDS else 5)
                 play["players"] = room["players"]
                 play["spymaster"] = room["spymaster"]
                 cn_rooms[room_id] = play
                 await cn_push_play(play)
+                cn_bot_maybe(room_id)
+
+            if typ=="set_bot" and room_id:
+                # boş spymaster koltuğuna bot oturt / kaldır (yalnız lobide)
+                room = cn_rooms.get(room_id)
+                if not room or room.get("phase")=="play": continue
+                team = data.get("team")
+                if team not in ("red","blue"): continue
+                if data.get("on", True):
+                    if room["spymaster"][team] is not None:
+                        await ws_send(ws, {"type":"info","msg":"Bu takımın spymaster'ı dolu."})
+                        continue
+                    room["spymaster"][team] = CN_BOT
+                elif room["spymaster"][team] == CN_BOT:
+                    room["spymaster"][team] = None
+                await cn_push_lobby(room)
 
             if typ=="clue" and room_id:
                 room = cn_rooms.get(room_id)
@@ -1195,10 +3103,7 @@ async def cn_ws(ws: WebSocket):
                     continue
                 word = str(data.get("word","")).strip().upper()[:20]
                 count = int(data.get("count",0))
-                room["clue"] = {"word":word, "count":count}
-                room["guessesLeft"] = max(0,count) + 1
-                await cn_broadcast(room, {"type":"info","msg":f"İpucu: {word} ({count})"})
-                await cn_push_play(room)
+                await cn_give_clue(room, word, count)
 
             if typ=="guess" and room_id:
                 room = cn_rooms.get(room_id)
@@ -1206,11 +3111,13 @@ async def cn_ws(ws: WebSocket):
                 pl = room["players"].get(pid);
                 if not pl or pl.get("role")!="operative" or pl.get("team")!=room["turn"]:
                     continue
-                idx = int(data.get("idx",-1))
-                if idx<0 or idx>=25 or idx in room["revealed"]: continue
-
-                room["revealed"].append(idx)
-                color = room["colors"][idx]
+                try:
+                    idx = int(data.get("idx",-1))
+                except (TypeError, ValueError):
+                    continue
+                if idx<0 or idx>=len(room["words"]): continue
+                color = cn_reveal(room, idx)
+                if color is None: continue
 
                 if color=='ass':
                     winner = 'blue' if room["turn"]=='red' else 'red'
@@ -1232,6 +3139,7 @@ async def cn_ws(ws: WebSocket):
                     room["clue"] = {"word":None,"count":0}
 
                 await cn_push_play(room)
+                cn_bot_maybe(room_id)
 
             if typ=="end_turn" and room_id:
                 room = cn_rooms.get(room_id)
@@ -1243,116 +3151,602 @@ async def cn_ws(ws: WebSocket):
                 room["clue"] = {"word":None,"count":0}
                 room["guessesLeft"] = 0
                 await cn_push_play(room)
+                cn_bot_maybe(room_id)
 
-    except WebSocketDisconnect:
-        pass
+    except WebSocketDisconnect as e:
+        if e.code == 1000:      # istemci bilerek kapattı: koltuk beklemez
+            session_end(ws)
     finally:
-        if room_id and room_id in cn_rooms:
-            room = cn_rooms[room_id]
-            for t in ("red","blue"):
-                if room.get("spymaster",{}).get(t)==pid:
-                    room["spymaster"][t]=None
-            if "players" in room and pid in room["players"]:
-                room["players"].pop(pid, None)
-            if not room.get("players"): cn_rooms.pop(room_id, None)
+        if not session_detach(ws, sock):
+            outbox_close(ws)
+            if room_id:
+                await cn_leave(room_id, pid)
 
 # ==========================
 # Pixel War (Kare Kapmaca)
 # ==========================
 GRID_SIZE = 36
+GRID_COLS = 6
 COLORS = ["#e74c3c", "#3498db", "#f1c40f", "#9b59b6", "#2ecc71", "#e67e22"]
+PIXEL_FRAME = TIMER_TICK    # tıklamalar bu aralıkla tek "diff" mesajında toplanır
+
+# Tahta: hücre başına 1 bayt palet indeksi (0 = boş, k = COLORS[k-1]).
+# counts[k] o renge ait hücre sayısı; hücre el değiştirince O(1) güncellenir.
+def pixel_new_board(room):
+    room["board"] = bytearray(GRID_SIZE)
+    room["counts"] = [GRID_SIZE] + [0] * len(COLORS)
+    room["pending"] = {}    # idx -> yeni değer (bir frame içindeki son tıklama geçerli)
+    timer_cancel(room.get("flush_timer"))
+    room["flush_timer"] = None
+
+def pixel_set_cell(room, idx, value) -> bool:
+    board = room["board"]
+    old = board[idx]
+    if old == value:
+        return False
+    board[idx] = value
+    counts = room["counts"]
+    counts[old] -= 1
+    counts[value] += 1
+    room["pending"][idx] = value
+    if room["flush_timer"] is None:
+        room["flush_timer"] = timer_after(PIXEL_FRAME, pixel_flush, room["roomId"])
+    return True
 
-async def pixel_timer(room_id):
-    for i in range(30, -1, -1):
-        if room_id not in pixel_rooms: return
-        room = pixel_rooms[room_id]
-        for p in room["players"]:
-            try: await p["ws"].send_text(json.dumps({"type": "tick", "seconds": i}))
-            except: pass
-        await asyncio.sleep(1)
-
-    if room_id in pixel_rooms:
-        room = pixel_rooms[room_id]
-        room["active"] = False
-        counts = {}
-        for c in room["board"]:
-            if c: counts[c] = counts.get(c, 0) + 1
-
-        winner_name = "Kimse"
-        max_score = -1
-        for p in room["players"]:
-            score = counts.get(p["color"], 0)
-            if score > max_score:
-                max_score = score
-                winner_name = p["name"]
-
-        msg = {"type": "game_over", "winner": winner_name}
-        for p in room["players"]:
-            try: await p["ws"].send_text(json.dumps(msg))
-            except: pass
-
-def calculate_scores(room):
-    counts = {}
-    for c in room["board"]:
-        if c: counts[c] = counts.get(c, 0) + 1
-    scores = {}
-    for p in room["players"]:
-        scores[p["name"]] = counts.get(p["color"], 0)
-    return scores
+def pixel_scores(room):
+    counts = room["counts"]
+    return {p["name"]: counts[p["color_idx"]] for p in room["players"]}
+
+def pixel_state_msg(room):
+    return {"type": "state", "board": base64.b64encode(room["board"]).decode("ascii"),
+            "scores": pixel_scores(room)}
+
+async def pixel_flush(room_id):
+    """Frame boyunca biriken hücre değişikliklerini tek mesajda yayınla."""
+    room = pixel_rooms.get(room_id)
+    if not room:
+        return
+    room["flush_timer"] = None
+    pending = room["pending"]
+    if not pending:
+        return
+    room["pending"] = {}
+    cells = []
+    for idx, value in pending.items():
+        cells += (idx, value)
+    # diff'ler birleşemez (sırayla uygulanmalı) -> event sınıfı
+    await pixel_broadcast(room, {"type": "diff", "cells": cells, "scores": pixel_scores(room)})
+
+async def pixel_broadcast(room, payload, cls="event"):
+    ckpt_touch(room)
+    await fanout_broadcast(room, [p["ws"] for p in room["players"]], payload, cls)
+
+PIXEL_GAME_SECONDS = 30
+
+def pixel_start_timer(room_id):
+    room = pixel_rooms[room_id]
+    timer_cancel(room.get("timer"))
+    room["seconds"] = PIXEL_GAME_SECONDS
+    room["deadline"] = asyncio.get_running_loop().time()
+    room["timer"] = timer_at(room["deadline"], pixel_tick, room_id)
+
+async def pixel_tick(room_id):
+    # saniyede bir, zamanlayıcı çarkından (oda başına uyuyan görev yok)
+    room = pixel_rooms.get(room_id)
+    if not room:
+        return
+    i = room["seconds"]
+    if i >= 0:
+        room["seconds"] = i - 1
+        room["deadline"] += 1
+        room["timer"] = timer_at(room["deadline"], pixel_tick, room_id)
+        await pixel_broadcast(room, {"type": "tick", "seconds": i})
+        return
+
+    room["timer"] = None
+    room["active"] = False
+    # Bekleyen son tıklamalar game_over'dan önce gitsin
+    timer_cancel(room.get("flush_timer"))
+    await pixel_flush(room_id)
+
+    winner_name = "Kimse"
+    max_score = -1
+    for name, score in pixel_scores(room).items():
+        if score > max_score:
+            max_score = score
+            winner_name = name
+
+    await pixel_broadcast(room, {"type": "game_over", "winner": winner_name})
+
+# ---- Dev tuval modu (r/place tarzı) ----
+# Tek bir büyük tuval, parçalara (chunk) bölünür. İstemci yalnızca görüş
+# alanındaki parçalara abone olur: abonelikte parça snapshot'ı, sonrasında
+# frame başına birleştirilmiş parça diff'leri (istemci başına tek ikili mesaj).
+#
+# Snapshot: b"S" + <HHHH cx, cy, w, h> + zlib(w*h bayt palet indeksi)
+# Diff:     b"D" + <H blok> + blok*( <HHH cx, cy, n> + n*<HB yerel idx, değer> )
+PIXEL_CANVAS_W = 1000
+PIXEL_CANVAS_H = 1000
+PIXEL_CHUNK = 64
+PIXEL_COOLDOWN = 1.0        # oyuncu başına iki yerleştirme arası saniye
+PIXEL_COOLDOWN_SLACK = 0.1  # ağ titreşimi payı: kuralına uyan istemci reddedilmesin
+PIXEL_VIEW_MAX_CHUNKS = 64  # tek görüş alanında abone olunabilecek en fazla parça
+PIXEL_CANVAS_PALETTE = ["#ffffff", "#e4e4e4", "#888888", "#222222", "#ffa7d1", "#e50000", "#e59500", "#a06a42",
+                        "#e5d900", "#94e044", "#02be01", "#00d3dd", "#0083c7", "#0000ea", "#cf6ee4", "#820080"]
+PIXEL_SNAP_HEAD = struct.Struct("<HHHH")
+PIXEL_BLOCK_HEAD = struct.Struct("<HHH")
+PIXEL_CELL = struct.Struct("<HB")
+
+async def pixel_new_canvas(room_id):
+    """Tuval odasını kurar: dosya işi (kilit, günlük oynatma, msync) iş parçacığında,
+    oda pixel_rooms'a ancak açılış bitince girer."""
+    room = {
+        "roomId": room_id,
+        "mode": "canvas",
+        "players": [],
+        "board": None,      # mmap üzerinde memoryview, 0 = boş (beyaz)
+        "chunk_subs": {},   # (cx, cy) -> abone ws kümesi
+        "chunk_cache": {},  # (cx, cy) -> sıkıştırılmış snapshot (parça değişince silinir)
+        "dirty": {},        # (cx, cy) -> {yerel idx: değer}
+        "flush_timer": None,
+        "canvas_stats": {"placed": 0, "cooldown": 0, "frames": 0, "snapshots": 0,
+                         "replayed": 0, "journal_bytes": 0, "checkpoints": 0},
+    }
+    try:
+        await asyncio.to_thread(pixel_canvas_open, room)
+        room["sync_timer"] = timer_after(PIXEL_JOURNAL_SYNC_SECONDS, pixel_canvas_sync, room)
+        bp_subscribe(f"pixelwar/{room_id}", pixel_canvas_deliver)
+        pixel_rooms[room_id] = room
+    finally:
+        pixel_canvas_opening.pop(room_id, None)
+    return room
+
+async def pixel_canvas_get(room_id):
+    """Tuval odasını döner; aynı anda katılanlar aynı açılışı bekler."""
+    opening = pixel_canvas_opening.get(room_id)
+    if opening is None:
+        opening = pixel_canvas_opening[room_id] = asyncio.create_task(pixel_new_canvas(room_id))
+    return await asyncio.shield(opening)
+
+# ---- Kalıcılık: mmap'li tuval dosyası + değişiklik günlüğü ----
+# <oda>.canvas: başlık + W*H bayt; hücre yazımı doğrudan sayfa önbelleğine gider,
+# süreç çökse de kaybolmaz. <oda>.journal: her yerleştirme 5 bayt (<IB idx, değer>),
+# frame başına tek write ile eklenir ve saniyede bir fdatasync edilir. Kayıtlar
+# mutlak değer olduğundan yeniden oynatmak idempotenttir: açılışta günlüğün tamamı
+# oynatılır. Checkpoint'te (msync) kapsanan kayıtlar günlükten atılır.
+# Aynı tuvali birden çok worker açabilir (MAP_SHARED: hücreler sayfa önbelleğinde
+# ortak). Her worker kendi günlüğüne yazar; dosyayı açık tutan herkes paylaşımlı
+# flock tutar. Günlükler yalnızca tuvali açık tutan başka süreç yokken (özel
+# kilit) oynatılır; aksi halde sayfa önbelleği zaten günceldir. Farklı
+# worker'ların günlükleri arasında sıra yoktur: son checkpoint'ten beri aynı
+# hücreye birden çok worker yazdıysa, çökme sonrası bu değerlerden biri kalır.
+PIXEL_DATA_DIR = os.environ.get("PIXEL_DATA_DIR") or os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "pixelwar")
+PIXEL_FILE_HEAD = struct.Struct("<4sHII")    # sihirli, sürüm, w, h
+PIXEL_FILE_MAGIC = b"PXC1"
+PIXEL_JOURNAL_REC = struct.Struct("<IB")
+PIXEL_JOURNAL_SYNC_SECONDS = 1
+PIXEL_CHECKPOINT_EVERY = 30                  # bu kadar senkronda bir msync + günlük kırpma
+
+pixel_canvas_opening: Dict[str, asyncio.Task] = {}     # oda id -> süren açılış (disk işi iş parçacığında)
+pixel_canvas_closing: Dict[str, asyncio.Task] = {}     # oda id -> süren kapanış (disk işi iş parçacığında)
+
+def pixel_canvas_path(room_id):
+    if re.fullmatch(r"[A-Za-z0-9_-]{1,64}", room_id):
+        return os.path.join(PIXEL_DATA_DIR, "n-" + room_id)
+    return os.path.join(PIXEL_DATA_DIR, "x-" + room_id.encode("utf-8").hex()[:128])
+
+def pixel_journal_paths(base):
+    return [base + ".journal"] + sorted(glob.glob(glob.escape(base) + ".w*.journal"))
+
+def pixel_canvas_exists(room_id):
+    return os.path.exists(pixel_canvas_path(room_id) + ".canvas")
+
+def pixel_canvas_open(room):
+    """İş parçacığında: tuval dosyasını eşle (yoksa oluştur); tek açan bizsek
+    günlükleri üzerine oynat."""
+    os.makedirs(PIXEL_DATA_DIR, exist_ok=True)
+    base = pixel_canvas_path(room["roomId"])
+    path = base + ".canvas"
+    head = PIXEL_FILE_HEAD.pack(PIXEL_FILE_MAGIC, 1, PIXEL_CANVAS_W, PIXEL_CANVAS_H)
+    size = PIXEL_FILE_HEAD.size + PIXEL_CANVAS_W * PIXEL_CANVAS_H
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        alone = True
+    except BlockingIOError:
+        fcntl.flock(fd, fcntl.LOCK_SH)     # başka worker açık tutuyor: dosya hazır
+        alone = False
+    if alone and (os.fstat(fd).st_size != size or os.pread(fd, len(head), 0) != head):
+        if os.fstat(fd).st_size:
+            # boyutu/biçimi uymayan eski tuval: silmek yerine kenara al
+            os.close(fd)
+            os.replace(path, path + ".old")
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        os.ftruncate(fd, size)
+        os.pwrite(fd, head, 0)
+    mm = mmap.mmap(fd, size)
+    board = memoryview(mm)[PIXEL_FILE_HEAD.size:]
+
+    # worker 0 (ve tek süreç) eski adı kullanır
+    jpath = base + (".journal" if hub["shard"] == 0 else f".w{hub['shard']}.journal")
+    jfd = os.open(jpath, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+    n = 0
+    if alone:
+        for p in pixel_journal_paths(base):
+            try:
+                data = open(p, "rb").read()
+            except FileNotFoundError:
+                continue
+            k = len(data) // PIXEL_JOURNAL_REC.size     # yarım kalmış son kayıt atlanır
+            for idx, value in PIXEL_JOURNAL_REC.iter_unpack(data[:k * PIXEL_JOURNAL_REC.size]):
+                if idx < len(board):
+                    board[idx] = value
+            n += k
+        if n:
+            # oynatılanlar dosyaya insin; eski kayıtlar sonradan yeni hücreleri ezmesin
+            mm.flush()
+            pixel_journal_truncate(base)
+        fcntl.flock(fd, fcntl.LOCK_SH)
+    room["canvas_stats"]["replayed"] = n
+
+    room.update({"mm": mm, "board": board, "journal_fd": jfd, "journal_path": jpath, "lock_fd": fd,
+                 "journal": bytearray(), "syncs": 0, "io_busy": False, "closing": False})
+
+def pixel_journal_truncate(base):
+    for p in pixel_journal_paths(base):
+        try:
+            os.truncate(p, 0)
+        except FileNotFoundError:
+            pass
+
+def pixel_journal_write(room):
+    buf = room["journal"]
+    if buf and not room["io_busy"]:     # fd iş parçacığında (kırpılıyor olabilir): tamponda bekler
+        os.write(room["journal_fd"], buf)
+        room["canvas_stats"]["journal_bytes"] += len(buf)
+        buf.clear()
+
+def pixel_journal_compact(room, covered):
+    """msync'in kapsadığı ilk `covered` baytı at; sonradan eklenenleri koru.
+    Yeni içerik önce geçici dosyaya yazılıp yerine taşınır (yarım kırpma olmasın)."""
+    fd = room["journal_fd"]
+    end = os.lseek(fd, 0, os.SEEK_END)
+    tail = os.pread(fd, end - covered, covered) if end > covered else b""
+    tmp = room["journal_path"] + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(tail)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, room["journal_path"])
+    os.close(fd)
+    room["journal_fd"] = os.open(room["journal_path"], os.O_RDWR | os.O_APPEND)
+    room["canvas_stats"]["checkpoints"] += 1
+
+async def pixel_canvas_sync(room):
+    """Saniyede bir: günlüğü diske indir; her PIXEL_CHECKPOINT_EVERY'de bir checkpoint."""
+    if room.get("mm") is None or room["closing"]:
+        return
+    room["sync_timer"] = None
+    room["syncs"] += 1
+    pixel_journal_write(room)
+    room["io_busy"] = True
+    try:
+        if room["syncs"] % PIXEL_CHECKPOINT_EVERY == 0:
+            covered = os.lseek(room["journal_fd"], 0, os.SEEK_END)
+            await asyncio.to_thread(room["mm"].flush)
+            await asyncio.to_thread(pixel_journal_compact, room, covered)
+        else:
+            await asyncio.to_thread(getattr(os, "fdatasync", os.fsync), room["journal_fd"])
+    finally:
+        room["io_busy"] = False
+    if not room["closing"]:
+        room["sync_timer"] = timer_after(PIXEL_JOURNAL_SYNC_SECONDS, pixel_canvas_sync, room)
+
+def pixel_canvas_release(room):
+    """İş parçacığında: msync, günlüğü kırp, eşlemeyi ve dosyaları bırak."""
+    room["mm"].flush()
+    pixel_journal_compact(room, os.lseek(room["journal_fd"], 0, os.SEEK_END))
+    try:
+        # son açan bizdik: msync herkesin hücrelerini kapsadı, günlükler boşalır
+        fcntl.flock(room["lock_fd"], fcntl.LOCK_EX | fcntl.LOCK_NB)
+        pixel_journal_truncate(pixel_canvas_path(room["roomId"]))
+    except BlockingIOError:
+        pass
+    room["board"].release()
+    room["mm"].close()
+    os.close(room["journal_fd"])
+    os.close(room["lock_fd"])
+
+async def pixel_canvas_close(room):
+    """Son checkpoint'i al ve eşlemeyi bırak (oda boşaldığında / kapanışta)."""
+    if room.get("mm") is None or room["closing"]:
+        return
+    room["closing"] = True
+    timer_cancel(room.get("sync_timer"))
+    try:
+        while room["io_busy"]:
+            await asyncio.sleep(0.01)   # süren senkron önce biter
+        pixel_journal_write(room)
+        room["io_busy"] = True
+        room["chunk_cache"].clear()
+        await asyncio.to_thread(pixel_canvas_release, room)
+        room["mm"] = room["board"] = None
+    finally:
+        pixel_canvas_closing.pop(room["roomId"], None)
+
+async def pixel_canvas_settle(room_id):
+    """Aynı tuvalin önceki örneği hâlâ kapanıyorsa dosyaları bırakmasını bekle."""
+    closing = pixel_canvas_closing.get(room_id)
+    if closing is not None:
+        await asyncio.shield(closing)
+
+async def pixel_canvas_shutdown():
+    await asyncio.gather(*list(pixel_canvas_opening.values()), return_exceptions=True)
+    await asyncio.gather(*(pixel_canvas_close(room) for room in list(pixel_rooms.values()) if room.get("mode") == "canvas"),
+                         *list(pixel_canvas_closing.values()))
+
+def pixel_chunk_rect(cx, cy):
+    x0, y0 = cx * PIXEL_CHUNK, cy * PIXEL_CHUNK
+    return x0, y0, min(PIXEL_CHUNK, PIXEL_CANVAS_W - x0), min(PIXEL_CHUNK, PIXEL_CANVAS_H - y0)
+
+def pixel_chunk_snapshot(room, key) -> bytes:
+    cached = room["chunk_cache"].get(key)
+    if cached is None:
+        x0, y0, w, h = pixel_chunk_rect(*key)
+        board = room["board"]
+        rows = b"".join(board[(y0 + r) * PIXEL_CANVAS_W + x0:(y0 + r) * PIXEL_CANVAS_W + x0 + w] for r in range(h))
+        cached = b"S" + PIXEL_SNAP_HEAD.pack(key[0], key[1], w, h) + zlib.compress(rows, 1)
+        room["chunk_cache"][key] = cached
+    return cached
+
+def pixel_view_chunks(data) -> set:
+    """Görüş alanı (piksel dikdörtgeni) -> kapsadığı parça kümesi."""
+    try:
+        x, y = int(data.get("x", 0)), int(data.get("y", 0))
+        w, h = int(data.get("w", 0)), int(data.get("h", 0))
+    except (TypeError, ValueError):
+        return set()
+    cols = -(-PIXEL_CANVAS_W // PIXEL_CHUNK)
+    rows = -(-PIXEL_CANVAS_H // PIXEL_CHUNK)
+    cx0, cy0 = max(0, x // PIXEL_CHUNK), max(0, y // PIXEL_CHUNK)
+    cx1, cy1 = min(cols - 1, (x + max(w, 1) - 1) // PIXEL_CHUNK), min(rows - 1, (y + max(h, 1) - 1) // PIXEL_CHUNK)
+    keys = {(cx, cy) for cy in range(cy0, cy1 + 1) for cx in range(cx0, cx1 + 1)}
+    if len(keys) > PIXEL_VIEW_MAX_CHUNKS:
+        keys = set(sorted(keys, key=lambda k: (k[1], k[0]))[:PIXEL_VIEW_MAX_CHUNKS])
+    return keys
+
+async def pixel_canvas_view(room, player, keys):
+    """Aboneliği yeni görüş alanına taşı; yeni parçaların snapshot'larını gönder."""
+    ws = player["ws"]
+    old = player["chunks"]
+    for key in old - keys:
+        subs = room["chunk_subs"].get(key)
+        if subs:
+            subs.discard(ws)
+            if not subs:
+                del room["chunk_subs"][key]
+    for key in keys - old:
+        room["chunk_subs"].setdefault(key, set()).add(ws)
+        await ws_send(ws, pixel_chunk_snapshot(room, key))
+        room["canvas_stats"]["snapshots"] += 1
+    player["chunks"] = keys
+
+def pixel_canvas_place(room, player, data) -> dict | None:
+    """Yerleştirmeyi uygula; reddedilirse istemciye gidecek mesajı döndür."""
+    now = asyncio.get_running_loop().time()
+    if now < player["next_at"] - PIXEL_COOLDOWN_SLACK:
+        room["canvas_stats"]["cooldown"] += 1
+        return {"type": "cooldown", "wait": round(player["next_at"] - now, 3)}
+    try:
+        x, y, c = int(data.get("x")), int(data.get("y")), int(data.get("c"))
+    except (TypeError, ValueError):
+        return None
+    if not (0 <= x < PIXEL_CANVAS_W and 0 <= y < PIXEL_CANVAS_H and 1 <= c <= len(PIXEL_CANVAS_PALETTE)):
+        return None
+    player["next_at"] = now + PIXEL_COOLDOWN
+    room["canvas_stats"]["placed"] += 1
+    idx = y * PIXEL_CANVAS_W + x
+    if room["board"][idx] == c:
+        return None
+    room["board"][idx] = c
+    room["journal"] += PIXEL_JOURNAL_REC.pack(idx, c)
+    key = (x // PIXEL_CHUNK, y // PIXEL_CHUNK)
+    room["chunk_cache"].pop(key, None)
+    local = (y % PIXEL_CHUNK) * PIXEL_CHUNK + (x % PIXEL_CHUNK)
+    room["dirty"].setdefault(key, {})[local] = c
+    if room["flush_timer"] is None:
+        room["flush_timer"] = timer_after(PIXEL_FRAME, pixel_canvas_flush, room["roomId"])
+    return None
+
+async def pixel_canvas_flush(room_id):
+    """Frame boyunca kirlenen parçaların diff bloklarını arka düzleme bir kez yayınla;
+    her süreç (bu dahil) kendi abonelerine dağıtır."""
+    room = pixel_rooms.get(room_id)
+    if not room:
+        return
+    room["flush_timer"] = None
+    pixel_journal_write(room)
+    dirty, room["dirty"] = room["dirty"], {}
+    if dirty:
+        bp_publish(f"pixelwar/{room_id}", b"".join(
+            PIXEL_BLOCK_HEAD.pack(key[0], key[1], len(cells)) + b"".join(PIXEL_CELL.pack(i, v) for i, v in cells.items())
+            for key, cells in dirty.items()))
+
+async def pixel_canvas_deliver(topic, blocks: bytes):
+    """Bir frame'in diff blokları (bu ya da başka worker'dan) -> her yerel aboneye tek mesaj."""
+    room = pixel_rooms.get(topic.partition("/")[2])
+    if not room or room.get("board") is None:
+        return
+    per_ws = {}
+    off = 0
+    while off < len(blocks):
+        cx, cy, n = PIXEL_BLOCK_HEAD.unpack_from(blocks, off)
+        end = off + PIXEL_BLOCK_HEAD.size + n * PIXEL_CELL.size
+        room["chunk_cache"].pop((cx, cy), None)     # başka worker yazmış olabilir
+        for ws in room["chunk_subs"].get((cx, cy), ()):
+            per_ws.setdefault(ws, []).append(blocks[off:end])
+        off = end
+    if not per_ws:
+        return
+    room["canvas_stats"]["frames"] += 1
+    await fanout_many(room, [(ws, b"D" + struct.pack("<H", len(parts)) + b"".join(parts))
+                             for ws, parts in per_ws.items()])
+
+def pixel_canvas_leave(room, player):
+    for key in player.get("chunks", ()):
+        subs = room["chunk_subs"].get(key)
+        if subs:
+            subs.discard(player["ws"])
+            if not subs:
+                del room["chunk_subs"][key]
+
+async def pixel_resync(room_id, pid, ws):
+    room = pixel_rooms.get(room_id)
+    if not room:
+        return
+    if room.get("mode") != "canvas":
+        await ws_send(ws, pixel_state_msg(room))
+        return
+    # abonelik düşürülüp yeniden kurulur: görünen parçaların snapshot'ları tekrar gider
+    player = next((p for p in room["players"] if p["pid"] == pid), None)
+    if player is None:
+        return
+    keys = player["chunks"]
+    await pixel_canvas_view(room, player, set())
+    await pixel_canvas_view(room, player, keys)
+
+def pixel_leave(room_id, pid):
+    """Oyuncu ayrıldı: listeden çıkar, oda boşaldıysa zamanlayıcıları / tuvali kapat."""
+    room = pixel_rooms.get(room_id)
+    if not room:
+        return
+    player = next((p for p in room["players"] if p["pid"] == pid), None)
+    room["players"] = [p for p in room["players"] if p["pid"] != pid]
+    if player and room.get("mode") == "canvas":
+        pixel_canvas_leave(room, player)
+    if not room["players"]:
+        timer_cancel(room.get("timer"))
+        timer_cancel(room.get("flush_timer"))
+        del pixel_rooms[room_id]
+        if room.get("mode") == "canvas":
+            bp_unsubscribe(f"pixelwar/{room_id}", pixel_canvas_deliver)
+            pixel_canvas_closing[room_id] = asyncio.create_task(pixel_canvas_close(room))
 
 @app.websocket("/ws/pixelwar")
 async def pixel_ws(ws: WebSocket):
     await ws.accept()
+    sock = ws
     room_id = None
+    player = None
     pid = secrets.token_hex(3)
+    outbox_open(ws, pid)
     try:
         while True:
-            data = json.loads(await ws.receive_text())
+            data = json.loads(await sock.receive_text())
             typ = data.get("type")
 
+            if typ == "resume" and room_id is None:
+                # kısa kopmadan dönüş: koltuk, oturumun ilk soketi üzerinden sürer
+                sess = await session_resume(sock, data, "pixelwar")
+                if sess:
+                    room = pixel_rooms.get(sess["room_id"])
+                    player = next((p for p in room["players"] if p["pid"] == sess["pid"]), None) if room else None
+                    if player is None:
+                        # resync beklenirken oda kapandı / oyuncu çıktı: resume başarısız,
+                        # bağlantı kendi kuyruğuyla baştan katılabilir
+                        session_end(sess["ws"])
+                        outbox_close(sess["ws"])
+                        outbox_open(sock, pid)
+                        session_stats["misses"] += 1
+                        await ws_send(sock, {"type": "resume_error", "reason": "expired"})
+                        continue
+                    ws, room_id, pid = sess["ws"], sess["room_id"], sess["pid"]
+                continue
+
             if typ == "join":
                 room_id = data["roomId"]
-                name = data.get("name", "Anonim")
+                name = str(data.get("name", "Anonim"))[:24]
+                if room_id not in pixel_rooms:
+                    await pixel_canvas_settle(room_id)
                 if room_id not in pixel_rooms:
-                    pixel_rooms[room_id] = {"players": [], "board": [None]*GRID_SIZE, "active": False}
+                    if data.get("mode") == "canvas" or pixel_canvas_exists(room_id):
+                        await pixel_canvas_get(room_id)
+                    elif not hub_owns("pixelwar", room_id):
+                        # küçük tahtalar worker'lara yayılamaz (span bağlantısı): sahibine gitmeli
+                        await ws_send(ws, {"type": "join_error", "reason": "wrong_worker"})
+                        room_id = None
+                        continue
+                    else:
+                        pixel_rooms[room_id] = {"roomId": room_id, "players": [], "active": False, "timer": None}
+                        pixel_new_board(pixel_rooms[room_id])
 
                 room = pixel_rooms[room_id]
-                color_idx = len(room["players"]) % len(COLORS)
-                my_color = COLORS[color_idx]
+                if room.get("mode") == "canvas":
+                    player = {"pid": pid, "name": name, "ws": ws, "chunks": set(), "next_at": 0.0}
+                    room["players"].append(player)
+                    await ws_send(ws, {"type": "welcome", "mode": "canvas", "w": PIXEL_CANVAS_W, "h": PIXEL_CANVAS_H,
+                                       "chunk": PIXEL_CHUNK, "palette": PIXEL_CANVAS_PALETTE, "cooldown": PIXEL_COOLDOWN})
+                    session_open(ws, "pixelwar", room_id, pid)
+                    continue
+
+                old_pid = ckpt_reclaim("pixelwar", room_id, room["players"], data.get("token"))
+                if old_pid:
+                    # yeniden başlatma öncesindeki oyuncu: rengi (ve hücreleri) onun
+                    pid = old_pid
+                    player = next(p for p in room["players"] if p["pid"] == pid)
+                    player["ws"] = ws
+                    my_color = player["color"]
+                else:
+                    color_idx = len(room["players"]) % len(COLORS)
+                    my_color = COLORS[color_idx]
 
-                room["players"].append({"pid": pid, "name": name, "color": my_color, "ws": ws})
-                await ws.send_text(json.dumps({"type": "welcome", "color": my_color}))
+                    player = {"pid": pid, "name": name, "color": my_color, "color_idx": color_idx + 1, "ws": ws}
+                    room["players"].append(player)
+                await ws_send(ws, {"type": "welcome", "color": my_color, "palette": COLORS,
+                                   "size": GRID_SIZE, "cols": GRID_COLS})
+                session_open(ws, "pixelwar", room_id, pid)
+                await ws_send(ws, pixel_state_msg(room))
 
-                scores = calculate_scores(room)
-                await ws.send_text(json.dumps({"type": "state", "board": room["board"], "scores": scores}))
+            elif room_id is None or player is None:
+                continue
 
-            elif typ == "start" and room_id:
+            elif pixel_rooms[room_id].get("mode") == "canvas":
+                room = pixel_rooms[room_id]
+                if typ == "view":
+                    await pixel_canvas_view(room, player, pixel_view_chunks(data))
+                elif typ == "place":
+                    reply = pixel_canvas_place(room, player, data)
+                    if reply:
+                        await ws_send(ws, reply)
+
+            elif typ == "start":
                 room = pixel_rooms[room_id]
                 if not room["active"]:
                     room["active"] = True
-                    room["board"] = [None] * GRID_SIZE
-                    asyncio.create_task(pixel_timer(room_id))
-                    scores = calculate_scores(room)
-                    broadcast = json.dumps({"type": "state", "board": room["board"], "scores": scores})
-                    for p in room["players"]: await p["ws"].send_text(broadcast)
+                    pixel_new_board(room)
+                    pixel_start_timer(room_id)
+                    await pixel_broadcast(room, pixel_state_msg(room), "state")
 
-            elif typ == "click" and room_id:
+            elif typ == "click":
                 room = pixel_rooms[room_id]
-                if not room["active"]: continue
-                player = next((p for p in room["players"] if p["pid"] == pid), None)
-                if player:
+                if not room["active"]:
+                    continue
+                try:
                     idx = int(data.get("idx", 0))
-                    if 0 <= idx < GRID_SIZE:
-                        room["board"][idx] = player["color"]
-                        scores = calculate_scores(room)
-                        broadcast = json.dumps({"type": "state", "board": room["board"], "scores": scores})
-                        for p in room["players"]: await p["ws"].send_text(broadcast)
+                except (TypeError, ValueError):
+                    continue
+                if 0 <= idx < GRID_SIZE:
+                    pixel_set_cell(room, idx, player["color_idx"])
 
-    except WebSocketDisconnect:
-        if room_id and room_id in pixel_rooms:
-            room = pixel_rooms[room_id]
-            room["players"] = [p for p in room["players"] if p["pid"] != pid]
-            if not room["players"]: del pixel_rooms[room_id]
+    except WebSocketDisconnect as e:
+        if e.code == 1000:      # istemci bilerek kapattı: koltuk beklemez
+            session_end(ws)
+    finally:
+        if not session_detach(ws, sock):
+            outbox_close(ws)
+            if room_id:
+                pixel_leave(room_id, pid)
 
 
 # ==========================
@@ -1360,18 +3754,24 @@ async def pixel_ws(ws: WebSocket):
 # ==========================
 liars_rooms = {}
 
-def liars_new_room():
+def liars_new_room(room_id):
     return {
-        "players": {},           # pid -> {name, ws, cards[], alive, position}
+        "roomId": room_id,
+        "players": {},           # pid -> {name, ws, cards[], alive, position, bot}
         "phase": "lobby",        # lobby, playing, roulette, game_over
         "turn": None,            # Sıradaki oyuncu pid
         "turn_order": [],        # Oyuncu sırası
         "current_claim": None,   # {card: "Q/K/A/JOKER", count: 1-4, pid: ""}
         "pile": [],              # Masadaki kartlar {card: "Q/K/A/JOKER", pid: ""}
         "roulette": None,        # {chamber: 0-5, current: 0, victim: pid}
-        "deck": []               # Kalan kartlar
+        "deck": [],              # Kalan kartlar
+        "bot_task": None         # düşünen botun görevi (aynı anda tek)
     }
 
+# 32 kartlık desteden oyuncu başına 8 kart: en fazla 4 koltuk (bot dahil);
+# bot modeli de (LIARS_DECK) 8'er kartlık elleri bu desteden varsayar
+LIARS_MAX_PLAYERS = 4
+
 def liars_create_deck():
     """32 kart: Q,K,A'dan 10'ar + 2 Joker"""
     deck = []
@@ -1382,46 +3782,64 @@ def liars_create_deck():
     return deck
 
 async def liars_broadcast(room, payload):
-    msg = json.dumps(payload)
-    dead = []
-    for pid, pl in list(room["players"].items()):
-        ws = pl["ws"]
-        try:
-            await ws.send_text(msg)
-        except Exception:
-            dead.append(pid)
-    for pid in dead:
-        room["players"].pop(pid, None)
+    ckpt_touch(room)
+    by_ws = {id(pl["ws"]): pid for pid, pl in room["players"].items()}
+    dead = await fanout_broadcast(room, [pl["ws"] for pl in room["players"].values()], payload)
+    for ws in dead:
+        liars_seat_drop(room, by_ws.get(id(ws)))
+    if dead:
+        liars_bot_maybe(room)
+
+def liars_seat_drop(room, pid):
+    """Oyuncu ayrıldı: lobide koltuk silinir, oyun sürerken koltuğu bot devralır
+    (sıra düzeni bozulmaz, oda ayakta kalır)."""
+    pl = room["players"].get(pid)
+    if pl is None:
+        return
+    if room["phase"] == "lobby":
+        room["players"].pop(pid)
+    else:
+        pl["ws"] = None
+        pl["bot"] = True
+        pl.pop("restored", None)
+
+def liars_lobby_payload(room):
+    return {
+        "type": "lobby_update",
+        "players": {p: {"name": pl["name"], "bot": pl.get("bot", False)} for p, pl in room["players"].items()}
+    }
 
 async def liars_push_state(room):
     """Her oyuncuya kendi kartlarını ve genel durumu gönder"""
-    alive_players = {pid: {"name": pl["name"], "alive": pl["alive"], "card_count": len(pl["cards"]), "position": pl["position"], "shots_used": pl.get("shots_used", 0)}
+    ckpt_touch(room)
+    alive_players = {pid: {"name": pl["name"], "alive": pl["alive"], "card_count": len(pl["cards"]), "position": pl["position"], "shots_used": pl.get("shots_used", 0), "bot": pl.get("bot", False)}
                      for pid, pl in room["players"].items()}
 
+    pairs = []
     for pid, pl in room["players"].items():
-        ws = pl["ws"]
-        try:
-            # Sadece hayattaysa kendi kartlarını göster, ölüyse boş liste
-            my_cards = pl["cards"] if pl["alive"] else []
-
-            state = {
-                "type": "state",
-                "phase": room["phase"],
-                "players": alive_players,
-                "my_cards": my_cards,
-                "my_alive": pl["alive"],
-                "turn": room["turn"],
-                "current_claim": room["current_claim"],
-                "pile_count": len(room["pile"]),
-                "round_card": room.get("round_card")  # Turda atılacak kart
-            }
-            await ws.send_text(json.dumps(state))
-        except:
-            pass
+        if pl["ws"] is None:
+            continue
+        # Sadece hayattaysa kendi kartlarını göster, ölüyse boş liste
+        my_cards = pl["cards"] if pl["alive"] else []
+
+        state = {
+            "type": "state",
+            "phase": room["phase"],
+            "players": alive_players,
+            "my_cards": my_cards,
+            "my_alive": pl["alive"],
+            "turn": room["turn"],
+            "current_claim": room["current_claim"],
+            "pile_count": len(room["pile"]),
+            "round_card": room.get("round_card")  # Turda atılacak kart
+        }
+        pairs.append((pl["ws"], state))
+    await fanout_many(room, pairs, "state")
+    liars_bot_maybe(room)
 
 def liars_start_game(room):
     """Oyunu başlat - kartları dağıt"""
-    if len(room["players"]) < 2:
+    if not 2 <= len(room["players"]) <= LIARS_MAX_PLAYERS:
         return False
 
     # Desteden oluştur ve karıştır
@@ -1494,16 +3912,25 @@ async def liars_start_roulette(room, victim_pid):
         "chamber": 1,  # İlk çekiş
         "shots_used": shots_used  # Şu ana kadar kullanılan mermi
     })
+    liars_bot_maybe(room)
+
+LIARS_SHOT_DELAY = 2      # animasyon için bekleme (vuruldu)
+LIARS_SAFE_DELAY = 1      # animasyon için bekleme (kurtuldu)
 
 async def liars_pull_trigger(room):
     """Tetiği çek"""
     roulette = room["roulette"]
+    if roulette.get("resolved"):
+        return
     victim_pid = roulette["victim"]
     remaining_chambers = roulette.get("remaining_chambers", 6)
 
     # Mevcut çekiş remaining_chambers'ı aştıysa, kesinlikle ölme
     is_shot = roulette["current"] == roulette["chamber"] and roulette["current"] < remaining_chambers
     roulette["current"] += 1
+    # Animasyon bitene kadar tekrar tetik çekilemesin
+    roulette["resolved"] = True
+    roulette["shot"] = is_shot
 
     # Mermi kullanımını artır
     if victim_pid in room["players"]:
@@ -1514,17 +3941,23 @@ async def liars_pull_trigger(room):
         room["players"][victim_pid]["alive"] = False
         room["players"][victim_pid]["cards"] = []  # Kartlarını temizle
 
-        await liars_broadcast(room, {
-            "type": "roulette_result",
-            "victim": victim_pid,
-            "shot": True,
-            "chamber": roulette["current"],  # Kaçıncı çekişte patladı
-            "shots_used": room["players"][victim_pid].get("shots_used", 0)  # Toplam kullanılan mermi
-        })
+    await liars_broadcast(room, {
+        "type": "roulette_result",
+        "victim": victim_pid,
+        "shot": is_shot,
+        "chamber": roulette["current"],  # Kaçıncı çekişte patladı / şu anki pozisyon
+        "shots_used": room["players"][victim_pid].get("shots_used", 0) if victim_pid in room["players"] else 0  # Toplam kullanılan mermi
+    })
 
-        await asyncio.sleep(2)  # Animasyon için bekleme
+    # Animasyon süresi handler'ı bekletmez: devamı zamanlayıcı çarkından
+    timer_after(LIARS_SHOT_DELAY if is_shot else LIARS_SAFE_DELAY, liars_after_roulette, room, is_shot)
 
-        # Kazanan var mı?
+async def liars_after_roulette(room, is_shot):
+    if room["phase"] != "roulette":
+        return
+
+    # Kazanan var mı?
+    if is_shot:
         winner = liars_check_winner(room)
         if winner:
             await liars_broadcast(room, {
@@ -1532,85 +3965,315 @@ async def liars_pull_trigger(room):
                 "winner": winner,
                 "winner_name": room["players"][winner]["name"]
             })
-        else:
-            # Oyuna devam - yeni tur, yeni kartlar dağıt
-            room["phase"] = "playing"
-            caller_pid = room["roulette"].get("caller")  # Blöf diyen kişi
-            room["roulette"] = None
-            room["pile"] = []
-            room["current_claim"] = None
-            room["round_card"] = random.choice(["Q", "K", "A"])  # Yeni kart türü
-
-            # Canlı oyunculara yeni kartlar dağıt (komple yenile)
-            alive_players = [pid for pid, pl in room["players"].items() if pl["alive"]]
-
-            # Yeni deste oluştur
-            room["deck"] = liars_create_deck()
-
-            # Her canlı oyuncuya yeni 8 kart dağıt (eskilerini sil)
-            for pid in alive_players:
-                room["players"][pid]["cards"] = []
-                for _ in range(8):
-                    if room["deck"]:
-                        room["players"][pid]["cards"].append(room["deck"].pop())
-
-            # Sıra blöf diyende (eğer hayattaysa)
-            if caller_pid and caller_pid in alive_players:
-                room["turn"] = caller_pid
-            else:
-                liars_next_turn(room)
-            await liars_push_state(room)
+            return
+
+    # Oyuna devam - yeni tur, yeni kartlar dağıt
+    room["phase"] = "playing"
+    caller_pid = room["roulette"].get("caller")  # Blöf diyen kişi
+    room["roulette"] = None
+    room["pile"] = []
+    room["current_claim"] = None
+    room["round_card"] = random.choice(["Q", "K", "A"])  # Yeni kart türü
+
+    # Canlı oyunculara yeni kartlar dağıt (komple yenile)
+    alive_players = [pid for pid, pl in room["players"].items() if pl["alive"]]
+
+    # Yeni deste oluştur
+    room["deck"] = liars_create_deck()
+
+    # Her canlı oyuncuya yeni 8 kart dağıt (eskilerini sil)
+    for pid in alive_players:
+        room["players"][pid]["cards"] = []
+        for _ in range(8):
+            if room["deck"]:
+                room["players"][pid]["cards"].append(room["deck"].pop())
+
+    # Sıra blöf diyende (eğer hayattaysa)
+    if caller_pid and caller_pid in alive_players:
+        room["turn"] = caller_pid
     else:
-        # Kurtuldu
+        liars_next_turn(room)
+    await liars_push_state(room)
+
+async def liars_play_cards(room, pid, card_indices):
+    """Sıradaki oyuncunun kartlarını masaya koy (insan ve bot ortak yolu)."""
+    if not card_indices or len(card_indices) > 4:
+        return False
+
+    # Sunucu tarafından belirlenen kart türünü kullan
+    claimed_card = room.get("round_card", "Q")
+
+    player = room["players"][pid]
+
+    # Kartları kontrol et ve ata
+    played_cards = []
+    for idx in sorted(card_indices, reverse=True):
+        if 0 <= idx < len(player["cards"]):
+            card = player["cards"].pop(idx)
+            played_cards.append(card)
+            room["pile"].append({"card": card, "pid": pid})
+
+    room["current_claim"] = {
+        "card": claimed_card,
+        "count": len(played_cards),
+        "pid": pid
+    }
+
+    # Tüm kartları bitirdiyse kazandı
+    if len(player["cards"]) == 0:
+        room["phase"] = "game_over"
+        await liars_broadcast(room, {
+            "type": "game_over",
+            "winner": pid,
+            "winner_name": player["name"]
+        })
+    else:
+        liars_next_turn(room)
+        await liars_push_state(room)
         await liars_broadcast(room, {
-            "type": "roulette_result",
-            "victim": victim_pid,
-            "shot": False,
-            "chamber": roulette["current"],  # Şu anki pozisyon (kaçıncı çekiş)
-            "shots_used": room["players"][victim_pid].get("shots_used", 0)  # Toplam kullanılan mermi
+            "type": "play_made",
+            "player": pid,
+            "player_name": player["name"],
+            "claim": room["current_claim"]
         })
+    return True
 
-        await asyncio.sleep(1)  # Animasyon için bekleme
+async def liars_call_liar(room, pid):
+    """Son iddiayı aç; yalansa iddia eden, doğruysa yalan diyen rulete girer."""
+    caller_player = room["players"][pid]
+    claim = room["current_claim"]
+    claimer_pid = claim["pid"]
+    claimed_card = claim["card"]
 
-        # Oyuna devam et - yeni tur, yeni kartlar dağıt
-        room["phase"] = "playing"
-        caller_pid = room["roulette"].get("caller")  # Blöf diyen kişi
-        room["roulette"] = None
-        room["pile"] = []
-        room["current_claim"] = None
-        room["round_card"] = random.choice(["Q", "K", "A"])  # Yeni kart türü
-
-        # Canlı oyunculara yeni kartlar dağıt (komple yenile)
-        alive_players = [pid for pid, pl in room["players"].items() if pl["alive"]]
-
-        # Yeni deste oluştur
-        room["deck"] = liars_create_deck()
-
-        # Her canlı oyuncuya yeni 8 kart dağıt (eskilerini sil)
-        for pid in alive_players:
-            room["players"][pid]["cards"] = []
-            for _ in range(8):
-                if room["deck"]:
-                    room["players"][pid]["cards"].append(room["deck"].pop())
-
-        # Sıra blöf diyende (eğer hayattaysa)
-        if caller_pid and caller_pid in alive_players:
-            room["turn"] = caller_pid
+    # Pile'daki son atılan kartları kontrol et
+    last_cards = room["pile"][-claim["count"]:]
+
+    # Joker ve iddia edilen kartı kabul et
+    is_valid = all(c["card"] == claimed_card or c["card"] == "JOKER" for c in last_cards)
+
+    await liars_broadcast(room, {
+        "type": "liar_called",
+        "caller": pid,
+        "caller_name": caller_player["name"],
+        "claimer": claimer_pid,
+        "cards_revealed": [c["card"] for c in last_cards],
+        "valid": is_valid
+    })
+
+    # Rusça rulet
+    victim = claimer_pid if not is_valid else pid
+    await liars_start_roulette(room, victim)
+    # Blöf diyen kişiyi kaydet
+    room["roulette"]["caller"] = pid
+
+# ==========================
+# Liar's Bar botları (Monte Carlo)
+# ==========================
+# Eller 4'lü sayaç (Q, K, A, Joker) olarak kodlanır. Bot kendi elini ve masaya
+# kendi attığı kartları bilir; geri kalan bileşimden (liars_create_deck: 10/10/10/2)
+# rakip elleri numpy ile binlerce kez birden örneklenir. Simülasyon worker
+# havuzunda süre bütçesiyle çalışır, event loop hiç beklemez.
+LIARS_KINDS = ("Q", "K", "A", "JOKER")
+LIARS_DECK = (10, 10, 10, 2)
+LIARS_BOT_BUDGET = 0.15    # karar başına simülasyon süresi (s)
+LIARS_BOT_THINK = 0.8      # en kısa "düşünme" süresi; simülasyonla paralel beklenir
+LIARS_BOT_TRIGGER = 1.5    # rulette botun tetiği çekme gecikmesi
+LIARS_BOT_CHUNK = 2048     # numpy örnek partisi
+LIARS_BOT_MAX_SAMPLES = 200_000
+LIARS_BOT_BLUFF = 0.15     # model: dürüst oynayabilecekken yine de blöf yapma olasılığı
+LIARS_BOT_HURT = 0.8       # rakibi rulete göndermenin değeri (kendi ölüm riskine oranla)
+LIARS_BOT_SHED = 0.01      # elden çıkan kart başına değer
+
+def liars_counts(cards):
+    c = [0, 0, 0, 0]
+    for card in cards:
+        c[LIARS_KINDS.index(card)] += 1
+    return c
+
+def liars_risk(pl):
+    """Rulete girerse ölme olasılığı (kalan namluya göre)."""
+    return 1.0 / (6 - pl.get("shots_used", 0) % 6)
+
+def liars_bot_call_table(next_size, claim_size):
+    """Sıradaki oyuncunun gözünden [elindeki eşleşen kart][iddia sayısı] -> yalan deme olasılığı.
+    İddia edenin elinde en az c eşleşen olma şansı hipergeometrik kuyruktan hesaplanır."""
+    unseen = sum(LIARS_DECK) - next_size
+    good = LIARS_DECK[0] + LIARS_DECK[3]            # tur kartı + joker
+    table = np.zeros((next_size + 1, 5))
+    total = math.comb(unseen, claim_size)
+    for m in range(min(next_size, good) + 1):
+        g = good - m
+        for c in range(1, 5):
+            truth = sum(math.comb(g, x) * math.comb(unseen - g, claim_size - x)
+                        for x in range(c, min(g, claim_size) + 1)) / total
+            table[m, c] = (1.0 - truth) + LIARS_BOT_BLUFF * truth
+    return table
+
+def liars_bot_decide(hand, own_pile, round_idx, claim_count, claimer_size, next_size, risks, budget):
+    """Worker sürecinde çalışır. hand/own_pile: sayaçlar; claim_count 0 ise yalan denemez.
+    risks: (bot, iddia eden, sıradaki) ruleti kaybetme olasılıkları.
+    -> ("call" | "play", atılacak kart türleri, örnek sayısı, ms)"""
+    started = time.perf_counter()
+    deadline = started + budget
+    hand = np.array(hand, dtype=np.int64)
+    size = int(hand.sum())
+    match = int(hand[round_idx] + hand[3])
+    counts = range(1, min(4, size) + 1)
+    pool = np.array(LIARS_DECK, dtype=np.int64) - hand - np.array(own_pile, dtype=np.int64)
+    unseen = int(pool.sum())
+    rng = np.random.default_rng()
+    table = liars_bot_call_table(next_size, size) if next_size and unseen >= next_size else None
+
+    lies, called, n = 0, np.zeros(5), 0
+    while n < LIARS_BOT_MAX_SAMPLES and (n == 0 or time.perf_counter() < deadline):
+        if claim_count:
+            hc = rng.multivariate_hypergeometric(pool, min(claimer_size + claim_count, unseen), size=LIARS_BOT_CHUNK)
+            lies += int(np.count_nonzero(hc[:, round_idx] + hc[:, 3] < claim_count))
+        if table is not None:
+            nh = rng.multivariate_hypergeometric(pool, next_size, size=LIARS_BOT_CHUNK)
+            called += table[nh[:, round_idx] + nh[:, 3]].sum(axis=0)
+        n += LIARS_BOT_CHUNK
+
+    best, best_ev = None, -math.inf
+    if claim_count:
+        p_lie = lies / n
+        p_lie += LIARS_BOT_BLUFF * (1.0 - p_lie)
+        best, best_ev = ("call", 0, 0), p_lie * LIARS_BOT_HURT * risks[1] - (1.0 - p_lie) * risks[0]
+    for c in counts:
+        honest = min(match, c)
+        q = called[c] / n
+        if c == size:
+            ev = 1.0                                  # eli bitirmek: anında kazanç
+        elif c > honest:
+            ev = LIARS_BOT_SHED * c - q * risks[0]
         else:
-            liars_next_turn(room)
+            ev = LIARS_BOT_SHED * c + 0.5 * q * LIARS_BOT_HURT * risks[2]   # rakip modeline yarı güven
+        ev += rng.normal(0.0, 0.005)                  # eşit durumlarda tahmin edilemez olsun
+        if ev > best_ev:
+            best, best_ev = ("play", honest, c - honest), ev
+
+    ms = (time.perf_counter() - started) * 1000.0
+    if best[0] == "call":
+        return "call", [], n, ms
+    _, honest, bluff = best
+    take = min(honest, int(hand[round_idx]))
+    cards = [LIARS_KINDS[round_idx]] * take + ["JOKER"] * (honest - take)
+    rest = [int(hand[i]) if i != round_idx else 0 for i in range(3)]
+    for _ in range(bluff):                            # en kalabalık yanlış türden blöf
+        i = max(range(3), key=rest.__getitem__)
+        rest[i] -= 1
+        cards.append(LIARS_KINDS[i])
+    return "play", cards, n, ms
+
+liars_bot_stats = {"decisions": 0, "calls": 0, "failed": 0, "samples": 0, "last_ms": 0.0, "max_ms": 0.0}
+
+def liars_bot_maybe(room):
+    """Sıra bottaysa düşünmeye başla; rulette kurban botsa tetiği zamanlayıcıyla çek."""
+    if liars_rooms.get(room["roomId"]) is not room:
+        return
+    if room["phase"] == "playing":
+        pl = room["players"].get(room["turn"])
+        if pl and pl.get("bot") and pl["alive"] and not room["bot_task"]:
+            room["bot_task"] = asyncio.create_task(liars_bot_turn(room, room["turn"]))
+    elif room["phase"] == "roulette":
+        roulette = room["roulette"]
+        if room["players"][roulette["victim"]].get("bot") and not roulette.get("resolved"):
+            timer_after(LIARS_BOT_TRIGGER, liars_bot_trigger, room, roulette)
+
+async def liars_bot_trigger(room, roulette):
+    if room["phase"] == "roulette" and room["roulette"] is roulette and not roulette.get("resolved"):
+        await liars_pull_trigger(room)
+
+async def liars_bot_turn(room, pid):
+    seat = room["players"][pid]
+    pile_len = len(room["pile"])
+    claim = room["current_claim"]
+    alive = [p for p in room["turn_order"] if room["players"][p]["alive"]]
+    nxt = room["players"][alive[(alive.index(pid) + 1) % len(alive)]]
+    claim_count, claimer = 0, None
+    if claim and claim["pid"] != pid:
+        claim_count, claimer = claim["count"], room["players"][claim["pid"]]
+    try:
+        (action, cards, samples, ms), _ = await asyncio.gather(
+            run_cpu(liars_bot_decide, liars_counts(seat["cards"]),
+                    liars_counts(c["card"] for c in room["pile"] if c["pid"] == pid),
+                    LIARS_KINDS.index(room.get("round_card", "Q")), claim_count,
+                    len(claimer["cards"]) if claimer else 0, len(nxt["cards"]) if nxt is not seat else 0,
+                    (liars_risk(seat), liars_risk(claimer) if claimer else 0.0, liars_risk(nxt)),
+                    LIARS_BOT_BUDGET),
+            asyncio.sleep(LIARS_BOT_THINK))
+    except Exception:
+        log.exception("liars bot: karar simülasyonu başarısız (oda %s)", room["roomId"])
+        liars_bot_stats["failed"] += 1
+        action, cards, samples, ms = "play", seat["cards"][:1], 0, 0.0
+    finally:
+        room["bot_task"] = None
+    # düşünürken oda kapanmış / sıra değişmiş / biri yalan demiş olabilir
+    if (liars_rooms.get(room["roomId"]) is not room or room["phase"] != "playing" or room["turn"] != pid
+            or len(room["pile"]) != pile_len or room["players"].get(pid) is not seat):
+        return
+    liars_bot_stats["decisions"] += 1
+    liars_bot_stats["samples"] += samples
+    liars_bot_stats["last_ms"] = round(ms, 3)
+    liars_bot_stats["max_ms"] = max(liars_bot_stats["max_ms"], liars_bot_stats["last_ms"])
+    if action == "call" and claim_count:
+        liars_bot_stats["calls"] += 1
+        await liars_call_liar(room, pid)
+        return
+    indices, hand = [], list(seat["cards"])
+    for card in cards:
+        i = hand.index(card)
+        hand[i] = None
+        indices.append(i)
+    await liars_play_cards(room, pid, indices or [0])
+
+async def liars_resync(room_id, pid, ws):
+    room = liars_rooms.get(room_id)
+    if not room:
+        return
+    if room["phase"] == "lobby":
+        await liars_broadcast(room, liars_lobby_payload(room))
+    else:
+        await liars_push_state(room)
+
+async def liars_leave(room_id, pid):
+    room = liars_rooms.get(room_id)
+    if not room:
+        return
+    was_human = pid in room["players"] and not room["players"][pid].get("bot")
+    liars_seat_drop(room, pid)
+    # yalnızca botlar kaldıysa oda kapanır
+    if all(pl["ws"] is None for pl in room["players"].values()):
+        liars_rooms.pop(room_id, None)
+    elif not was_human:
+        return
+    elif room["phase"] == "lobby":
+        await liars_broadcast(room, liars_lobby_payload(room))
+    elif room["phase"] == "playing":
         await liars_push_state(room)
+    else:
+        liars_bot_maybe(room)
 
 @app.websocket("/ws/liars")
 async def liars_ws(ws: WebSocket):
     await ws.accept()
+    sock = ws
     pid = secrets.token_hex(3)
+    outbox_open(ws, pid)
     room_id = None
 
     try:
         while True:
-            data = json.loads(await ws.receive_text())
+            data = json.loads(await sock.receive_text())
             typ = data.get("type")
 
+            if typ == "resume" and room_id is None:
+                # kısa kopmadan dönüş: koltuk, oturumun ilk soketi üzerinden sürer
+                sess = await session_resume(sock, data, "liars")
+                if sess:
+                    ws, room_id, pid = sess["ws"], sess["room_id"], sess["pid"]
+                continue
+
             if typ == "join":
                 room_id = data["roomId"]
                 name = data.get("name", "Oyuncu")[:24]
@@ -1625,15 +4288,25 @@ async def liars_ws(ws: WebSocket):
                     continue
 
                 if room_id not in liars_rooms:
-                    liars_rooms[room_id] = liars_new_room()
+                    liars_rooms[room_id] = liars_new_room(room_id)
 
                 room = liars_rooms[room_id]
 
+                old_pid = ckpt_reclaim("liars", room_id, room["players"], data.get("token"))
+                if old_pid:
+                    # yeniden başlatma öncesindeki koltuk (süresi dolmadan bota geçmemişse)
+                    pid = old_pid
+                    room["players"][pid]["ws"] = ws
+                    await ws_send(ws, {"type": "joined", "pid": pid})
+                    session_open(ws, "liars", room_id, pid)
+                    await liars_resync(room_id, pid, ws)
+                    continue
+
                 if room["phase"] != "lobby":
                     await ws_send(ws, {"type": "join_error", "reason": "game_in_progress", "msg": "Oyun devam ediyor!"})
                     continue
 
-                if len(room["players"]) >= 6:
+                if len(room["players"]) >= LIARS_MAX_PLAYERS:
                     await ws_send(ws, {"type": "join_error", "reason": "room_full", "msg": "Oda dolu!"})
                     continue
 
@@ -1651,10 +4324,31 @@ async def liars_ws(ws: WebSocket):
                 }
 
                 await ws_send(ws, {"type": "joined", "pid": pid})
-                await liars_broadcast(room, {
-                    "type": "lobby_update",
-                    "players": {p: {"name": room["players"][p]["name"]} for p in room["players"]}
-                })
+                session_open(ws, "liars", room_id, pid)
+                await liars_broadcast(room, liars_lobby_payload(room))
+
+            elif typ == "add_bot" and room_id:
+                room = liars_rooms.get(room_id)
+                if not room or room["phase"] != "lobby" or pid not in room["players"]:
+                    continue
+
+                if len(room["players"]) >= LIARS_MAX_PLAYERS:
+                    await ws_send(ws, {"type": "info", "msg": "Oda dolu!"})
+                    continue
+
+                names = {pl["name"] for pl in room["players"].values()}
+                n = 1
+                while f"Bot {n}" in names:
+                    n += 1
+                room["players"][secrets.token_hex(3)] = {
+                    "name": f"Bot {n}",
+                    "ws": None,
+                    "bot": True,
+                    "cards": [],
+                    "alive": True,
+                    "position": 0
+                }
+                await liars_broadcast(room, liars_lobby_payload(room))
 
             elif typ == "start_game" and room_id:
                 room = liars_rooms.get(room_id)
@@ -1673,47 +4367,7 @@ async def liars_ws(ws: WebSocket):
                 if not room or room["phase"] != "playing" or room["turn"] != pid:
                     continue
 
-                card_indices = data.get("card_indices", [])  # Atılacak kartların indeksleri
-
-                if not card_indices or len(card_indices) > 4:
-                    continue
-
-                # Sunucu tarafından belirlenen kart türünü kullan
-                claimed_card = room.get("round_card", "Q")
-
-                player = room["players"][pid]
-
-                # Kartları kontrol et ve ata
-                played_cards = []
-                for idx in sorted(card_indices, reverse=True):
-                    if 0 <= idx < len(player["cards"]):
-                        card = player["cards"].pop(idx)
-                        played_cards.append(card)
-                        room["pile"].append({"card": card, "pid": pid})
-
-                room["current_claim"] = {
-                    "card": claimed_card,
-                    "count": len(played_cards),
-                    "pid": pid
-                }
-
-                # Tüm kartları bitirdiyse kazandı
-                if len(player["cards"]) == 0:
-                    room["phase"] = "game_over"
-                    await liars_broadcast(room, {
-                        "type": "game_over",
-                        "winner": pid,
-                        "winner_name": player["name"]
-                    })
-                else:
-                    liars_next_turn(room)
-                    await liars_push_state(room)
-                    await liars_broadcast(room, {
-                        "type": "play_made",
-                        "player": pid,
-                        "player_name": player["name"],
-                        "claim": room["current_claim"]
-                    })
+                await liars_play_cards(room, pid, data.get("card_indices", []))  # Atılacak kartların indeksleri
 
             elif typ == "call_liar" and room_id:
                 room = liars_rooms.get(room_id)
@@ -1724,35 +4378,12 @@ async def liars_ws(ws: WebSocket):
                 if not caller_player or not caller_player["alive"]:
                     continue
 
-                claim = room["current_claim"]
-                claimer_pid = claim["pid"]
-                claimed_card = claim["card"]
-
                 # Oyuncu kendine yalan diyemez
-                if pid == claimer_pid:
+                if pid == room["current_claim"]["pid"]:
                     await ws_send(ws, {"type": "info", "msg": "Kendine yalan diyemezsin!"})
                     continue
 
-                # Pile'daki son atılan kartları kontrol et
-                last_cards = room["pile"][-claim["count"]:]
-
-                # Joker ve iddia edilen kartı kabul et
-                is_valid = all(c["card"] == claimed_card or c["card"] == "JOKER" for c in last_cards)
-
-                await liars_broadcast(room, {
-                    "type": "liar_called",
-                    "caller": pid,
-                    "caller_name": caller_player["name"],
-                    "claimer": claimer_pid,
-                    "cards_revealed": [c["card"] for c in last_cards],
-                    "valid": is_valid
-                })
-
-                # Rusça rulet
-                victim = claimer_pid if not is_valid else pid
-                await liars_start_roulette(room, victim)
-                # Blöf diyen kişiyi kaydet
-                room["roulette"]["caller"] = pid
+                await liars_call_liar(room, pid)
 
             elif typ == "pull_trigger" and room_id:
                 room = liars_rooms.get(room_id)
@@ -1764,21 +4395,14 @@ async def liars_ws(ws: WebSocket):
 
                 await liars_pull_trigger(room)
 
-    except WebSocketDisconnect:
-        pass
+    except WebSocketDisconnect as e:
+        if e.code == 1000:      # istemci bilerek kapattı: koltuk beklemez
+            session_end(ws)
     finally:
-        if room_id and room_id in liars_rooms:
-            room = liars_rooms[room_id]
-            room["players"].pop(pid, None)
-
-            if not room["players"]:
-                liars_rooms.pop(room_id, None)
-            else:
-                if room["phase"] == "lobby":
-                    await liars_broadcast(room, {
-                        "type": "lobby_update",
-                        "players": {p: {"name": room["players"][p]["name"]} for p in room["players"]}
-                    })
+        if not session_detach(ws, sock):
+            outbox_close(ws)
+            if room_id:
+                await liars_leave(room_id, pid)
 
 # ==========================
 # Sumo Bash (yuvarlak arena mini game)
@@ -1792,8 +4416,12 @@ def make_sumo_room(room_id: str) -> dict:
         "arena_radius": 200.0,
         "min_radius": 90.0,
         "shrink_speed": 12.0,   # saniyede kaç px küçülsün
-        "last_update": None,
         "host_pid": None,
+        "tick": 0,          # simülasyon adımı (snapshot'larda gönderilir)
+        "next_id": 0,       # oyunculara verilen kısa (uint16) id
+        "snap_seq": 0,      # ikili snapshot sıra numarası
+        "snap_hist": {},    # seq -> kare (ikili istemcilerin delta tabanları)
+        "roster": {},       # checkpoint'ten dönen isim -> {color, wins} (aynı isimle katılan devralır)
     }
 
 def sumo_random_color() -> str:
@@ -1802,27 +4430,28 @@ def sumo_random_color() -> str:
 
 def sumo_random_spawn(room: dict) -> tuple[float, float]:
     r = room.get("arena_radius", 200.0) * 0.55
+    if len(room["players"]) >= SUMO_CROWD_PLAYERS:
+        # Kalabalık odada tek halka yetmez; diske düzgün dağıt
+        r = room.get("arena_radius", 200.0) * 0.8 * math.sqrt(random.random())
     ang = random.uniform(0, math.tau)
     return math.cos(ang) * r, math.sin(ang) * r
 
+def sumo_start_radius(room: dict) -> float:
+    """Battle royale: 6 kişiden kalabalık odalarda arena alanı oyuncu sayısıyla büyür."""
+    return 200.0 * max(1.0, math.sqrt(len(room["players"]) / 6.0))
+
 async def sumo_info(room: dict, text: str):
-    msg = json.dumps({"type": "info", "msg": text})
-    for p in list(room["players"].values()):
-        ws: WebSocket = p.get("ws")
-        if not ws:
-            continue
-        try:
-            await ws.send_text(msg)
-        except Exception:
-            pass
+    await fanout_broadcast(room, [p.get("ws") for p in room["players"].values()], {"type": "info", "msg": text})
 
-def sumo_broadcast_state(room: dict, info: str | None = None, winner: str | None = None):
+def sumo_state_msg(room: dict, info: str | None = None, winner: str | None = None) -> dict:
     players_view = {}
     for pid, p in room["players"].items():
+        x, y = sumo_phys_xy(p)
         players_view[pid] = {
             "name": p["name"],
-            "x": float(p.get("x", 0.0)),
-            "y": float(p.get("y", 0.0)),
+            "x": x,
+            "y": y,
+            "seq": int(sumo_phys["last_seq"][p["slot"]]),   # son işlenen girdi (uzlaştırma için)
             "color": p.get("color"),
             "alive": bool(p.get("alive", True)),
             "wins": int(p.get("wins", 0)),
@@ -1831,6 +4460,8 @@ def sumo_broadcast_state(room: dict, info: str | None = None, winner: str | None
     msg = {
         "type": "state",
         "phase": room.get("phase", "waiting"),
+        "tick": room.get("tick", 0),
+        "time": sumo_now_ms(),
         "arena": {"radius": float(room.get("arena_radius", 200.0))},
         "players": players_view,
         "winner": winner,
@@ -1838,127 +4469,575 @@ def sumo_broadcast_state(room: dict, info: str | None = None, winner: str | None
     }
     if info:
         msg["info"] = info
+    return msg
+
+# ---- İkili delta snapshot'lar (join'de snap: "bin" ile seçilir) ----
+# Statik alanlar (isim, renk, galibiyet) yalnızca değiştiğinde "roster" JSON
+# mesajıyla gider. Konumlar 1/4 px sabit noktalı int16 olarak ikili frame'de
+# taşınır; her snapshot istemcinin onayladığı (ack) snapshot'a göre fark olarak
+# kodlanır. Onaylı taban geçmişte yoksa (join, resync, çok kayıp) keyframe gider.
+#
+# Başlık: tür u8, faz u8, seq u32, taban u32, tick u32, yarıçap u16, kayıt u16,
+#         sunucu saati u32 (ms)
+# Kayıt:  id u16, bayrak u8, sonra bayrağa göre x/y (int16) ya da dx/dy (int8)
+#         ya da hiçbir şey (GONE)
+# Son:    alıcının son işlenen girdi seq'i u32 (bağlantıya özel, ortak baytların sonuna eklenir)
+SUMO_SNAP_SCALE = 4
+SUMO_SNAP_HISTORY = 32
+SUMO_SNAP_HEAD = struct.Struct("<BBIIIHHI")
+SUMO_SNAP_TAIL = struct.Struct("<I")
+SUMO_SNAP_REC = struct.Struct("<HB")
+SUMO_SNAP_XY = struct.Struct("<hh")
+SUMO_SNAP_DXY = struct.Struct("<bb")
+SUMO_SNAP_KEY, SUMO_SNAP_DELTA = 1, 2
+SUMO_FLAG_ALIVE, SUMO_FLAG_GONE, SUMO_FLAG_SMALL = 1, 2, 4
+SUMO_PHASE_CODES = {"waiting": 0, "playing": 1, "finished": 2}
+
+def sumo_quant(v: float) -> int:
+    return max(-32768, min(32767, int(round(v * SUMO_SNAP_SCALE))))
+
+def sumo_snap_frame(room: dict) -> dict:
+    """Anlık kareyi (id -> (qx, qy, alive)) üret, yeni seq ver ve geçmişe ekle."""
+    pos = sumo_phys["pos"]
+    frame = {}
+    for p in room["players"].values():
+        x, y = pos[p["slot"]]
+        frame[p["id"]] = (sumo_quant(x), sumo_quant(y), bool(p.get("alive", True)))
+    room["snap_seq"] += 1
+    hist = room["snap_hist"]
+    hist[room["snap_seq"]] = frame
+    while len(hist) > SUMO_SNAP_HISTORY:
+        del hist[next(iter(hist))]
+    return frame
+
+def sumo_snap_encode(room: dict, frame: dict, base_seq: int | None) -> bytes:
+    """Kareyi base_seq'e göre fark olarak kodla; taban yoksa keyframe."""
+    base = room["snap_hist"].get(base_seq) if base_seq is not None else None
+    parts = []
+    if base is None:
+        kind, base_seq = SUMO_SNAP_KEY, 0
+        for pid, (x, y, alive) in frame.items():
+            parts.append(SUMO_SNAP_REC.pack(pid, SUMO_FLAG_ALIVE if alive else 0) + SUMO_SNAP_XY.pack(x, y))
+    else:
+        kind = SUMO_SNAP_DELTA
+        for pid, cur in frame.items():
+            old = base.get(pid)
+            if old == cur:
+                continue
+            x, y, alive = cur
+            flags = SUMO_FLAG_ALIVE if alive else 0
+            if old is not None and -128 <= x - old[0] <= 127 and -128 <= y - old[1] <= 127:
+                parts.append(SUMO_SNAP_REC.pack(pid, flags | SUMO_FLAG_SMALL) + SUMO_SNAP_DXY.pack(x - old[0], y - old[1]))
+            else:
+                parts.append(SUMO_SNAP_REC.pack(pid, flags) + SUMO_SNAP_XY.pack(x, y))
+        for pid in base:
+            if pid not in frame:
+                parts.append(SUMO_SNAP_REC.pack(pid, SUMO_FLAG_GONE))
+    head = SUMO_SNAP_HEAD.pack(
+        kind, SUMO_PHASE_CODES.get(room.get("phase"), 0), room["snap_seq"], base_seq,
+        room.get("tick", 0) & 0xFFFFFFFF, min(65535, int(room.get("arena_radius", 200.0) * SUMO_SNAP_SCALE)), len(parts),
+        sumo_now_ms())
+    return head + b"".join(parts)
+
+def sumo_roster_msg(room: dict, info: str | None = None, winner: str | None = None) -> dict:
+    """İkili istemciler için statik alanlar (konumlar snapshot'ta)."""
+    msg = {
+        "type": "roster",
+        "phase": room.get("phase", "waiting"),
+        "players": {pid: {"id": p["id"], "name": p["name"], "color": p.get("color"), "wins": int(p.get("wins", 0))}
+                    for pid, p in room["players"].items()},
+        "winner": winner,
+        "canStart": len(room["players"]) >= 2 and room.get("phase") in ("waiting", "finished"),
+    }
+    if info:
+        msg["info"] = info
+    return msg
 
-    txt = json.dumps(msg)
-    for p in list(room["players"].values()):
-        ws: WebSocket = p.get("ws")
-        if not ws:
+async def sumo_push_state(room: dict, info: str | None = None, winner: str | None = None, full: bool = True):
+    """
+    Eski istemcilere JSON state, ikili istemcilere (full ise önce roster) delta
+    snapshot gönderir. Aynı tabanı onaylamış istemciler aynı baytları paylaşır.
+    """
+    legacy, binary = [], []
+    for p in room["players"].values():
+        ws = p.get("ws")
+        if ws is None:
             continue
-        try:
-            asyncio.create_task(ws.send_text(txt))
-        except Exception:
-            pass
-
-def sumo_update_arena_shrink(room: dict):
-    """Oyun oynanırken süre geçtikçe arenayı küçült."""
-    if room.get("phase") != "playing":
-        room["last_update"] = None
+        if getattr(ws, "sumo_bin", False):
+            binary.append((ws, p))
+        else:
+            legacy.append(ws)
+    if legacy:
+        await fanout_broadcast(room, legacy, sumo_state_msg(room, info, winner), "state")
+    if not binary:
         return
-    now = datetime.utcnow().timestamp()
-    last = room.get("last_update")
-    room["last_update"] = now
-    if last is None:
+    if full:
+        await fanout_broadcast(room, [ws for ws, _ in binary], sumo_roster_msg(room, info, winner))
+    frame = sumo_snap_frame(room)
+    encoded = {}
+    pairs = []
+    last_seq = sumo_phys["last_seq"]
+    for ws, p in binary:
+        base = getattr(ws, "sumo_ack", None)
+        if base not in room["snap_hist"]:
+            base = None
+        if base not in encoded:
+            encoded[base] = sumo_snap_encode(room, frame, base)
+        pairs.append((ws, encoded[base] + SUMO_SNAP_TAIL.pack(int(last_seq[p["slot"]]) & 0xFFFFFFFF)))
+    await fanout_many(room, pairs, "state")
+
+def sumo_broadcast_state(room: dict, info: str | None = None, winner: str | None = None):
+    """Olay kaynaklı (join/start/reset/ayrılma) anlık durum yayını."""
+    try:
+        asyncio.create_task(sumo_push_state(room, info, winner))
+    except Exception:
+        pass
+
+# ---- Toplu fizik (NumPy) ----
+# Bütün aktif odaların oyuncuları tek bir dizi kümesinde (slot başına bir satır)
+# tutulur; her simülasyon adımı tüm odaları tek bir vektörel geçişte ilerletir.
+# WebSocket katmanı yalnızca sonuçları okur (konum, canlılık, kazanan).
+SUMO_BALL_RADIUS = 18.0
+SUMO_CROWD_PLAYERS = 12     # bu sayıdan kalabalık odalarda diske dağıtarak doğ
+SUMO_MAX_SPEED = 240.0      # px/s; hiçbir girdi bir adımda bundan hızlı taşıyamaz
+SUMO_INPUT_QUEUE = 8        # oyuncu başına bekleyen sıralı girdi sayısı
+SUMO_LAG_TICKS = 6          # gecikme telafisi en fazla bu kadar adım geri sarar (30 Hz'de 200 ms)
+SUMO_PHYS_PLAYER_KEYS = ("pos", "vel", "target", "has_input", "alive", "room",
+                         "inq", "inq_seq", "inq_head", "inq_len", "last_seq", "lag", "hist")
+_sumo_t0 = time.monotonic()
+
+def sumo_now_ms() -> int:
+    """Sunucu saati (ms, uint32 sarar); snapshot'larda yankılanır, girdilerde geri gelir."""
+    return int((time.monotonic() - _sumo_t0) * 1000) & 0xFFFFFFFF
+
+def sumo_phys_new(cap: int = 64, rcap: int = 16) -> dict:
+    return {
+        "step": 0,                          # toplu adım sayacı (hist halkasının indeksi)
+        # oyuncu slotları
+        "pos": np.zeros((cap, 2)),
+        "vel": np.zeros((cap, 2)),          # son adımdaki yer değiştirme / dt
+        "target": np.zeros((cap, 2)),       # eski "move" girdisi (hedef konum)
+        "has_input": np.zeros(cap, bool),
+        "alive": np.zeros(cap, bool),
+        "room": np.full(cap, -1, np.int32), # oda slotu, -1 = boş
+        "inq": np.zeros((cap, SUMO_INPUT_QUEUE, 2)),            # sıralı girdiler: yön (|v| <= 1)
+        "inq_seq": np.zeros((cap, SUMO_INPUT_QUEUE), np.int64),
+        "inq_head": np.zeros(cap, np.int32),
+        "inq_len": np.zeros(cap, np.int32),
+        "last_seq": np.zeros(cap, np.int64),                    # son işlenen girdi seq'i
+        "lag": np.zeros(cap, np.int32),                         # istemcinin gördüğü gecikme (adım)
+        "hist": np.zeros((cap, SUMO_LAG_TICKS + 1, 2)),         # son adımların konumları
+        "owner": [None] * cap,              # slot -> oyuncu dict
+        "free": list(range(cap - 1, -1, -1)),
+        # oda slotları
+        "radius": np.zeros(rcap),
+        "min_radius": np.zeros(rcap),
+        "shrink": np.zeros(rcap),
+        "playing": np.zeros(rcap, bool),
+        "rooms": [None] * rcap,             # oda slotu -> oda dict
+        "rfree": list(range(rcap - 1, -1, -1)),
+    }
+
+sumo_phys = sumo_phys_new()
+
+def sumo_phys_grow(keys: tuple, refs: str, free: str):
+    """Dizileri iki katına çıkar; yeni slotları boş listeye ekle."""
+    ph = sumo_phys
+    cap = len(ph[refs])
+    for k in keys:
+        arr = ph[k]
+        ext = np.full((cap,) + arr.shape[1:], -1 if k == "room" else 0, arr.dtype)
+        ph[k] = np.concatenate([arr, ext])
+    ph[refs].extend([None] * cap)
+    ph[free][:0] = range(2 * cap - 1, cap - 1, -1)
+
+def sumo_phys_room_add(room: dict):
+    ph = sumo_phys
+    if not ph["rfree"]:
+        sumo_phys_grow(("radius", "min_radius", "shrink", "playing"), "rooms", "rfree")
+    r = ph["rfree"].pop()
+    ph["rooms"][r] = room
+    room["ridx"] = r
+    sumo_phys_room_set(room, False)
+
+def sumo_phys_room_set(room: dict, playing: bool):
+    """Oda ayarlarını (yarıçap, daralma) dizilere yaz ve oynanıyor bayrağını ayarla."""
+    ph = sumo_phys
+    r = room["ridx"]
+    ph["radius"][r] = float(room.get("arena_radius", 200.0))
+    ph["min_radius"][r] = float(room.get("min_radius", 90.0))
+    ph["shrink"][r] = float(room.get("shrink_speed", 12.0))
+    ph["playing"][r] = playing
+
+def sumo_phys_room_free(room: dict):
+    ph = sumo_phys
+    r = room.pop("ridx", None)
+    if r is None:
         return
-    dt = max(0.0, now - last)
-    shrink_speed = float(room.get("shrink_speed", 12.0))
-    min_r = float(room.get("min_radius", 90.0))
-    r = float(room.get("arena_radius", 200.0))
-    if r <= min_r:
-        room["arena_radius"] = min_r
+    ph["playing"][r] = False
+    ph["rooms"][r] = None
+    ph["rfree"].append(r)
+
+def sumo_phys_add(room: dict, p: dict, x: float, y: float):
+    ph = sumo_phys
+    if not ph["free"]:
+        sumo_phys_grow(SUMO_PHYS_PLAYER_KEYS, "owner", "free")
+    s = ph["free"].pop()
+    ph["owner"][s] = p
+    ph["room"][s] = room["ridx"]
+    ph["last_seq"][s] = 0
+    ph["lag"][s] = 0
+    p["slot"] = s
+    p["in_seq"] = 0
+    sumo_phys_place(p, x, y)
+
+def sumo_phys_free(p: dict):
+    ph = sumo_phys
+    s = p.pop("slot", None)
+    if s is None:
         return
-    r -= shrink_speed * dt
-    if r < min_r:
-        r = min_r
-    room["arena_radius"] = r
+    ph["room"][s] = -1
+    ph["alive"][s] = False
+    ph["has_input"][s] = False
+    ph["owner"][s] = None
+    ph["free"].append(s)
+
+def sumo_phys_place(p: dict, x: float, y: float):
+    """Oyuncuyu (yeniden) doğur: konum, sıfır hız, canlı."""
+    ph = sumo_phys
+    s = p["slot"]
+    ph["pos"][s] = (x, y)
+    ph["hist"][s] = (x, y)
+    ph["vel"][s] = 0.0
+    ph["has_input"][s] = False
+    ph["inq_len"][s] = 0
+    ph["alive"][s] = True
+    p["alive"] = True
+
+def sumo_phys_input(p: dict, x: float, y: float):
+    """Girdiyi kaydet; aynı adım içinde gelen son girdi geçerli."""
+    s = p["slot"]
+    sumo_phys["target"][s] = (x, y)
+    sumo_phys["has_input"][s] = True
+
+def sumo_phys_queue_input(p: dict, seq: int, dx: float, dy: float, seen_ms=None) -> bool:
+    """
+    Sıra numaralı hareket girdisini kuyruğa ekle. Her adımda oyuncu başına bir
+    girdi işlenir ve SUMO_MAX_SPEED * dt kadar taşır; kuyruk taşarsa en eskisi düşer.
+    seen_ms: istemcinin girdiyi üretirken ekranda olan snapshot'ın sunucu saati
+    (gecikme telafisi için).
+    """
+    if seq <= p.get("in_seq", 0):
+        return False    # tekrar / sırası bozuk girdi
+    p["in_seq"] = seq
+    ph = sumo_phys
+    s = p["slot"]
+    n = math.hypot(dx, dy)
+    if n > 1.0:
+        dx, dy = dx / n, dy / n
+    head, size = int(ph["inq_head"][s]), int(ph["inq_len"][s])
+    if size == SUMO_INPUT_QUEUE:
+        head = (head + 1) % SUMO_INPUT_QUEUE
+        size -= 1
+    tail = (head + size) % SUMO_INPUT_QUEUE
+    ph["inq"][s, tail] = (dx, dy)
+    ph["inq_seq"][s, tail] = seq
+    ph["inq_head"][s] = head
+    ph["inq_len"][s] = size + 1
+    if isinstance(seen_ms, int):
+        lag_ms = (sumo_now_ms() - seen_ms) & 0xFFFFFFFF
+        if lag_ms < 10_000:
+            ph["lag"][s] = min(SUMO_LAG_TICKS, round(lag_ms / 1000.0 * SUMO_TICK_HZ))
+    return True
+
+def sumo_phys_xy(p: dict) -> tuple[float, float]:
+    x, y = sumo_phys["pos"][p["slot"]]
+    return float(x), float(y)
 
-def sumo_resolve_collisions(room: dict, mover_pid: str, ball_radius: float = 18.0):
+def sumo_phys_pairs(idx: np.ndarray, window: float) -> tuple[np.ndarray, np.ndarray]:
     """
-    Çarpışan oyuncuları birbirinden güçlü şekilde iter.
-    Vuran oyuncu az, vurulan oyuncu çok geri gider (knockback).
+    Geniş faz (sırala-süpür): oyuncuları (oda, x) sırasına diz; aynı odada
+    x farkı window'dan küçük olan komşuları k = 1, 2, ... adımlarıyla tara.
+    Bir k için hiç aday kalmazsa daha büyük k'lar da boştur.
     """
-    p = room["players"].get(mover_pid)
-    if not p or not p.get("alive", True):
+    ph = sumo_phys
+    pos, room = ph["pos"], ph["room"]
+    order = idx[np.lexsort((pos[idx, 0], room[idx]))]
+    xs = pos[order, 0]
+    rs = room[order]
+    a_parts, b_parts = [], []
+    for k in range(1, len(order)):
+        ok = (rs[k:] == rs[:-k]) & (xs[k:] - xs[:-k] < window)
+        if not ok.any():
+            break
+        a_parts.append(order[:-k][ok])
+        b_parts.append(order[k:][ok])
+    if not a_parts:
+        empty = np.zeros(0, np.int64)
+        return empty, empty
+    return np.concatenate(a_parts), np.concatenate(b_parts)
+
+def sumo_phys_seen(slots: np.ndarray, lag: np.ndarray) -> np.ndarray:
+    """slots oyuncularının lag adım önceki konumu (gecikmeli istemcinin gördüğü); lag 0 = şimdi."""
+    ph = sumo_phys
+    h = (ph["step"] - lag) % (SUMO_LAG_TICKS + 1)
+    return np.where((lag == 0)[:, None], ph["pos"][slots], ph["hist"][slots, h])
+
+def sumo_phys_collide(idx: np.ndarray, mover: np.ndarray):
+    """
+    Çarpışan oyuncuları birbirinden güçlü şekilde iter (knockback).
+    Hareket eden (girdi gönderen) taraf vurandır: vuran az, vurulan çok geri gider.
+    Gecikme telafisi: vuruş testi, hedefin vuranın ekranında göründüğü (lag adım
+    önceki) konumla yapılır; itme şimdiki konumlara uygulanır.
+    """
+    ph = sumo_phys
+    pos, lag = ph["pos"], ph["lag"]
+    min_dist = SUMO_BALL_RADIUS * 2.0
+
+    # Geri sarılmış konumlar şimdikinden en fazla margin uzakta: geniş fazı o kadar aç
+    margin = 0.0
+    for l in np.unique(lag[idx[mover[idx]]]):
+        if l > 0:
+            diff = pos[idx] - ph["hist"][idx, (ph["step"] - l) % (SUMO_LAG_TICKS + 1)]
+            margin = max(margin, float(np.hypot(diff[:, 0], diff[:, 1]).max()))
+    a, b = sumo_phys_pairs(idx, min_dist + margin)
+    if not a.size:
         return
 
-    for pid2, other in room["players"].items():
-        if pid2 == mover_pid:
+    # Her çift iki yönde de denenir: (vuran, hedef) = (a, b) ve (b, a)
+    pushes = []
+    for hitter, target in ((a, b), (b, a)):
+        sel = mover[hitter]
+        h, t = hitter[sel], target[sel]
+        if not h.size:
             continue
-        if not other.get("alive", True):
+        d = sumo_phys_seen(t, lag[h]) - pos[h]
+        dist = np.hypot(d[:, 0], d[:, 1])
+        hit = dist < min_dist
+        if not hit.any():
             continue
+        h, t, d, dist = h[hit], t[hit], d[hit], dist[hit]
+        dist = np.where(dist == 0, 0.001, dist)   # sıfıra bölme olmasın
+        # Ne kadar iç içe girdik? + ekstra bonus itme ki hissedilsin
+        overlap = (min_dist - dist) + 12.0
+        u = d / dist[:, None]                      # vurandan hedefe birim vektör
+        pushes.append((h, -u * (overlap * 0.35)[:, None]))   # vuran hafifçe geri
+        pushes.append((t, u * (overlap * 0.9)[:, None]))     # vurulan güçlüce ileri
+    for slots, delta in pushes:
+        np.add.at(pos, slots, delta)
+
+def sumo_phys_step(dt: float):
+    """
+    Tüm oynanan odaları bir adım ilerlet: girdiler, çarpışma, arena daralması,
+    elenme. Dönüş: (yeni elenen slotlar, [(oda slotu, kazanan slot | -1), ...]).
+    """
+    ph = sumo_phys
+    room, alive = ph["room"], ph["alive"]
+    live = np.nonzero(alive & (room >= 0))[0]
+    idx = live[ph["playing"][room[live]]]
+    rooms = np.nonzero(ph["playing"])[0]
+    if not rooms.size:
+        return np.zeros(0, np.int64), []
+
+    ph["step"] += 1
+
+    # 1) Girdiler: sıralı kuyruktan adım başına bir girdi (yoksa eski "move"
+    #    hedefi); ikisi de adım başına en fazla SUMO_MAX_SPEED * dt taşır
+    max_step = SUMO_MAX_SPEED * dt
+    disp = np.zeros((idx.size, 2))
+    legacy = ph["has_input"][idx]
+    disp[legacy] = ph["target"][idx[legacy]] - ph["pos"][idx[legacy]]
+    queued = ph["inq_len"][idx] > 0
+    q = idx[queued]
+    if q.size:
+        head = ph["inq_head"][q]
+        disp[queued] = ph["inq"][q, head] * max_step
+        ph["last_seq"][q] = ph["inq_seq"][q, head]
+        ph["inq_head"][q] = (head + 1) % SUMO_INPUT_QUEUE
+        ph["inq_len"][q] -= 1
+    norm = np.hypot(disp[:, 0], disp[:, 1])
+    disp *= np.minimum(1.0, max_step / np.maximum(norm, 1e-9))[:, None]
+    mover = np.zeros(len(alive), bool)
+    mover[idx] = legacy | queued
+    ph["vel"][idx] = disp / dt
+    ph["pos"][idx] += disp
+    ph["has_input"][idx] = False
+
+    # 2) Çarpışma
+    if mover.any():
+        sumo_phys_collide(idx, mover)
+
+    # 3) Arena daralması
+    ph["radius"][rooms] = np.maximum(ph["min_radius"][rooms], ph["radius"][rooms] - ph["shrink"][rooms] * dt)
+
+    # 4) Elenme
+    pos = ph["pos"][idx]
+    out = idx[np.hypot(pos[:, 0], pos[:, 1]) > ph["radius"][room[idx]]]
+    alive[out] = False
+
+    # 5) Tek (ya da hiç) canlı kalan odalar biter
+    still = idx[alive[idx]]
+    counts = np.bincount(room[still], minlength=len(ph["playing"]))
+    done = rooms[counts[rooms] <= 1]
+    finished = []
+    for r in done:
+        w = still[room[still] == r]
+        finished.append((int(r), int(w[0]) if w.size else -1))
+    ph["playing"][done] = False
+
+    # 6) Gecikme telafisi için bu adımın konumlarını halkaya yaz
+    ph["hist"][idx, ph["step"] % (SUMO_LAG_TICKS + 1)] = ph["pos"][idx]
+    return out, finished
+
+# ---- Sabit adımlı yetkili simülasyon ----
+# İstemciler yalnızca girdi gönderir; fizik tek bir ortak döngüde sabit
+# hızda ilerler. Yayın hızı ayrıca ayarlanır (SUMO_TICK_HZ'nin böleni olmalı).
+SUMO_TICK_HZ = 30
+SUMO_BROADCAST_HZ = 15
+
+sumo_sim: dict = {"task": None, "steps": 0, "overruns": 0, "last_ms": 0.0, "max_ms": 0.0}
+
+def sumo_step(dt: float) -> list:
+    """Toplu fizik adımı; sonuçları oda/oyuncu dict'lerine yansıt, biten odaları döndür."""
+    ph = sumo_phys
+    out, finished = sumo_phys_step(dt)
+    for s in out:
+        ph["owner"][s]["alive"] = False
+    ended = []
+    for r, w in finished:
+        room = ph["rooms"][r]
+        room["phase"] = "finished"
+        winner = None
+        if w >= 0:
+            p = ph["owner"][w]
+            p["wins"] = p.get("wins", 0) + 1
+            ckpt_touch(room)
+            winner = p["name"]
+        ended.append((room, winner))
+    return ended
+
+async def sumo_sim_loop():
+    loop = asyncio.get_running_loop()
+    dt = 1.0 / SUMO_TICK_HZ
+    every = max(1, round(SUMO_TICK_HZ / SUMO_BROADCAST_HZ))
+    next_at = loop.time()
+    try:
+        while True:
+            playing = [r for r in sumo_rooms.values() if r.get("phase") == "playing"]
+            if not playing:
+                return
+            started = time.perf_counter()
+            ended = sumo_step(dt)
+            pushes = []
+            for room in playing:
+                room["tick"] = room.get("tick", 0) + 1
+                room["arena_radius"] = float(sumo_phys["radius"][room["ridx"]])
+            for room, winner in ended:
+                info = f"Tur bitti! Kazanan: {winner}" if winner else "Tur bitti!"
+                pushes.append(sumo_push_state(room, info=info, winner=winner))
+            for room in playing:
+                if room.get("phase") == "playing" and room["tick"] % every == 0:
+                    pushes.append(sumo_push_state(room, full=False))
+            if pushes:
+                await asyncio.gather(*pushes, return_exceptions=True)
+            ms = (time.perf_counter() - started) * 1000.0
+            sumo_sim["steps"] += 1
+            sumo_sim["last_ms"] = round(ms, 3)
+            sumo_sim["max_ms"] = max(sumo_sim["max_ms"], round(ms, 3))
+
+            next_at += dt
+            delay = next_at - loop.time()
+            if delay < -dt:
+                # Geride kaldık: adımları biriktirip patlatmak yerine saati yeniden hizala
+                sumo_sim["overruns"] += 1
+                next_at = loop.time()
+                delay = 0.0
+            await asyncio.sleep(max(0.0, delay))
+    finally:
+        sumo_sim["task"] = None
 
-        # Vurandan hedefe doğru vektör
-        dx = other["x"] - p["x"]
-        dy = other["y"] - p["y"]
-        dist = math.hypot(dx, dy)
-        if dist == 0:
-            dist = 0.001  # sıfıra bölme olmasın
-
-        min_dist = ball_radius * 2.0  # iki topun normalde olması gereken minimum mesafe
-        if dist < min_dist:
-            # Ne kadar iç içe girdik? + ekstra bonus itme ekleyelim ki hissedilsin
-            overlap = (min_dist - dist) + 12.0
-
-            ux = dx / dist  # vurandan hedefe doğru birim vektör
-            uy = dy / dist
+def sumo_sim_start():
+    task = sumo_sim.get("task")
+    if task is None or task.done():
+        sumo_sim["task"] = asyncio.create_task(sumo_sim_loop())
 
-            # Vurulan: ileri doğru güçlü itilsin
-            hit_push = overlap * 0.9
-            # Vuran: geri doğru hafifçe geri sekecek
-            self_push = overlap * 0.35
+def sumo_sim_stats() -> dict:
+    return {
+        "running": sumo_sim.get("task") is not None,
+        "tickHz": SUMO_TICK_HZ,
+        "broadcastHz": SUMO_BROADCAST_HZ,
+        "steps": sumo_sim["steps"],
+        "overruns": sumo_sim["overruns"],
+        "players": int(np.count_nonzero(sumo_phys["room"] >= 0)),
+        "last_ms": sumo_sim["last_ms"],
+        "max_ms": sumo_sim["max_ms"],
+    }
 
-            # Vuranı geri doğru it (tam tersi yönde)
-            p["x"] -= ux * self_push
-            p["y"] -= uy * self_push
 
-            # Vurulanı ileri doğru it
-            other["x"] += ux * hit_push
-            other["y"] += uy * hit_push
+async def sumo_resync(room_id, pid, ws):
+    room = sumo_rooms.get(room_id)
+    if room:
+        ws.sumo_ack = None      # sıradaki ikili snapshot tam gider
+        sumo_broadcast_state(room)
 
-def sumo_check_eliminations(room: dict):
-    radius = float(room.get("arena_radius", 200.0))
-    for p in room["players"].values():
-        if not p.get("alive", True):
-            continue
-        dist = math.hypot(p.get("x", 0.0), p.get("y", 0.0))
-        if dist > radius:
-            p["alive"] = False
+def sumo_leave(room_id, pid):
+    """Oyuncu ayrıldı: blob arenadan çıkar, host devredilir, boşalan oda kapanır."""
+    room = sumo_rooms.get(room_id)
+    if not room:
+        return
+    player = room["players"].pop(pid, None)
+    if player:
+        sumo_phys_free(player)
+        try:
+            asyncio.create_task(sumo_info(room, f"{player['name']} oyundan ayrıldı."))
+        except Exception:
+            pass
 
-    alive = [p for p in room["players"].values() if p.get("alive", False)]
-    if room.get("phase") == "playing" and len(alive) <= 1:
-        room["phase"] = "finished"
-        winner = None
-        if alive:
-            alive[0]["wins"] = alive[0].get("wins", 0) + 1
-            winner = alive[0]["name"]
-        return winner
-    return None
+    if pid == room.get("host_pid"):
+        new_host = next(iter(room["players"]), None)
+        room["host_pid"] = new_host
 
+    if not room["players"]:
+        sumo_rooms.pop(room_id, None)
+        sumo_phys_room_free(room)
+    else:
+        sumo_broadcast_state(room, info="Bir oyuncu oyundan ayrıldı.")
 
 @app.websocket("/ws/sumobash")
 async def ws_sumobash(ws: WebSocket):
     await ws.accept()
+    sock = ws
     pid = secrets.token_hex(4)
+    outbox_open(ws, pid)
     room_id = None
 
     try:
         while True:
-            raw = await ws.receive_text()
+            raw = await sock.receive_text()
             msg = json.loads(raw)
             typ = msg.get("type")
 
+            if typ == "resume" and room_id is None:
+                # kısa kopmadan dönüş: blob arenada kalır, oturumun ilk soketi üzerinden sürer
+                sess = await session_resume(sock, msg, "sumobash")
+                if sess:
+                    ws, room_id, pid = sess["ws"], sess["room_id"], sess["pid"]
+                continue
+
             # ---- join ----
             if typ == "join":
                 room_id = (msg.get("roomId") or "").strip()
                 name = (msg.get("name") or "anon").strip() or "anon"
 
                 if not room_id:
-                    await ws.send_text(json.dumps({"type": "join_error", "reason": "no_room"}))
+                    await ws_send(ws, {"type": "join_error", "reason": "no_room"})
                     continue
 
                 room = sumo_rooms.get(room_id)
                 if room is None:
                     room = make_sumo_room(room_id)
                     sumo_rooms[room_id] = room
+                    sumo_phys_room_add(room)
 
                 is_host = False
                 if not room["players"]:
@@ -1966,23 +5045,41 @@ async def ws_sumobash(ws: WebSocket):
                     is_host = True
 
                 x, y = sumo_random_spawn(room)
-                room["players"][pid] = {
+                back = room["roster"].pop(name, {})     # yeniden başlatma öncesindeki renk / galibiyet
+                player = {
+                    "id": room["next_id"],
                     "name": name,
                     "ws": ws,
-                    "x": x,
-                    "y": y,
                     "alive": True,
-                    "color": sumo_random_color(),
-                    "wins": 0,
+                    "color": back.get("color") or sumo_random_color(),
+                    "wins": back.get("wins", 0),
                 }
+                room["next_id"] = (room["next_id"] + 1) & 0xFFFF
+                # Snapshot biçimi bağlantı başına: "bin" = ikili delta, yoksa JSON state
+                ws.sumo_bin = msg.get("snap") == "bin"
+                ws.sumo_ack = None
+                old = room["players"].get(pid)
+                if old:
+                    sumo_phys_free(old)
+                room["players"][pid] = player
+                sumo_phys_add(room, player, x, y)
+                ckpt_touch(room)
 
-                await ws.send_text(json.dumps({
+                await ws_send(ws, {
                     "type": "joined",
                     "pid": pid,
+                    "id": player["id"],
                     "roomId": room_id,
                     "isHost": is_host,
                     "name": name,
-                }))
+                    "snap": "bin" if ws.sumo_bin else "json",
+                    # sıralı girdi protokolü: istemci tickHz hızında "input" yollar,
+                    # her girdi bir adımda en fazla speed / tickHz px taşır
+                    "tickHz": SUMO_TICK_HZ,
+                    "speed": SUMO_MAX_SPEED,
+                    "time": sumo_now_ms(),
+                })
+                session_open(ws, "sumobash", room_id, pid)
 
                 await sumo_info(room, f"{name} odaya katıldı.")
                 sumo_broadcast_state(room, info="Oyuncular hazır olduğunda host oyunu başlatabilir.")
@@ -1990,51 +5087,75 @@ async def ws_sumobash(ws: WebSocket):
 
             # join gelmediyse
             if room_id is None:
-                await ws.send_text(json.dumps({"type": "info", "msg": "Önce join gönder."}))
+                await ws_send(ws, {"type": "info", "msg": "Önce join gönder."})
                 continue
 
             room = sumo_rooms.get(room_id)
             if not room:
-                await ws.send_text(json.dumps({"type": "info", "msg": "Oda bulunamadı."}))
+                await ws_send(ws, {"type": "info", "msg": "Oda bulunamadı."})
                 continue
 
-            # Her mesajda arena küçülmesini güncelle
-            sumo_update_arena_shrink(room)
+            # ---- ack / resync (ikili snapshot tabanı) ----
+            if typ == "ack":
+                seq = msg.get("seq")
+                if isinstance(seq, int) and seq <= room["snap_seq"] and (getattr(ws, "sumo_ack", None) or 0) <= seq:
+                    ws.sumo_ack = seq
+                continue
+            if typ == "resync":
+                ws.sumo_ack = None
+                continue
 
             # ---- start ----
             if typ == "start":
                 if pid != room.get("host_pid"):
-                    await ws.send_text(json.dumps({"type": "info", "msg": "Yalnızca host oyunu başlatabilir."}))
+                    await ws_send(ws, {"type": "info", "msg": "Yalnızca host oyunu başlatabilir."})
                     continue
                 if len(room["players"]) < 2:
-                    await ws.send_text(json.dumps({"type": "info", "msg": "En az 2 oyuncu gerekli."}))
+                    await ws_send(ws, {"type": "info", "msg": "En az 2 oyuncu gerekli."})
                     continue
 
                 room["phase"] = "playing"
-                room["arena_radius"] = 200.0
-                room["last_update"] = None
+                room["arena_radius"] = sumo_start_radius(room)
                 for p in room["players"].values():
-                    p["alive"] = True
-                    p["x"], p["y"] = sumo_random_spawn(room)
+                    sumo_phys_place(p, *sumo_random_spawn(room))
+                sumo_phys_room_set(room, True)
 
                 sumo_broadcast_state(room, info="Oyun başladı! Arena yavaş yavaş daralıyor, düşmemeye çalışın.")
+                sumo_sim_start()
                 continue
 
             # ---- reset ----
             if typ == "reset":
                 if pid != room.get("host_pid"):
-                    await ws.send_text(json.dumps({"type": "info", "msg": "Yalnızca host yeni tur başlatabilir."}))
+                    await ws_send(ws, {"type": "info", "msg": "Yalnızca host yeni tur başlatabilir."})
                     continue
                 room["phase"] = "waiting"
-                room["arena_radius"] = 200.0
-                room["last_update"] = None
+                room["arena_radius"] = sumo_start_radius(room)
                 for p in room["players"].values():
-                    p["alive"] = True
-                    p["x"], p["y"] = sumo_random_spawn(room)
+                    sumo_phys_place(p, *sumo_random_spawn(room))
+                sumo_phys_room_set(room, False)
                 sumo_broadcast_state(room, info="Yeni tur için hazır. Host oyunu başlatabilir.")
                 continue
 
-            # ---- move ----
+            # ---- input (sıra numaralı yön girdisi) ----
+            if typ == "input":
+                if room.get("phase") != "playing":
+                    continue
+                p = room["players"].get(pid)
+                if not p or not p.get("alive", True):
+                    continue
+                try:
+                    seq = int(msg.get("seq"))
+                    dx = float(msg.get("dx", 0.0))
+                    dy = float(msg.get("dy", 0.0))
+                except (TypeError, ValueError):
+                    continue
+                if not (math.isfinite(dx) and math.isfinite(dy)):
+                    continue
+                sumo_phys_queue_input(p, seq, dx, dy, msg.get("t"))
+                continue
+
+            # ---- move (eski: mutlak hedef konum, hız sınırıyla uygulanır) ----
             if typ == "move":
                 if room.get("phase") != "playing":
                     continue
@@ -2042,48 +5163,891 @@ async def ws_sumobash(ws: WebSocket):
                 if not p or not p.get("alive", True):
                     continue
 
+                x, y = sumo_phys_xy(p)
                 try:
-                    nx = float(msg.get("x", p["x"]))
-                    ny = float(msg.get("y", p["y"]))
+                    nx = float(msg.get("x", x))
+                    ny = float(msg.get("y", y))
                 except (TypeError, ValueError):
                     continue
+                if not (math.isfinite(nx) and math.isfinite(ny)):
+                    continue
 
-                p["x"] = nx
-                p["y"] = ny
+                # Sadece girdiyi kaydet; uygulama bir sonraki simülasyon adımında
+                sumo_phys_input(p, nx, ny)
+                continue
 
-                sumo_resolve_collisions(room, pid)
-                winner = sumo_check_eliminations(room)
+    except WebSocketDisconnect as e:
+        if e.code == 1000:      # istemci bilerek kapattı: koltuk beklemez
+            session_end(ws)
+    except Exception:
+        log.exception("sumobash: bağlantı hatası (oda %s, oyuncu %s)", room_id, pid)
+    finally:
+        if not session_detach(ws, sock):
+            outbox_close(ws)
+            if room_id:
+                sumo_leave(room_id, pid)
 
-                if winner:
-                    sumo_broadcast_state(room, info=f"Tur bitti! Kazanan: {winner}", winner=winner)
-                else:
-                    sumo_broadcast_state(room)
+
+# ==========================
+# Oda checkpoint'leri (yeniden başlatmada oyunlar kaybolmasın)
+# ==========================
+# Oyunlar durumu değiştirip yayınladıkları yerde (broadcast / push_state
+# yardımcıları, sumo'da kadro değişimi) odayı ckpt_touch ile kirli işaretler:
+# oyunculara gitmeyen durum değişikliği yoktur. CKPT_EVERY saniyede bir yalnızca kirli /
+# yeni odalar oyuna özgü pack ile düz veriye indirgenir (soket, görev,
+# zamanlayıcı ayıklanır; kalan süreler saniye olarak saklanır), pickle (protokol
+# 5) + büyükse zlib ile ikili blob olur ve SQLite'a (oyun+oda anahtarlı, WITHOUT
+# ROWID) iş parçacığında tek transaction'da yazılır; kapanan odaların satırı
+# silinir. Açılışta satırlar okunup odalar ve zamanlayıcılar yeniden kurulur.
+# Koltuklar bağlantısız ("restored") döner; her koltuğun o anki oturum jetonu
+# da saklanır: katılırken son jetonunu ("token") gönderen oyuncu kendi
+# koltuğuna oturur (isim yetmez), CKPT_GRACE içinde dönmeyen koltuk oyunun
+# normal ayrılma yolundan çıkar. Turnuva maçları ve dev tuval bu kapsamın dışında: turnuvada
+# kopan oyuncu zaten hükmen kaybeder, tuvalin kendi mmap + günlüğü var.
+CKPT_PATH = os.environ.get("CKPT_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "rooms.sqlite3"))
+CKPT_EVERY = 5.0            # checkpoint aralığı (s)
+CKPT_GRACE = 120.0          # geri yüklenen koltuk bu kadar sahibini bekler
+CKPT_ZLIB_MIN = 2048        # bundan büyük bloblar sıkıştırılır
+
+ckpt = {
+    "db": None,
+    "lock": threading.Lock(),
+    "saved": {},            # oyun -> oda id -> son yazılan oda dict'i
+    "gone": [],             # silinmesi bekleyen (oyun, oda id)
+    "busy": False,
+    "frozen": False,        # son checkpoint alındı: sonraki turlar yazmaz
+    "timer": None,
+    "writes": 0, "rooms": 0, "deleted": 0, "bytes": 0,
+    "encode_ms": 0.0, "write_ms": 0.0, "max_write_ms": 0.0,
+    "restored": 0, "restore_ms": 0.0,
+    "claims": {},           # (oyun, oda id) -> pid -> koltuğun geri alma jetonu
+}
+
+def ckpt_touch(room):
+    """Oda değişti: bir sonraki checkpoint turunda yeniden yazılır."""
+    room["ckpt_dirty"] = True
+
+def ckpt_seats(players):
+    return players.items() if isinstance(players, dict) else [(p["pid"], p) for p in players]
+
+def ckpt_strip(room, skip=()):
+    """Odanın sığ kopyası: canlı alanlar atılır, koltuklar soketsiz ve geri alınabilir işaretli."""
+    out = {k: v for k, v in room.items() if k not in skip and k != "ckpt_dirty"}
+    seats = []
+    for _, pl in ckpt_seats(room["players"]):
+        pl = dict(pl)
+        if "ws" in pl:
+            pl["ws"] = None
+        if not pl.get("bot"):
+            pl["restored"] = True
+        seats.append(pl)
+    out["players"] = dict(zip(room["players"], seats)) if isinstance(room["players"], dict) else seats
+    return out
+
+def ckpt_tokens():
+    """(oyun, oda id) -> pid -> oturum jetonu (kopuk bekleyenler dahil)."""
+    out = {}
+    for token, sess in sessions.items():
+        if "game" in sess:
+            out.setdefault((sess["game"], sess["room_id"]), {})[sess["pid"]] = token
+    return out
+
+def ckpt_reclaim(game, room_id, players, token):
+    """Geri yüklenen bağlantısız koltuğu sahibinin son oturum jetonuyla geri al -> eski pid ya da None."""
+    claims = ckpt["claims"].get((game, room_id))
+    if not claims or not isinstance(token, str):
+        return None
+    for pid, pl in ckpt_seats(players):
+        if pl.get("restored") and pid in claims and secrets.compare_digest(claims[pid], token):
+            del pl["restored"]
+            del claims[pid]
+            return pid
+    return None
+
+async def ckpt_expire(game, room_id):
+    """CKPT_GRACE doldu: sahibi dönmeyen koltuklar normal ayrılma yolundan çıkar."""
+    rooms, leave = CKPT_GAMES[game][0], CKPT_GAMES[game][3]
+    ckpt["claims"].pop((game, room_id), None)
+    room = rooms.get(room_id)
+    if not room:
+        return
+    for pid in [pid for pid, pl in ckpt_seats(room["players"]) if pl.get("restored")]:
+        r = leave(room_id, pid)
+        if asyncio.iscoroutine(r):
+            await r
+
+# ---- Oyuna özgü paketleme / geri yükleme ----
+def pic_ckpt_pack(room):
+    out = ckpt_strip(room, ("clients", "ws_by_pid", "timer", "raster", "pen"))
+    out["deadline"] = timer_left(room["timer"])
+    return out
+
+def pic_ckpt_restore(room_id, data):
+    left = data.pop("deadline")
+    room = pic_room(room_id)
+    room.update(data)
+    # raster yeni stroke'larla yeniden gömülür; açık kalan stroke kapanmış sayılır
+    if left is not None and room["phase"] in ("choosing", "drawing", "intermission"):
+        pic_schedule(room_id, left)
+
+def spyfall_ckpt_pack(room):
+    out = ckpt_strip(room, ("vote_timer", "public_json"))
+    out["vote_left"] = timer_left(room["vote_timer"])
+    return out
+
+def spyfall_ckpt_restore(room_id, data):
+    left = data.pop("vote_left")
+    room = spyfall_new_room()
+    room.update(data)
+    spyfall_rooms[room_id] = room
+    if room["phase"] == "voting":
+        room["vote_timer"] = timer_after(SPYFALL_VOTE_SECONDS if left is None else left, spyfall_finish_voting, room)
+
+def ttt_ckpt_pack(room):
+    return ckpt_strip(room, ("ai_task",))
+
+def ttt_ckpt_restore(room_id, data):
+    room = ttt_new_room()
+    room.update(data)
+    ttt_rooms[room_id] = room
+    ttt_ai_maybe(room_id)
+
+def cn_ckpt_pack(room):
+    return ckpt_strip(room, ("bot_task",))
+
+def cn_ckpt_restore(room_id, data):
+    cn_rooms[room_id] = data
+    cn_bot_maybe(room_id)
+
+def pixel_ckpt_pack(room):
+    if room.get("mode") == "canvas":
+        return None
+    out = ckpt_strip(room, ("timer", "flush_timer", "pending", "deadline"))
+    out["left"] = timer_left(room["timer"])
+    return out
+
+def pixel_ckpt_restore(room_id, data):
+    left = data.pop("left")
+    room = dict(data, pending={}, flush_timer=None, timer=None)
+    pixel_rooms[room_id] = room
+    if room["active"] and left is not None:
+        room["deadline"] = asyncio.get_running_loop().time() + left
+        room["timer"] = timer_at(room["deadline"], pixel_tick, room_id)
+    else:
+        room["active"] = False
+
+def sumo_ckpt_pack(room):
+    # dünya durumu saniyelik; yalnızca kadro (renk, galibiyet) kalıcı
+    roster = dict(room["roster"])
+    roster.update((pl["name"], {"color": pl["color"], "wins": pl["wins"]}) for pl in room["players"].values())
+    return {"roster": roster}
+
+def sumo_ckpt_restore(room_id, data):
+    room = make_sumo_room(room_id)
+    room["roster"] = data["roster"]
+    sumo_rooms[room_id] = room
+    sumo_phys_room_add(room)
+    timer_after(CKPT_GRACE, sumo_ckpt_expire, room_id, room)
+
+def sumo_ckpt_expire(room_id, room):
+    room["roster"].clear()
+    if sumo_rooms.get(room_id) is room and not room["players"]:
+        sumo_rooms.pop(room_id, None)
+        sumo_phys_room_free(room)
+
+def liars_ckpt_pack(room):
+    return ckpt_strip(room, ("bot_task",))
+
+def liars_ckpt_restore(room_id, data):
+    room = liars_new_room(room_id)
+    room.update(data)
+    liars_rooms[room_id] = room
+    roulette = room["roulette"]
+    if room["phase"] == "roulette" and roulette.get("resolved"):
+        timer_after(LIARS_SAFE_DELAY, liars_after_roulette, room, roulette.get("shot", False))
+    else:
+        liars_bot_maybe(room)
+
+# oyun -> (odalar, pack, restore, koltuk bırakma)
+CKPT_GAMES = {
+    "pictionary": (pic_rooms, pic_ckpt_pack, pic_ckpt_restore, pic_leave),
+    "ttt": (ttt_rooms, ttt_ckpt_pack, ttt_ckpt_restore, ttt_leave),
+    "codenames": (cn_rooms, cn_ckpt_pack, cn_ckpt_restore, cn_leave),
+    "pixelwar": (pixel_rooms, pixel_ckpt_pack, pixel_ckpt_restore, pixel_leave),
+    "sumobash": (sumo_rooms, sumo_ckpt_pack, sumo_ckpt_restore, None),
+    "spyfall": (spyfall_rooms, spyfall_ckpt_pack, spyfall_ckpt_restore, spyfall_leave),
+    "liars": (liars_rooms, liars_ckpt_pack, liars_ckpt_restore, liars_leave),
+}
+
+# ---- Depo ----
+def ckpt_db():
+    if ckpt["db"] is None:
+        os.makedirs(os.path.dirname(CKPT_PATH) or ".", exist_ok=True)
+        # timeout: çok süreçli dağıtımda worker'lar aynı dosyaya sırayla yazar
+        db = sqlite3.connect(CKPT_PATH, timeout=10.0, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute("CREATE TABLE IF NOT EXISTS rooms (game TEXT, id TEXT, data BLOB, PRIMARY KEY (game, id)) WITHOUT ROWID")
+        ckpt["db"] = db
+    return ckpt["db"]
+
+def ckpt_encode(data) -> bytes:
+    blob = pickle.dumps(data, protocol=5)
+    if len(blob) >= CKPT_ZLIB_MIN:
+        return b"z" + zlib.compress(blob, 1)
+    return b"p" + blob
+
+def ckpt_decode(blob):
+    return pickle.loads(zlib.decompress(blob[1:]) if blob[:1] == b"z" else blob[1:])
+
+def ckpt_collect():
+    """Event loop'ta (tutarlı anlık görüntü): kirli / yeni odaları paketle, kapananları bul."""
+    started = time.perf_counter()
+    rows, gone = [], ckpt["gone"]
+    ckpt["gone"] = []
+    tokens = ckpt_tokens()
+    for game, (rooms, pack, _, _) in CKPT_GAMES.items():
+        saved = ckpt["saved"].setdefault(game, {})
+        for room_id in saved.keys() - rooms.keys():
+            del saved[room_id]
+            gone.append((game, room_id))
+        for room_id, room in rooms.items():
+            if not room.get("ckpt_dirty") and saved.get(room_id) is room:
                 continue
+            room["ckpt_dirty"] = False
+            data = pack(room)
+            if data is None:
+                continue
+            data["seat_tokens"] = tokens.get((game, room_id), {})
+            rows.append((game, room_id, ckpt_encode(data)))
+            saved[room_id] = room
+    ckpt["encode_ms"] = round((time.perf_counter() - started) * 1000.0, 3)
+    return rows, gone
+
+def ckpt_write(rows, gone):
+    """İş parçacığında: tek transaction'da yaz / sil."""
+    started = time.perf_counter()
+    with ckpt["lock"]:
+        db = ckpt_db()
+        with db:
+            db.executemany("INSERT OR REPLACE INTO rooms VALUES (?, ?, ?)", rows)
+            db.executemany("DELETE FROM rooms WHERE game = ? AND id = ?", gone)
+    ms = (time.perf_counter() - started) * 1000.0
+    ckpt["writes"] += 1
+    ckpt["rooms"] += len(rows)
+    ckpt["deleted"] += len(gone)
+    ckpt["bytes"] += sum(len(r[2]) for r in rows)
+    ckpt["write_ms"] = round(ms, 3)
+    ckpt["max_write_ms"] = max(ckpt["max_write_ms"], ckpt["write_ms"])
+
+async def ckpt_flush():
+    if ckpt["busy"] or ckpt["frozen"]:
+        return
+    rows, gone = ckpt_collect()
+    if not rows and not gone:
+        return
+    ckpt["busy"] = True
+    try:
+        await asyncio.to_thread(ckpt_write, rows, gone)
+    except Exception:
+        log.exception("checkpoint: %d oda yazılamadı, sonraki turda yeniden denenecek", len(rows))
+        # yazılamayanlar bir sonraki turda yeniden denenir
+        for game, room_id, _ in rows:
+            ckpt["saved"][game].pop(room_id, None)
+        ckpt["gone"] += gone
+    finally:
+        ckpt["busy"] = False
+
+async def ckpt_tick():
+    ckpt["timer"] = timer_after(CKPT_EVERY, ckpt_tick)
+    await ckpt_flush()
+
+def ckpt_restore():
+    started = time.perf_counter()
+    n = 0
+    for game, room_id, blob in ckpt_db().execute("SELECT game, id, data FROM rooms").fetchall():
+        entry = CKPT_GAMES.get(game)
+        if entry is None or not hub_owns(game, room_id):
+            continue    # başka worker'ın odası
+        try:
+            data = ckpt_decode(blob)
+            tokens = data.pop("seat_tokens", {})
+            entry[2](room_id, data)
+        except Exception:
+            log.exception("checkpoint: %s/%s geri yüklenemedi", game, room_id)
+            continue
+        room = entry[0].get(room_id)
+        if room is not None:
+            ckpt["saved"].setdefault(game, {})[room_id] = room
+            if entry[3] is not None:
+                ckpt["claims"][(game, room_id)] = tokens
+                timer_after(CKPT_GRACE, ckpt_expire, game, room_id)
+            n += 1
+    ckpt["restored"] = n
+    ckpt["restore_ms"] = round((time.perf_counter() - started) * 1000.0, 3)
+
+async def ckpt_startup():
+    if not CKPT_PATH:
+        return
+    ckpt_restore()
+    ckpt["timer"] = timer_after(CKPT_EVERY, ckpt_tick)
 
-    except WebSocketDisconnect:
-        pass
+async def ckpt_shutdown():
+    """Kapanış: son durumu yaz. Bağlantılar bu noktada kapanmıştır ama oturumu olan
+    koltuklar SESSION_GRACE boyunca yerinde bekler: odalar son hâliyle yazılır."""
+    if not CKPT_PATH or ckpt["frozen"]:
+        return
+    ckpt["frozen"] = True
+    timer_cancel(ckpt["timer"])
+    while ckpt["busy"]:
+        await asyncio.sleep(0.01)   # süren tur önce biter (kaydettiği odalar tekrar yazılmaz)
+    rows, gone = ckpt_collect()
+    await asyncio.to_thread(ckpt_write, rows, gone)
+
+def ckpt_stats() -> dict:
+    return {k: v for k, v in ckpt.items() if k not in ("db", "lock", "saved", "gone", "timer", "claims")} | {
+        "tracked": sum(len(s) for s in ckpt["saved"].values())}
+
+
+# ==========================
+# Oturum sürdürme (kısa kopmalarda koltuk kaybolmasın)
+# ==========================
+# Katılımdan sonra bağlantıya bir resume jetonu verilir ("session" mesajı;
+# istemci bundan sonra aldığı her mesajı sayar). Soket düşünce oyuncu hemen
+# çıkarılmaz: oda hâlâ ilk soket nesnesini tutar, outbox kopuk bekler ve
+# SESSION_GRACE dolunca oyunun normal ayrılma yolu çalışır. Aynı jetonla
+# {"type": "resume", "token", "seq"} gönderen yeni bağlantı outbox'ın soketi
+# olur; outbox halkasında seq'ten sonraki mesajlar yollanır (state sınıfından
+# yalnızca en yenisi; kuyruktaki gibi birleşir), ardından kuyruk kaldığı yerden
+# akar. Halka yetmezse (çok uzun kopukluk / kuyruk taşması) oyunun resync'i
+# tek bir tam state yollar.
+SESSION_GRACE = 30.0        # kopuk koltuk bu kadar bekler (s)
+SESSION_RING = 256          # bağlantı başına tekrar gönderilebilir mesaj sayısı
+
+sessions: Dict[str, dict] = {}      # jeton -> oturum
+session_stats = {"opened": 0, "detached": 0, "resumed": 0, "replayed": 0, "resyncs": 0,
+                 "misses": 0, "expired": 0}
+
+def session_open(ws, game, room_id, pid):
+    """Katılım yanıtından hemen sonra: jeton (varsa aynısı) ve seq sıfırı gider."""
+    ob = ws.outbox
+    sess = ob["session"]
+    if sess is None:
+        token = secrets.token_urlsafe(18)
+        if hub["shards"] > 1:
+            token = f"{hub['shard']}.{token}"  # yönlendirici jetondan worker'ı bulur
+        sess = ob["session"] = {"token": token, "ws": ws, "ob": ob, "timer": None}
+        sessions[sess["token"]] = sess
+        ob["ring"] = deque(maxlen=SESSION_RING)
+        session_stats["opened"] += 1
+    sess.update(game=game, room_id=room_id, pid=pid)
+    outbox_push(ws, json.dumps({"type": "session", "token": sess["token"], "grace": SESSION_GRACE}), "session")
+
+def session_end(ws):
+    """Oyuncu kendi isteğiyle ayrılıyor: bekleme yok, normal ayrılma yolu."""
+    ob = getattr(ws, "outbox", None)
+    sess = ob and ob["session"]
+    if sess:
+        sessions.pop(sess["token"], None)
+        timer_cancel(sess["timer"])
+        ob["session"] = ob["ring"] = None
+
+def session_detach(ws, sock) -> bool:
+    """Handler'ın finally'si: koltuk beklemeye alındıysa True (ayrılma yapılmaz)."""
+    ob = getattr(ws, "outbox", None)
+    sess = ob and ob["session"]
+    if not sess or ob["dead"]:
+        return False
+    if ob["sock"] is not sock:
+        return True         # oturum bu arada yeni bir bağlantıya geçti
+    ob["task"].cancel()
+    ob["detached"] = True
+    timer_cancel(sess["timer"])
+    sess["timer"] = timer_after(SESSION_GRACE, session_expire, sess)
+    session_stats["detached"] += 1
+    return True
+
+async def session_expire(sess):
+    if sessions.get(sess["token"]) is not sess:
+        return
+    del sessions[sess["token"]]
+    session_stats["expired"] += 1
+    outbox_close(sess["ws"])
+    r = SESSION_GAMES[sess["game"]][0](sess["room_id"], sess["pid"])
+    if asyncio.iscoroutine(r):
+        await r
+
+async def session_close_quietly(sock):
+    try:
+        await sock.close()
     except Exception:
-        # loglamak istersen buraya print ya da logger koyabilirsin
         pass
+
+async def session_resume(sock, data, game):
+    """Jetonun oturumunu bu sokete bağlar -> oturum ya da None (resume_error gider)."""
+    sess = sessions.get(str(data.get("token") or ""))
+    if sess is not None and sess["game"] != game:
+        sess = None
+    room = GAME_ROOMS[game].get(sess["room_id"]) if sess else None
+    if room is None or not any(p == sess["pid"] for p, _ in ckpt_seats(room["players"])):
+        if sess:
+            # oda / koltuk artık yok (oda kapandı, oyuncu atıldı)
+            sessions.pop(sess["token"], None)
+            timer_cancel(sess["timer"])
+            outbox_close(sess["ws"])
+        session_stats["misses"] += 1
+        await ws_send(sock, {"type": "resume_error", "reason": "expired"})
+        return None
+
+    ob = sess["ob"]
+    timer_cancel(sess["timer"])
+    sess["timer"] = None
+    ob["task"].cancel()
+    ob["detached"] = True
+    old, ob["sock"] = ob["sock"], sock
+    outbox_close(sock)                  # bu bağlantının kendi (boş) kuyruğu
+    if old is not sock:
+        asyncio.create_task(session_close_quietly(old))     # yarı açık kalmış eski soket
+
+    seq, ring = data.get("seq"), ob["ring"]
+    first = ob["seq"] - len(ring)       # halkadaki ilk mesajın seq'i first + 1
+    gap = ob["lossy"] or not isinstance(seq, int) or not first <= seq <= ob["seq"]
+    if gap:
+        ring.clear()
+        ob["seq"] = 0
+        replay = []
+    else:
+        missed = list(ring)[seq - first:]
+        last_state = max((i for i, e in enumerate(missed) if e[0] == "state"), default=-1)
+        replay = [e for i, e in enumerate(missed) if e[0] != "state" or i == last_state]
+
+    # tekrar gidenler istemcinin sayacında zaten var: "resumed" yeni seq'i ve kaç
+    # mesajın sayılmayacağını söyler
+    head = json.dumps({"type": "resumed", "pid": sess["pid"], "seq": ob["seq"], "replay": len(replay), "resync": gap})
+    for msg in [head] + [e[1] for e in replay]:
+        if not await fanout_send_one(sock, msg):
+            return sess     # yeni soket de düştü: handler'ın finally'si beklemeye alır
+    ob["detached"] = ob["lossy"] = False
+    ob["task"] = asyncio.create_task(outbox_writer(ob))
+    session_stats["resumed"] += 1
+    session_stats["replayed"] += len(replay)
+    if gap:
+        session_stats["resyncs"] += 1
+        await SESSION_GAMES[game][1](sess["room_id"], sess["pid"], sess["ws"])
+    return sess
+
+# oyun -> (koltuk bırakma, tek oyuncuya tam state)
+SESSION_GAMES = {
+    "pictionary": (pic_leave, pic_resync),
+    "ttt": (ttt_leave, ttt_resync),
+    "codenames": (cn_leave, cn_resync),
+    "pixelwar": (pixel_leave, pixel_resync),
+    "sumobash": (sumo_leave, sumo_resync),
+    "spyfall": (spyfall_leave, spyfall_resync),
+    "liars": (liars_leave, liars_resync),
+}
+
+# ==========================
+# Çok süreçli dağıtım (oda yakınlığıyla yönlendirme)
+# ==========================
+# `python server.py --workers N`: ana süreç yalnızca yönlendirici (router) olur,
+# oyunları N worker süreci taşır; worker'lar durum paylaşmaz. Her oda
+# (oyun, oda adı) tutarlı hash halkasıyla tek bir worker'a aittir; worker sayısı
+# değişirse odaların yalnızca ~1/N'i yer değiştirir. Yönlendirici isteğin
+# başlığını okur ve:
+#  - /ws/<oyun>?room=<oda>: TCP soketini (SCM_RIGHTS) okunmuş başlık baytlarıyla
+#    sahibi worker'a devreder. Worker soketi kendi uvicorn'una bağlar; bundan
+#    sonra yönlendirici veri yolunda değildir (mesaj başına maliyet yok).
+#  - /ws/pixelwar?span=1 (büyük tuval): bağlantılar worker'lara sırayla dağılır;
+#    aynı tuvalin üyeleri yayın arka düzlemiyle (BACKPLANE) buluşur.
+#  - /ws/<oyun> (oda parametresi yok, eski istemciler): el sıkışmayı kendisi
+#    yapar, ilk frame'deki roomId / tourId / resume jetonundan worker'ı bulur ve
+#    bağlantıyı worker'ın unix soketine aktarır (proxy; sıkıştırma kapalı).
+#  - /rooms, /stats, /health: tüm worker'lardan toplar.
+#  - diğer HTTP (statik dosyalar): sırayla bir worker'a devreder.
+# Ölen worker yeniden başlatılır ve kendi odalarını checkpoint'ten geri yükler.
+HUB_VNODES = 64             # worker başına halka noktası
+HUB_HEAD_MAX = 16384        # istek başlığı / ilk frame üst sınırı (bayt)
+HUB_HEAD_TIMEOUT = 10.0     # başlık bu sürede gelmezse bağlantı kapanır (s)
+HUB_WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+HUB_SPAN_GAMES = {"pixelwar"}   # ?span=1 ile odası worker'lara yayılabilen oyunlar (tuval)
+
+hub = {"shard": 0, "shards": 1, "ring": [], "owners": [], "dir": None, "server": None, "adopted": 0}
+hub_stats = {"handoff": 0, "proxied": 0, "http": 0, "aggregated": 0, "rejected": 0, "restarts": 0}
+
+def hub_hash(key: str) -> int:
+    # blake2b: hash() gibi süreçten sürece değişmez
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+def hub_setup(shard: int, shards: int):
+    points = sorted((hub_hash(f"worker-{w}#{v}"), w) for w in range(shards) for v in range(HUB_VNODES))
+    hub.update(shard=shard, shards=shards, ring=[h for h, _ in points], owners=[w for _, w in points])
+
+def hub_room_key(game: str, room) -> str:
+    """Handler'ların oda adını nasıl anahtarladığıyla aynı."""
+    room = str(room if room is not None else "")
+    if game == "ttt-tour":
+        return room[:64]
+    return room.strip() if game == "sumobash" else room
+
+def hub_shard(game: str, room_id: str) -> int:
+    if hub["shards"] == 1:
+        return 0
+    i = bisect.bisect(hub["ring"], hub_hash(f"{game}/{room_id}")) % len(hub["ring"])
+    return hub["owners"][i]
+
+def hub_owns(game: str, room_id: str) -> bool:
+    return hub_shard(game, room_id) == hub["shard"]
+
+def hub_path(shard: int, kind: str) -> str:
+    return os.path.join(hub["dir"], f"w{shard}.{kind}")
+
+# ---- worker tarafı ----
+def hub_adopt(fd: int, head: bytes):
+    """Devredilen TCP soketini uvicorn'un HTTP protokolüyle sürdürür; yönlendiricinin
+    okuduğu başlık baytları protokole soketten gelmiş gibi verilir."""
+    server = hub["server"]
+    config = server.config
+
+    def protocol():
+        proto = config.http_protocol_class(config=config, server_state=server.server_state,
+                                           app_state=server.lifespan.state)
+        made = proto.connection_made
+
+        def connection_made(transport):
+            made(transport)
+            proto.data_received(head)   # okuyucu eklenmeden önce (call_soon sırası)
+        proto.connection_made = connection_made
+        return proto
+
+    sock = socket.socket(fileno=fd)
+    sock.setblocking(False)
+    hub["adopted"] += 1
+    asyncio.create_task(asyncio.get_running_loop().connect_accepted_socket(protocol, sock))
+
+def hub_ctl_read(conn):
+    while True:
+        try:
+            head, fds, _, _ = socket.recv_fds(conn, HUB_HEAD_MAX + 1024, 1)
+        except BlockingIOError:
+            return
+        except OSError:
+            head, fds = b"", []
+        if not head and not fds:
+            asyncio.get_running_loop().remove_reader(conn)
+            conn.close()
+            return
+        for fd in fds:
+            hub_adopt(fd, head)
+
+def hub_ctl_accept(lsock):
+    conn, _ = lsock.accept()
+    conn.setblocking(False)
+    asyncio.get_running_loop().add_reader(conn, hub_ctl_read, conn)
+
+async def hub_worker_startup():
+    if hub["dir"] is None:
+        return
+    lsock = socket.socket(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+    lsock.bind(hub_path(hub["shard"], "ctl"))
+    lsock.listen(4)
+    lsock.setblocking(False)
+    asyncio.get_running_loop().add_reader(lsock, hub_ctl_accept, lsock)
+
+def hub_worker(shard: int, shards: int, sock_dir: str, log_level: str):
+    global CPU_WORKERS
+    hub_setup(shard, shards)
+    hub["dir"] = sock_dir
+    CPU_WORKERS = max(1, CPU_WORKERS // shards)     # çekirdekler worker'lar arasında
+    config = uvicorn.Config(app, uds=hub_path(shard, "http"), log_level=log_level)
+    hub["server"] = uvicorn.Server(config)
+    hub["server"].run()
+
+# ---- yönlendirici tarafı ----
+async def hub_read_head(sock) -> bytes:
+    loop = asyncio.get_running_loop()
+    buf = b""
+    while b"\r\n\r\n" not in buf:
+        if len(buf) > HUB_HEAD_MAX:
+            raise ValueError("başlık çok uzun")
+        data = await loop.sock_recv(sock, 65536)
+        if not data:
+            raise ValueError("bağlantı kapandı")
+        buf += data
+    return buf
+
+def hub_parse_head(buf: bytes):
+    """-> (yöntem, yol, sorgu, başlık satırları, küçük harf başlık sözlüğü)"""
+    lines = buf.partition(b"\r\n\r\n")[0].decode("latin-1").split("\r\n")
+    method, target = (lines[0].split(" ") + ["", ""])[:2]
+    path, _, query = target.partition("?")
+    headers = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+    return method, path, query, lines, headers
+
+def hub_rebuild(buf: bytes, lines, drop, add=()) -> bytes:
+    """Başlıktan `drop` adlı satırları çıkarıp `add` satırlarını ekler; gövde aynen kalır."""
+    kept = [l for l in lines[1:] if l.partition(":")[0].strip().lower() not in drop]
+    head = "\r\n".join([lines[0]] + kept + list(add)) + "\r\n\r\n"
+    return head.encode("latin-1") + buf.partition(b"\r\n\r\n")[2]
+
+async def hub_writable(sock):
+    loop = asyncio.get_running_loop()
+    fut = loop.create_future()
+    loop.add_writer(sock, lambda: fut.done() or fut.set_result(None))
+    try:
+        await fut
     finally:
-        if room_id and room_id in sumo_rooms:
-            room = sumo_rooms[room_id]
-            player = room["players"].pop(pid, None)
-            if player:
-                try:
-                    asyncio.create_task(sumo_info(room, f"{player['name']} oyundan ayrıldı."))
-                except Exception:
-                    pass
+        loop.remove_writer(sock)
 
-            if pid == room.get("host_pid"):
-                new_host = next(iter(room["players"]), None)
-                room["host_pid"] = new_host
+async def hub_handoff(csock, shard: int, head: bytes):
+    ctl = hub["ctls"][shard]
+    try:
+        if ctl is None:
+            raise ConnectionError("worker yeniden başlıyor")
+        while True:
+            try:
+                socket.send_fds(ctl, [head], [csock.fileno()])
+                break
+            except BlockingIOError:
+                await hub_writable(ctl)
+        hub_stats["handoff"] += 1
+        hub["routed"][shard] += 1
+    except OSError:
+        hub_stats["rejected"] += 1
+    finally:
+        csock.close()   # worker'da kopyası var; bağlantı orada sürer
+
+async def hub_read_frame(sock):
+    """İstemcinin ilk (maskeli) frame'i -> (okunan ham baytlar, çözülmüş payload)."""
+    loop = asyncio.get_running_loop()
+    buf = b""
+
+    async def need(n):
+        nonlocal buf
+        while len(buf) < n:
+            data = await loop.sock_recv(sock, 65536)
+            if not data:
+                raise ValueError("bağlantı kapandı")
+            buf += data
+
+    await need(2)
+    n, off = buf[1] & 0x7F, 2
+    if n == 126:
+        await need(4)
+        n, off = int.from_bytes(buf[2:4], "big"), 4
+    elif n == 127:
+        await need(10)
+        n, off = int.from_bytes(buf[2:10], "big"), 10
+    if n > HUB_HEAD_MAX:
+        raise ValueError("ilk frame çok uzun")
+    await need(off + 4 + n)
+    mask = buf[off:off + 4]
+    payload = bytes(b ^ mask[i % 4] for i, b in enumerate(buf[off + 4:off + 4 + n]))
+    return buf, payload
+
+def hub_frame_shard(game: str, payload: bytes) -> int:
+    try:
+        data = json.loads(payload)
+    except ValueError:
+        data = None
+    if not isinstance(data, dict):
+        data = {}
+    token = data.get("token")
+    if data.get("type") == "resume" and isinstance(token, str):
+        shard = token.partition(".")[0]
+        if shard.isdigit() and int(shard) < hub["shards"]:
+            return int(shard)
+    return hub_shard(game, hub_room_key(game, data.get("tourId" if game == "ttt-tour" else "roomId")))
+
+async def hub_pipe(src, dst):
+    loop = asyncio.get_running_loop()
+    try:
+        while data := await loop.sock_recv(src, 65536):
+            await loop.sock_sendall(dst, data)
+    except OSError:
+        pass
+    finally:
+        try:
+            dst.shutdown(socket.SHUT_WR)
+        except OSError:
+            pass
 
-            if not room["players"]:
-                sumo_rooms.pop(room_id, None)
-            else:
-                sumo_broadcast_state(room, info="Bir oyuncu oyundan ayrıldı.")
+async def hub_proxy_ws(csock, buf: bytes, lines, headers, game: str):
+    loop = asyncio.get_running_loop()
+    key = headers.get("sec-websocket-key", "")
+    accept = base64.b64encode(hashlib.sha1((key + HUB_WS_GUID).encode()).digest()).decode()
+    await loop.sock_sendall(csock, ("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\n"
+                                    f"Connection: Upgrade\r\nSec-WebSocket-Accept: {accept}\r\n\r\n").encode())
+    first, payload = await asyncio.wait_for(hub_read_frame(csock), HUB_HEAD_TIMEOUT)
+    shard = hub_frame_shard(game, payload)
+    wsock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    wsock.setblocking(False)
+    try:
+        await loop.sock_connect(wsock, hub_path(shard, "http"))
+        # istemciyle uzantısız anlaştık: worker da sıkıştırmasız konuşmalı
+        await loop.sock_sendall(wsock, hub_rebuild(buf, lines, {"sec-websocket-extensions"}))
+        resp = await asyncio.wait_for(hub_read_head(wsock), HUB_HEAD_TIMEOUT)
+        if not resp.startswith(b"HTTP/1.1 101"):
+            raise ConnectionError("worker yükseltmeyi reddetti")
+        extra = resp.partition(b"\r\n\r\n")[2]      # worker'ın 101'i atılır, sonrası istemciye
+        if extra:
+            await loop.sock_sendall(csock, extra)
+        await loop.sock_sendall(wsock, first)
+        hub_stats["proxied"] += 1
+        hub["routed"][shard] += 1
+        await asyncio.gather(hub_pipe(csock, wsock), hub_pipe(wsock, csock))
+    finally:
+        wsock.close()
+
+async def hub_fetch(shard: int, path: str):
+    reader, writer = await asyncio.open_unix_connection(hub_path(shard, "http"))
+    try:
+        writer.write(f"GET {path} HTTP/1.0\r\nHost: hub\r\n\r\n".encode())
+        raw = await asyncio.wait_for(reader.read(), HUB_HEAD_TIMEOUT)
+    finally:
+        writer.close()
+    return json.loads(raw.partition(b"\r\n\r\n")[2])
+
+async def hub_aggregate(csock, path: str):
+    shards = range(hub["shards"])
+    results = await asyncio.gather(*(hub_fetch(w, path) for w in shards), return_exceptions=True)
+    ok = [not isinstance(r, Exception) for r in results]
+    if path == "/rooms":
+        out = [dict(room, worker=w) for w in shards if ok[w] for room in results[w]]
+    elif path == "/stats":
+        out = {"router": hub_router_stats(),
+               "workers": [results[w] if ok[w] else {"error": repr(results[w])} for w in shards]}
+    else:
+        out = {"status": "ok" if all(ok) else "degraded", "workers": ok,
+               "time": datetime.utcnow().isoformat()+"Z"}
+    body = json.dumps(out).encode()
+    hub_stats["aggregated"] += 1
+    await asyncio.get_running_loop().sock_sendall(csock, (
+        "HTTP/1.1 200 OK\r\ncontent-type: application/json\r\naccess-control-allow-origin: *\r\n"
+        f"content-length: {len(body)}\r\nconnection: close\r\n\r\n").encode() + body)
+
+async def hub_route(csock):
+    try:
+        buf = await asyncio.wait_for(hub_read_head(csock), HUB_HEAD_TIMEOUT)
+        method, path, query, lines, headers = hub_parse_head(buf)
+        if path.startswith("/ws/") and headers.get("upgrade", "").lower() == "websocket":
+            game = path[4:]
+            params = urllib.parse.parse_qs(query)
+            if game in HUB_SPAN_GAMES and params.get("span"):
+                # yayılabilen oda: bağlantı sırayla bir worker'a (resume: oturumun
+                # worker'ına), üyeler arka düzlemle buluşur
+                worker = params.get("worker", [""])[0]
+                if worker.isdigit() and int(worker) < hub["shards"]:
+                    return await hub_handoff(csock, int(worker), buf)
+                hub["next"] = (hub["next"] + 1) % hub["shards"]
+                return await hub_handoff(csock, hub["next"], buf)
+            room = params.get("room")
+            if room:
+                return await hub_handoff(csock, hub_shard(game, hub_room_key(game, room[0])), buf)
+            return await hub_proxy_ws(csock, buf, lines, headers, game)
+        if method == "GET" and path in ("/rooms", "/stats", "/health"):
+            return await hub_aggregate(csock, path)
+        # statik dosyalar vb.: keep-alive'daki sonraki istekler yanlış worker'a
+        # kalmasın diye tek istekte kapanır
+        hub_stats["http"] += 1
+        hub["next"] = (hub["next"] + 1) % hub["shards"]
+        await hub_handoff(csock, hub["next"], hub_rebuild(buf, lines, {"connection"}, ["Connection: close"]))
+    except (OSError, ValueError, asyncio.TimeoutError):
+        hub_stats["rejected"] += 1
+    finally:
+        if csock.fileno() != -1:
+            csock.close()
+
+def hub_router_stats() -> dict:
+    return dict(hub_stats, routed=hub["routed"], pids=[p.pid for p in hub["procs"]])
 
+def hub_spawn(shard: int, log_level: str):
+    for kind in ("ctl", "http", "bp"):
+        try:
+            os.unlink(hub_path(shard, kind))
+        except FileNotFoundError:
+            pass
+    hub["ctls"][shard] = None
+    hub["procs"][shard] = subprocess.Popen([
+        sys.executable, os.path.abspath(__file__), "--worker", str(shard), "--workers", str(hub["shards"]),
+        "--sock-dir", hub["dir"], "--log-level", log_level])
+
+async def hub_connect(shard: int):
+    """Worker uvicorn'u dinlemeye başlayınca (http soketi var) kontrol soketine bağlanır."""
+    proc = hub["procs"][shard]
+    while proc.poll() is None:
+        if os.path.exists(hub_path(shard, "http")):
+            ctl = socket.socket(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+            try:
+                ctl.connect(hub_path(shard, "ctl"))
+            except OSError:
+                ctl.close()
+            else:
+                ctl.setblocking(False)
+                hub["ctls"][shard] = ctl
+                return
+        await asyncio.sleep(0.05)
+
+async def hub_supervise(log_level: str):
+    while True:
+        await asyncio.sleep(1.0)
+        for shard, proc in enumerate(hub["procs"]):
+            if proc.poll() is not None:
+                log.warning("hub: worker %d çıktı (%s), yeniden başlatılıyor", shard, proc.returncode)
+                if hub["ctls"][shard] is not None:
+                    hub["ctls"][shard].close()
+                hub_stats["restarts"] += 1
+                hub_spawn(shard, log_level)
+                await hub_connect(shard)
+
+async def hub_router(host: str, port: int, workers: int, log_level: str):
+    loop = asyncio.get_running_loop()
+    # yönlendiricide uvicorn çalışmaz: günlük ayarı worker'larınkiyle aynı olsun
+    logging.config.dictConfig(uvicorn.config.LOGGING_CONFIG)
+    log.setLevel(log_level.upper())
+    hub_setup(0, workers)
+    hub.update(dir=tempfile.mkdtemp(prefix="gamehub-"), procs=[None] * workers, ctls=[None] * workers,
+               routed=[0] * workers, next=0)
+    lsock = None
+    try:
+        for shard in range(workers):
+            hub_spawn(shard, log_level)
+        await asyncio.gather(*(hub_connect(shard) for shard in range(workers)))
+        lsock = socket.create_server((host, port), backlog=2048)
+        lsock.setblocking(False)
+        stop = asyncio.Event()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, stop.set)
+        log.info("hub: %d worker, http://%s:%d", workers, host, port)
+        supervisor = asyncio.create_task(hub_supervise(log_level))
+
+        async def accept():
+            while True:
+                csock, _ = await loop.sock_accept(lsock)
+                csock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                asyncio.create_task(hub_route(csock))
+
+        acceptor = asyncio.create_task(accept())
+        await stop.wait()
+        supervisor.cancel()
+        acceptor.cancel()
+    finally:
+        if lsock is not None:
+            lsock.close()
+        # SIGTERM: her worker son checkpoint'ini alıp kapanır
+        for proc in hub["procs"]:
+            if proc is not None and proc.poll() is None:
+                proc.terminate()
+        for proc in hub["procs"]:
+            if proc is not None:
+                try:
+                    await asyncio.to_thread(proc.wait, 15)
+                except subprocess.TimeoutExpired:
+                    proc.kill()
+        shutil.rmtree(hub["dir"], ignore_errors=True)
 
 # ==========================
 # Health / Rooms
@@ -2096,9 +6060,11 @@ def health():
 def list_rooms():
     out=[]
     for rid, r in pic_rooms.items():
-        out.append({"game":"pictionary","roomId":rid,"players":len(r["players"]),"started":r.get("started",False),"secondsLeft":r.get("seconds_left",0)})
+        out.append({"game":"pictionary","roomId":rid,"players":len(r["players"]),"started":r.get("started",False),"phase":r.get("phase","idle"),"secondsLeft":r.get("seconds_left",0)})
     for rid, r in ttt_rooms.items():
         out.append({"game":"ttt","roomId":rid,"players":len(r["players"])})
+    for rid, r in ttt_tours.items():
+        out.append({"game":"ttt-tour","roomId":rid,"players":len(r["players"]),"phase":r["phase"],"live":r["live"]})
     for rid, r in sumo_rooms.items():
         out.append({
             "game": "sumobash",
@@ -2113,6 +6079,23 @@ def list_rooms():
             "players": len(r["players"]),
             "phase": r.get("phase", "lobby")
         })
+    for rid, r in pixel_rooms.items():
+        # paylaşılan tuval worker'lara yayılır: her worker kendi oyuncularını sayar
+        out.append({
+            "game": "pixelwar",
+            "roomId": rid,
+            "players": len(r["players"]),
+            "mode": r.get("mode", "board"),
+            "active": r.get("active", False)
+        })
+    for rid, r in liars_rooms.items():
+        out.append({
+            "game": "liars",
+            "roomId": rid,
+            "players": len(r["players"]),
+            "bots": sum(1 for pl in r["players"].values() if pl.get("bot")),
+            "phase": r.get("phase", "lobby")
+        })
 
 
     for rid, r in cn_rooms.items():
@@ -2121,7 +6104,49 @@ def list_rooms():
         else:
             out.append({"game":"codenames","roomId":rid,"phase":"play","turn":r["turn"]})
     return JSONResponse(out)
+
+GAME_ROOMS = {
+    "pictionary": pic_rooms,
+    "ttt": ttt_rooms,
+    "ttt-tour": ttt_tours,
+    "codenames": cn_rooms,
+    "pixelwar": pixel_rooms,
+    "sumobash": sumo_rooms,
+    "spyfall": spyfall_rooms,
+    "liars": liars_rooms,
+}
+
+@app.get("/stats")
+def room_stats():
+    """Oda başına yayın (fan-out) gecikmesi + bağlantı kuyruk derinlikleri."""
+    out=[]
+    for game, rooms in GAME_ROOMS.items():
+        for rid, r in list(rooms.items()):
+            entry = {"game": game, "roomId": rid, "fanout": r.get("fanout_stats")}
+            if "canvas_stats" in r:
+                entry["canvas"] = r["canvas_stats"]
+            out.append(entry)
+    return JSONResponse({"rooms": out, "outboxes": outbox_stats(), "timers": timer_stats(), "sumo": sumo_sim_stats(),
+                         "codenamesBot": cn_bot_stats, "liarsBot": liars_bot_stats, "checkpoint": ckpt_stats(),
+                         "sessions": dict(session_stats, live=len(sessions)), "backplane": bp_view(),
+                         "tttBoards": {"live": ttt_boards["live"], "slots": len(ttt_boards["x"]), "moves": ttt_boards["moves"]}})
 # ====== Statik Dosyalar (HTML Oyunlar) ======
 BASE_DIR = os.path.dirname(__file__)
 STATIC_DIR = os.path.join(BASE_DIR, "static")
 app.mount("/", StaticFiles(directory=STATIC_DIR, html=True), name="static")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Game Hub sunucusu")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=1, help="1'den büyükse router + N worker süreci")
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--worker", type=int, default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--sock-dir", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker is not None:
+        hub_worker(args.worker, args.workers, args.sock_dir, args.log_level)
+    elif args.workers > 1:
+        asyncio.run(hub_router(args.host, args.port, args.workers, args.log_level))
+    else:
+        uvicorn.run(app, host=args.host, port=args.port, log_level=args.log_level)
@@ -0,0 +1,128 @@
+"""Çok süreçli dağıtım ölçeklenmesi: worker sayısına göre saniyedeki mesaj.
+
+Her worker sayısı için `server.py --workers N` başlatılır (N = 1 tek süreç
+uvicorn'dur). Oda başına 1 gönderici + 3 dinleyici Pictionary sohbeti
+yürütülür; gönderici kapalı döngüde en fazla --window mesajı yanıtsız tutar.
+Yük ayrı süreçlerden (--gens) gelir. Sayılan, dinleyicilere teslim edilen
+mesajlardır. Doğrusal ölçeklenme için her worker'a (ve yük üreticilerine) ayrı
+çekirdek gerekir; çekirdek sayısı çıktıda yazılır.
+
+    python tests/bench_hub_workers.py --max-workers 4 --rooms 64 --seconds 10
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+import websockets
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    s = socket.socket()
+    s.bind(("127.0.0.1", 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+
+def start(workers):
+    port = free_port()
+    proc = subprocess.Popen([sys.executable, "server.py", "--workers", str(workers), "--port", str(port),
+                             "--log-level", "warning"],
+                            cwd=ROOT, env=dict(os.environ, CKPT_PATH=""), stderr=subprocess.DEVNULL)
+    for _ in range(300):
+        try:
+            socket.create_connection(("127.0.0.1", port), 0.1).close()
+            break
+        except OSError:
+            time.sleep(0.1)
+    time.sleep(0.5)
+    return proc, port
+
+
+async def room_load(port, room_id, window, t_start, t_end, counter):
+    socks = []
+    for i in range(4):
+        ws = await websockets.connect(f"ws://127.0.0.1:{port}/ws/pictionary?room={room_id}",
+                                      max_size=None, compression=None)
+        await ws.send(json.dumps({"type": "join", "roomId": room_id, "name": f"p{i}",
+                                  "mode": "create" if i == 0 else "join"}))
+        socks.append(ws)
+    credit = asyncio.Semaphore(window)
+
+    async def listen(ws, sender):
+        async for m in ws:
+            if '"chat"' in m:
+                if t_start <= time.time() < t_end:
+                    counter[0] += 1
+                if sender:
+                    credit.release()
+
+    tasks = [asyncio.create_task(listen(ws, i == 0)) for i, ws in enumerate(socks)]
+    await asyncio.sleep(max(0.0, t_start - 1.5 - time.time()))
+    while time.time() < t_end:
+        await credit.acquire()
+        await socks[0].send('{"type":"chat","text":"hello world"}')
+    for t in tasks:
+        t.cancel()
+    for ws in socks:
+        await ws.close()
+
+
+def loadgen(port, rooms, window, t_start, t_end, q):
+    counter = [0]
+
+    async def main():
+        await asyncio.gather(*(room_load(port, r, window, t_start, t_end, counter) for r in rooms),
+                             return_exceptions=True)
+    asyncio.run(main())
+    q.put(counter[0])
+
+
+def run(workers, args):
+    proc, port = start(workers)
+    try:
+        t_start = time.time() + 4.0     # bağlanma / katılma payı
+        t_end = t_start + args.seconds
+        rooms = [f"bench{i}" for i in range(args.rooms)]
+        q = multiprocessing.Queue()
+        gens = [multiprocessing.Process(target=loadgen, args=(port, rooms[g::args.gens], args.window, t_start, t_end, q))
+                for g in range(args.gens)]
+        for g in gens:
+            g.start()
+        total = sum(q.get() for _ in gens)
+        for g in gens:
+            g.join()
+        return total / args.seconds
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        proc.wait(20)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--max-workers", type=int, default=4)
+    parser.add_argument("--rooms", type=int, default=64)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--window", type=int, default=8)
+    parser.add_argument("--gens", type=int, default=2, help="yük üreten süreç sayısı")
+    args = parser.parse_args()
+
+    print(f"cpus={os.cpu_count()} rooms={args.rooms} seconds={args.seconds} window={args.window} gens={args.gens}")
+    base = None
+    for workers in range(1, args.max_workers + 1):
+        rate = run(workers, args)
+        base = base or rate
+        print(f"workers={workers}  {rate:9.0f} msg/s  x{rate / base:4.2f}  (doğrusal: x{workers})", flush=True)
+
+
+if __name__ == "__main__":
+    main()
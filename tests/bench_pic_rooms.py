@@ -0,0 +1,54 @@
+"""Pictionary: çok sayıda odada tur sürerken olay döngüsü gecikmesi.
+
+Süreç içinde (soket yok) --rooms oda kurulur; her odada --players sahte
+bağlantı vardır ve tur başlatılır. Seçim süresi kısaltıldığı için odalar
+kısa sürede drawing fazına geçer ve her biri saniyede bir deadline işletir.
+Ölçülen: canlı asyncio task sayısı, çarktaki zamanlayıcılar ve 0.5 s'lik
+uykuların gecikmesi (loop lag).
+
+    python tests/bench_pic_rooms.py --rooms 5000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import server  # noqa: E402
+from test_pic_phases import make_room  # noqa: E402
+
+
+async def run(args):
+    t = time.perf_counter()
+    for i in range(args.rooms):
+        make_room(f"r{i}", args.players)
+        await server.pic_start_round(f"r{i}")
+    print(f"{args.rooms} oda {time.perf_counter() - t:.2f} s'de kuruldu")
+    await asyncio.sleep(server.CHOICE_SECONDS + 0.5)
+
+    loop = asyncio.get_running_loop()
+    lag = []
+    for _ in range(args.samples):
+        t0 = loop.time()
+        await asyncio.sleep(0.5)
+        lag.append((loop.time() - t0 - 0.5) * 1000)
+    drawing = sum(r["phase"] == "drawing" for r in server.pic_rooms.values())
+    print(f"drawing: {drawing}  task: {len(asyncio.all_tasks())}  çark: {server.timer_stats()['pending']}  "
+          f"loop handle: {len(loop._scheduled)}")
+    print(f"loop lag ms: en az {min(lag):.1f}  ortalama {sum(lag) / len(lag):.1f}  en çok {max(lag):.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rooms", type=int, default=5000)
+    parser.add_argument("--players", type=int, default=4)
+    parser.add_argument("--samples", type=int, default=10)
+    args = parser.parse_args()
+    server.CHOICE_SECONDS = 0.5
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
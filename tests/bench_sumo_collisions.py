@@ -0,0 +1,135 @@
+"""Sumo Bash: oyuncu sayısına göre fizik adımı süresi (ms), eski ve yeni yol.
+
+  - eski: oda dict'i üzerinde hareket eden her top için tüm çiftleri tarayan
+    çarpışma (ilk sürümdeki sumo_resolve_collisions ile aynı hesap, aşağıda)
+  - yeni: tüm odaların tek NumPy dizisinde sıralayıp-süpürme (sort-and-sweep)
+    geniş fazıyla ilerlediği sumo_step
+
+Her adımda her canlı top rastgele bir hedefe yönelir. Yeni yolda temaslar tek
+geçişte toplandığı ve hız sınırı olduğu için konumlar eski yolla birebir aynı
+değildir; karşılaştırılan yalnızca süredir.
+
+    python tests/bench_sumo_collisions.py --players 6 25 100 400 1000 --rooms 1
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import server  # noqa: E402
+
+
+def old_resolve_collisions(room, mover_pid, ball_radius=18.0):
+    p = room["players"].get(mover_pid)
+    if not p or not p.get("alive", True):
+        return
+    for pid2, other in room["players"].items():
+        if pid2 == mover_pid or not other.get("alive", True):
+            continue
+        dx = other["x"] - p["x"]
+        dy = other["y"] - p["y"]
+        dist = math.hypot(dx, dy) or 0.001
+        min_dist = ball_radius * 2.0
+        if dist < min_dist:
+            overlap = (min_dist - dist) + 12.0
+            ux, uy = dx / dist, dy / dist
+            p["x"] -= ux * overlap * 0.35
+            p["y"] -= uy * overlap * 0.35
+            other["x"] += ux * overlap * 0.9
+            other["y"] += uy * overlap * 0.9
+
+
+def old_step(room, dt):
+    for pid, p in room["players"].items():
+        target = p.pop("input", None)
+        if target is None or not p.get("alive", True):
+            continue
+        p["x"], p["y"] = target
+        old_resolve_collisions(room, pid)
+    r = max(room["min_radius"], room["arena_radius"] - room["shrink_speed"] * dt)
+    room["arena_radius"] = r
+    for p in room["players"].values():
+        if p["alive"] and math.hypot(p["x"], p["y"]) > r:
+            p["alive"] = False
+
+
+def spawns(rooms, n, seed):
+    """Oda başına n top, arenanın %80'lik diskine düzgün dağılmış."""
+    rnd = random.Random(seed)
+    radius = 200.0 * max(1.0, math.sqrt(n / 6.0))
+    out = []
+    for _ in range(rooms):
+        pts = []
+        for _ in range(n):
+            a, d = rnd.uniform(0, math.tau), radius * 0.8 * math.sqrt(rnd.random())
+            pts.append((d * math.cos(a), d * math.sin(a)))
+        out.append(pts)
+    return radius, out
+
+
+def make_rooms(rooms, n):
+    radius, pts = spawns(rooms, n, 1)
+    old, new = [], []
+    server.sumo_phys.update(server.sumo_phys_new())
+    for r in range(rooms):
+        ro, rn = server.make_sumo_room(f"o{r}"), server.make_sumo_room(f"n{r}")
+        server.sumo_phys_room_add(rn)
+        for i, (x, y) in enumerate(pts[r]):
+            ro["players"][f"p{i}"] = {"name": str(i), "x": x, "y": y, "alive": True, "wins": 0}
+            p = {"id": i, "name": str(i), "alive": True, "wins": 0}
+            rn["players"][f"p{i}"] = p
+            server.sumo_phys_add(rn, p, x, y)
+        for room in (ro, rn):
+            room["arena_radius"] = radius
+            room["min_radius"] = radius * 0.9     # ölçüm boyunca oda dolu kalsın
+            room["phase"] = "playing"
+        server.sumo_phys_room_set(rn, True)
+        old.append(ro)
+        new.append(rn)
+    return old, new
+
+
+def bench(rooms, n, steps):
+    old, new = make_rooms(rooms, n)
+    rnd = random.Random(3)
+    dt = 1 / server.SUMO_TICK_HZ
+    t_old = t_new = 0.0
+    for _ in range(steps):
+        moves = [[(rnd.uniform(-6, 6), rnd.uniform(-6, 6)) for _ in range(n)] for _ in range(rooms)]
+        for ro, rn, mv in zip(old, new, moves):
+            for p, q, (dx, dy) in zip(ro["players"].values(), rn["players"].values(), mv):
+                if p["alive"]:
+                    p["input"] = (p["x"] + dx, p["y"] + dy)
+                if q["alive"]:
+                    x, y = server.sumo_phys_xy(q)
+                    server.sumo_phys_input(q, x + dx, y + dy)
+        t = time.perf_counter()
+        for ro in old:
+            old_step(ro, dt)
+        t_old += time.perf_counter() - t
+        t = time.perf_counter()
+        server.sumo_step(dt)
+        t_new += time.perf_counter() - t
+    return t_old / steps * 1000, t_new / steps * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--players", type=int, nargs="+", default=[6, 12, 25, 50, 100, 200, 400, 1000])
+    parser.add_argument("--rooms", type=int, default=1, help="aynı anda ilerleyen oda sayısı")
+    parser.add_argument("--steps", type=int, default=30)
+    args = parser.parse_args()
+
+    bench(args.rooms, 6, 3)     # ısınma: NumPy'nin ilk çağrı maliyeti ölçüme girmesin
+    print(f"{'oda':>5} {'oyuncu':>6} {'tüm çiftler ms':>15} {'sweep ms':>9} {'hızlanma':>9}")
+    for n in args.players:
+        a, b = bench(args.rooms, n, args.steps)
+        print(f"{args.rooms:>5} {n:>6} {a:>15.3f} {b:>9.3f} {a / b:>8.1f}x", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Sumo Bash: yayın tick'i başına bayt, JSON state ile ikili snapshot karşılaştırması.
+
+Süreç içinde (soket yok) bir oda kurulur, fizik adımı elle sürülür ve her iki
+adımda bir (15 Hz) yayın kodlanır. İlk yarıda her oyuncu, ikinci yarıda
+oyuncuların üçte biri hareket eder. İkili boyutlara bağlantıya özel 4 baytlık
+kuyruk (son girdi seq'i) dahildir. Çözülen her kare sunucununkiyle karşılaştırılır.
+
+    python tests/bench_sumo_snapshot.py --players 2 6 50
+"""
+import argparse
+import json
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import server  # noqa: E402
+from test_sumo_snapshot import decode  # noqa: E402
+
+TAIL = server.SUMO_SNAP_TAIL.size
+
+
+def make_room(n):
+    server.sumo_phys.update(server.sumo_phys_new())
+    room = server.make_sumo_room("bench")
+    server.sumo_phys_room_add(room)
+    for i in range(n):
+        p = {"id": i, "name": f"Player{i}", "alive": True, "color": server.sumo_random_color(), "wins": 0}
+        room["players"][f"{i:08x}"] = p
+        server.sumo_phys_add(room, p, *server.sumo_random_spawn(room))
+    room["next_id"] = n
+    room["arena_radius"] = room["min_radius"] = server.sumo_start_radius(room)
+    room["phase"] = "playing"
+    server.sumo_phys_room_set(room, True)
+    return room
+
+
+def run(n, ticks, rnd):
+    room = make_room(n)
+    frames, acked = {}, None
+    sizes = {"json": [], "key": [], "delta": [], "delta 1/3": [], "lag 3": []}
+    for t in range(ticks):
+        share = 1.0 if t < ticks // 2 else 1 / 3
+        for p in room["players"].values():
+            if rnd.random() < share:
+                server.sumo_phys_queue_input(p, t + 1, rnd.uniform(-1, 1), rnd.uniform(-1, 1))
+        server.sumo_step(1 / server.SUMO_TICK_HZ)
+        room["tick"] += 1
+        if t % 2:
+            continue
+        sizes["json"].append(len(json.dumps(server.sumo_state_msg(room))))
+        frame = server.sumo_snap_frame(room)
+        data = server.sumo_snap_encode(room, frame, acked)
+        head, got = decode(data, frames)
+        assert got == frame
+        if acked is None:
+            sizes["key"].append(len(data) + TAIL)
+        else:
+            sizes["delta" if t < ticks // 2 else "delta 1/3"].append(len(data) + TAIL)
+        # ack'i 3 snapshot geriden gelen istemci
+        lag = room["snap_seq"] - 3
+        if lag in room["snap_hist"]:
+            sizes["lag 3"].append(len(server.sumo_snap_encode(room, frame, lag)) + TAIL)
+        acked = head["seq"]
+    return {k: sum(v) / len(v) for k, v in sizes.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--players", type=int, nargs="+", default=[2, 6, 50])
+    parser.add_argument("--ticks", type=int, default=120)
+    args = parser.parse_args()
+
+    rnd = random.Random(1)
+    print(f"{'oyuncu':>6} {'JSON':>7} {'keyframe':>9} {'delta':>7} {'delta 1/3':>10} {'ack 3 geri':>11}")
+    for n in args.players:
+        s = run(n, args.ticks, rnd)
+        print(f"{n:>6} {s['json']:>7.0f} {s['key']:>9.0f} {s['delta']:>7.0f} {s['delta 1/3']:>10.0f} {s['lag 3']:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""Tic Tac Toe: eşzamanlı 10k tahtada saniyedeki hamle, üç tahta gösterimiyle.
+
+Karşılaştırılanlar (her tahta aynı rastgele hamle sırasını oynar, ağ yok):
+  - eski oda dict'i: 9 elemanlı liste + 8 çizgilik döngüyle kazanan kontrolü
+  - bugünkü oda yolu: room["cells"] bytearray + ttt_line_win (NxN, k'lık sıra)
+  - turnuva slotları: ttt_boards maskeleri + ttt_board_move (TTT_WIN tablosu)
+Sonda 8192 oyunculu bir turnuva bellekteki motorla şampiyona kadar oynatılır.
+
+    python tests/bench_ttt_boards.py --boards 10000 --repeat 3
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import server  # noqa: E402
+
+OLD_WINS = ((0, 1, 2), (3, 4, 5), (6, 7, 8), (0, 3, 6), (1, 4, 7), (2, 5, 8), (0, 4, 8), (2, 4, 6))
+
+
+def old_winner(b):
+    for a, c, d in OLD_WINS:
+        if b[a] and b[a] == b[c] == b[d]:
+            return b[a]
+    if all(b):
+        return "draw"
+    return None
+
+
+def bench_old(orders):
+    rooms = [{"board": [None] * 9, "turn": "X"} for _ in orders]
+    pos, live, moves = [0] * len(orders), list(range(len(orders))), 0
+    t = time.perf_counter()
+    while live:
+        nxt = []
+        for i in live:
+            r = rooms[i]
+            idx = orders[i][pos[i]]
+            pos[i] += 1
+            if idx < 0 or idx > 8 or r["board"][idx]:
+                continue
+            r["board"][idx] = r["turn"]
+            r["turn"] = "O" if r["turn"] == "X" else "X"
+            moves += 1
+            if not old_winner(r["board"]):
+                nxt.append(i)
+        live = nxt
+    return moves / (time.perf_counter() - t), moves
+
+
+def bench_cells(orders):
+    """ttt_play'in tahta kısmı (yayın hariç): geçerlilik, taş, sıra, kazanan kontrolü."""
+    rooms = []
+    for _ in orders:
+        room = server.ttt_new_room()
+        server.ttt_reset_board(room)
+        rooms.append(room)
+    pos, live, moves = [0] * len(orders), list(range(len(orders))), 0
+    t = time.perf_counter()
+    while live:
+        nxt = []
+        for i in live:
+            room = rooms[i]
+            cells, n = room["cells"], room["size"]
+            idx = orders[i][pos[i]]
+            pos[i] += 1
+            if idx < 0 or idx >= n * n or cells[idx]:
+                continue
+            mark = room["turn"]
+            cells[idx] = server.TTT_MARK[mark]
+            room["filled"] += 1
+            room["last"] = idx
+            room["turn"] = "O" if mark == "X" else "X"
+            moves += 1
+            if not server.ttt_line_win(cells, n, room["k"], idx) and room["filled"] < n * n:
+                nxt.append(i)
+        live = nxt
+    return moves / (time.perf_counter() - t), moves
+
+
+def bench_slots(orders):
+    tour = server.ttt_tour_new("bench")
+    slots = [server.ttt_board_alloc(tour, 1, f"x{i}", f"o{i}") for i in range(len(orders))]
+    b = server.ttt_boards
+    pos, live, moves = [0] * len(orders), list(range(len(orders))), 0
+    t = time.perf_counter()
+    while live:
+        nxt = []
+        for i in live:
+            slot = slots[i]
+            pid = b["po"][slot] if b["turn"][slot] else b["px"][slot]
+            idx = orders[i][pos[i]]
+            pos[i] += 1
+            if server.ttt_board_move(slot, pid, idx) == "":
+                nxt.append(i)
+            moves += 1
+        live = nxt
+    elapsed = time.perf_counter() - t
+    for s in slots:
+        server.ttt_board_release(s)
+    return moves / elapsed, moves
+
+
+def bracket(players, rnd):
+    tour = server.ttt_tour_new("big")
+    for i in range(players):
+        tour["players"][f"p{i}"] = {"name": str(i), "ws": None, "slot": -1}
+    b = server.ttt_boards
+    t = time.perf_counter()
+    live = server.ttt_tour_start(tour)
+    peak, moves = len(live), 0
+    while live:
+        nxt = []
+        for slot in live:
+            both = b["x"][slot] | b["o"][slot]
+            pid = b["po"][slot] if b["turn"][slot] else b["px"][slot]
+            res = server.ttt_board_move(slot, pid, rnd.choice([k for k in range(9) if not both >> k & 1]))
+            moves += 1
+            if res == "":
+                nxt.append(slot)
+            elif res == "draw":
+                # berabere maç taşlar boşaltılarak yeniden oynanır
+                b["x"][slot] = b["o"][slot] = b["turn"][slot] = 0
+                nxt.append(slot)
+            else:
+                winner = b["px"][slot] if res == "X" else b["po"][slot]
+                node = b["node"][slot]
+                server.ttt_board_release(slot)
+                started = []
+                server.ttt_tour_settle(tour, node, winner, started)
+                nxt += started
+        live = nxt
+    return tour, moves, time.perf_counter() - t, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--boards", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--players", type=int, default=8192)
+    args = parser.parse_args()
+
+    rnd = random.Random(3)
+    orders = [rnd.sample(range(9), 9) for _ in range(args.boards)]
+    for name, fn in (("eski dict+liste", bench_old), ("oda cells", bench_cells), ("turnuva slotları", bench_slots)):
+        rate, moves = max(fn(orders) for _ in range(args.repeat))
+        print(f"{name:17s} {rate / 1e6:5.2f} M hamle/s  ({args.boards} tahta, {moves} hamle)")
+
+    tour, moves, elapsed, peak = bracket(args.players, rnd)
+    print(f"{args.players} oyunculu turnuva: {tour['phase']}, şampiyon {tour['champion']}, "
+          f"{moves} hamle {elapsed:.2f} s, en çok {peak} canlı tahta")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""Pixel War dev tuval yük testi: saniyedeki yerleştirme ve istemci başına bant genişliği.
+
+Sunucuyu (tek süreç uvicorn, geçici veri dizini) kendisi başlatır; her istemci
+256x192'lik bir görüş alanı izler ve her bekleme süresinde bir piksel koyar.
+Sonda 0. istemcinin diff'lerle kurduğu görüntü, taze bir abonenin snapshot'larıyla
+karşılaştırılır.
+
+    python tests/load_pixel_canvas.py --clients 300 --cooldown 1.0 --seconds 13
+    python tests/load_pixel_canvas.py --clients 500 --cooldown 0.25 --seconds 13
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+import zlib
+
+import websockets
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import server  # noqa: E402  (yalnızca biçim sabitleri için)
+
+W, H, CH = server.PIXEL_CANVAS_W, server.PIXEL_CANVAS_H, server.PIXEL_CHUNK
+VIEW_W, VIEW_H = 256, 192
+
+# PIXEL_COOLDOWN ortamdan okunmaz: sunucu süreci onu ayarlayıp uvicorn'u başlatır
+SERVE = """
+import sys, uvicorn
+sys.path.insert(0, {root!r})
+import server
+server.PIXEL_COOLDOWN = {cooldown}
+uvicorn.run(server.app, host="127.0.0.1", port={port}, log_level="warning", ws_max_queue=1024)
+"""
+
+
+def free_port():
+    s = socket.socket()
+    s.bind(("127.0.0.1", 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+
+def apply(board, m):
+    """İkili 'S' (parça snapshot'ı) ya da 'D' (diff blokları) frame'ini tahtaya uygular."""
+    if m[:1] == b"S":
+        cx, cy, w, h = server.PIXEL_SNAP_HEAD.unpack_from(m, 1)
+        raw = zlib.decompress(m[1 + server.PIXEL_SNAP_HEAD.size:])
+        for r in range(h):
+            at = (cy * CH + r) * W + cx * CH
+            board[at:at + w] = raw[r * w:(r + 1) * w]
+    elif m[:1] == b"D":
+        off = 3
+        for _ in range(int.from_bytes(m[1:3], "little")):
+            cx, cy, n = server.PIXEL_BLOCK_HEAD.unpack_from(m, off)
+            off += server.PIXEL_BLOCK_HEAD.size
+            for _ in range(n):
+                local, v = server.PIXEL_CELL.unpack_from(m, off)
+                off += server.PIXEL_CELL.size
+                board[(cy * CH + local // CH) * W + cx * CH + local % CH] = v
+
+
+async def member(url, name, vx, vy):
+    ws = await websockets.connect(url, max_size=None)
+    await ws.send(json.dumps({"type": "join", "roomId": "big", "name": name, "mode": "canvas"}))
+    await ws.send(json.dumps({"type": "view", "x": vx, "y": vy, "w": VIEW_W, "h": VIEW_H}))
+    return ws
+
+
+async def client(url, i, args, t_end, stats, keep):
+    rnd = random.Random(i)
+    vx, vy = rnd.randrange(200, 500), rnd.randrange(200, 500)
+    ws = await member(url, f"u{i}", vx, vy)
+    board = bytearray(W * H) if keep else None
+
+    async def rx():
+        async for m in ws:
+            if isinstance(m, bytes):
+                stats["bytes"] += len(m)
+                stats["msgs"] += 1
+                if m[:1] == b"S":
+                    stats["snap_bytes"] += len(m)
+                if keep:
+                    apply(board, m)
+
+    reader = asyncio.create_task(rx())
+    await asyncio.sleep(rnd.random() * args.cooldown)
+    while time.time() < t_end:
+        await ws.send(json.dumps({"type": "place", "x": vx + rnd.randrange(VIEW_W), "y": vy + rnd.randrange(VIEW_H),
+                                  "c": rnd.randrange(1, 17)}))
+        await asyncio.sleep(args.cooldown * 1.02)
+    await asyncio.sleep(0.5)
+    reader.cancel()
+    return ws, board, (vx, vy)
+
+
+def view_rows(board, vx, vy):
+    cx0, cy0, cx1, cy1 = vx // CH, vy // CH, (vx + VIEW_W - 1) // CH, (vy + VIEW_H - 1) // CH
+    x0, x1 = cx0 * CH, min(W, (cx1 + 1) * CH)
+    return [bytes(board[y * W + x0:y * W + x1]) for y in range(cy0 * CH, min(H, (cy1 + 1) * CH))], \
+        (cx1 - cx0 + 1) * (cy1 - cy0 + 1)
+
+
+async def fresh_view(url, vx, vy):
+    ws = await member(url, "check", vx, vy)
+    board = bytearray(W * H)
+    want = view_rows(board, vx, vy)[1]
+    while want:
+        m = await ws.recv()
+        if isinstance(m, bytes) and m[:1] == b"S":
+            apply(board, m)
+            want -= 1
+    await ws.close()
+    return view_rows(board, vx, vy)[0]
+
+
+async def run(url, port, args):
+    stats = {"bytes": 0, "msgs": 0, "snap_bytes": 0}
+    started = time.time()
+    t_end = started + 3 + args.seconds     # 3 s: bağlanma ve ilk snapshot'lar
+    res = await asyncio.gather(*(client(url, i, args, t_end, stats, i == 0) for i in range(args.clients)))
+    live = time.time() - started - 0.5
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/stats") as r:
+        room = next(x for x in json.load(r)["rooms"] if x["roomId"] == "big")
+    _, board, (vx, vy) = res[0]
+    same = view_rows(board, vx, vy)[0] == await fresh_view(url, vx, vy)
+    canvas, n = room["canvas"], args.clients
+    print(f"clients={n} cooldown={args.cooldown}s placed={canvas['placed']} ({canvas['placed'] / args.seconds:.0f}/s) "
+          f"rejected={canvas['cooldown']}")
+    print(f"  per client: {(stats['bytes'] - stats['snap_bytes']) / n / live / 1024:.1f} KiB/s diffs, "
+          f"{stats['snap_bytes'] / n / 1024:.1f} KiB snapshots once, {stats['msgs'] / n / live:.1f} frames/s")
+    print(f"  frames={canvas['frames']} fan-out avg/max ms={room['fanout']['avg_ms']}/{room['fanout']['max_ms']} "
+          f"client 0 view == fresh snapshot: {same}")
+    for ws, _, _ in res:
+        await ws.close()
+    return same
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=300)
+    parser.add_argument("--cooldown", type=float, default=1.0)
+    parser.add_argument("--seconds", type=float, default=13.0)
+    args = parser.parse_args()
+
+    port = free_port()
+    data = tempfile.mkdtemp(prefix="pixel-load-")
+    proc = subprocess.Popen([sys.executable, "-c", SERVE.format(root=ROOT, cooldown=args.cooldown, port=port)],
+                            env=dict(os.environ, PIXEL_DATA_DIR=data, CKPT_PATH=""))
+    try:
+        for _ in range(100):
+            try:
+                socket.create_connection(("127.0.0.1", port), 0.1).close()
+                break
+            except OSError:
+                time.sleep(0.1)
+        ok = asyncio.run(run(f"ws://127.0.0.1:{port}/ws/pixelwar", port, args))
+    finally:
+        proc.terminate()
+        proc.wait()
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
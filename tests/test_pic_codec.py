@@ -0,0 +1,126 @@
+"""Pictionary stroke codec: gidiş-dönüş ve eski segment biçimiyle boyut karşılaştırması.
+
+Sayıları görmek için: python -m pytest -s tests/test_pic_codec.py
+"""
+import json
+import math
+import os
+import random
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import server  # noqa: E402
+
+STROKES, POINTS = 60, 80    # "gerçekçi" çizim: 60 pen-down, her biri 80 fare örneği
+
+
+def drawing(seed=1):
+    """Yumuşak dönen, 800x560 tuvale sığan fare izleri (istemcinin gönderdiği gibi float)."""
+    rnd = random.Random(seed)
+    out = []
+    for _ in range(STROKES):
+        x, y = rnd.uniform(80, 720), rnd.uniform(80, 480)
+        angle, pts = rnd.uniform(0, 2 * math.pi), []
+        for _ in range(POINTS):
+            angle += rnd.gauss(0, 0.25)
+            x = min(799.0, max(0.0, x + math.cos(angle) * rnd.uniform(2, 7)))
+            y = min(559.0, max(0.0, y + math.sin(angle) * rnd.uniform(2, 7)))
+            pts.append((x * 1.0638297872340425, y * 1.0638297872340425))  # CSS -> tuval ölçeği
+        out.append((rnd.choice(["#000000", "#e11d48", "#2563eb", "#16a34a"]), rnd.choice([2, 4, 8]), pts))
+    return out
+
+
+def old_format(draw):
+    """Eski depo / tel biçimi: her fare hareketi ayrı {x0,y0,x1,y1,w,c} dict'i."""
+    return [{"x0": a[0], "y0": a[1], "x1": b[0], "y1": b[1], "w": w, "c": c}
+            for c, w, pts in draw for a, b in zip(pts, pts[1:])]
+
+
+def new_room(draw, simplify=True):
+    """Aynı çizim yeni depoda: pen_down + pen_move deltaları, isteğe bağlı pen_up sadeleştirmesi."""
+    room = {"version": 0, "strokes": [], "pen": None}
+    for c, w, pts in draw:
+        q = [(int(round(x)), int(round(y))) for x, y in pts]
+        s = server.pic_add_stroke(room, q[0][0], q[0][1], w, c)
+        server.pic_extend_stroke(room, s, server.pic_encode_points(q)[2:])
+        if simplify:    # pic_finish_stroke'un depodaki kopyaya yaptığı
+            s["p"] = server.pic_encode_points(server.pic_simplify(server.pic_decode_points(s["p"]),
+                                                                   server.PIC_SIMPLIFY_EPS))
+    return room
+
+
+def decoded_bytes(text):
+    """json.loads sonrası bellekte tutulan bayt (tracemalloc)."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    obj = json.loads(text)
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del obj
+    return size
+
+
+def test_points_round_trip():
+    rnd = random.Random(7)
+    for n in (1, 2, 3, 50, 4096):
+        pts = [(rnd.randrange(-5, 900), rnd.randrange(-5, 600)) for _ in range(n)]
+        p = server.pic_encode_points(pts)
+        assert len(p) == 2 * n
+        assert server.pic_decode_points(p) == pts
+
+
+def test_stroke_extends_with_deltas():
+    room = {"version": 0, "strokes": [], "pen": None}
+    pts = [(10, 10), (12, 11), (15, 15), (15, 20)]
+    s = server.pic_add_stroke(room, 10, 10, 4, "#123456")
+    assert server.pic_extend_stroke(room, s, server.pic_encode_points(pts)[2:])
+    assert server.pic_decode_points(s["p"]) == pts
+    assert s["ver"] == room["version"] == 2
+
+
+def test_legacy_segments_follow_polyline():
+    room = {"version": 0, "strokes": [], "pen": None}
+    pts = [(0, 0), (3, 4), (6, 4), (9, 0)]
+    s = server.pic_add_stroke(room, 0, 0, 2, "#000", server.pic_encode_points(pts)[2:])
+    segs = server.pic_stroke_segments(s)
+    assert [(g["x0"], g["y0"], g["x1"], g["y1"]) for g in segs] == [(0, 0, 3, 4), (3, 4, 6, 4), (6, 4, 9, 0)]
+    # tek noktalı stroke: sıfır uzunluklu tek segment (nokta)
+    dot = server.pic_add_stroke(room, 5, 5, 2, "#000")
+    assert [(g["x0"], g["y0"], g["x1"], g["y1"]) for g in server.pic_stroke_segments(dot)] == [(5, 5, 5, 5)]
+
+
+def test_simplify_keeps_shape():
+    pts = [(i, round(40 * math.sin(i / 15.0))) for i in range(300)]
+    eps = 0.75
+    kept = server.pic_simplify(pts, eps)
+    assert kept[0] == pts[0] and kept[-1] == pts[-1]
+    assert len(kept) < len(pts) // 3
+    # atılan her nokta, kalan polyline'a eps'ten yakın
+    for x, y in pts:
+        best = min(_dist(x, y, a, b) for a, b in zip(kept, kept[1:]))
+        assert best <= eps + 1e-9
+
+
+def _dist(x, y, a, b):
+    (ax, ay), (bx, by) = a, b
+    dx, dy = bx - ax, by - ay
+    ll = dx * dx + dy * dy
+    t = 0.0 if ll == 0 else max(0.0, min(1.0, ((x - ax) * dx + (y - ay) * dy) / ll))
+    return math.hypot(x - (ax + t * dx), y - (ay + t * dy))
+
+
+def test_snapshot_size_against_segment_format():
+    draw = drawing()
+    old = json.dumps({"type": "state", "strokes": old_format(draw)})
+    raw = json.dumps({"type": "state", "strokes": new_room(draw, simplify=False)["strokes"]}, separators=(",", ":"))
+    new = json.dumps({"type": "state", "strokes": new_room(draw)["strokes"]}, separators=(",", ":"))
+    old_mem, new_mem = decoded_bytes(old), decoded_bytes(new)
+    print(f"\n{STROKES} stroke x {POINTS} nokta")
+    print(f"  eski segment JSON     : {len(old) / 1024:8.1f} KB  (bellekte {old_mem / 1024:8.1f} KB)")
+    print(f"  kompakt, sadeleşmemiş : {len(raw) / 1024:8.1f} KB")
+    print(f"  kompakt + pen_up DP   : {len(new) / 1024:8.1f} KB  (bellekte {new_mem / 1024:8.1f} KB)")
+    assert len(raw) * 5 < len(old)
+    assert len(new) * 20 < len(old)
+    assert new_mem * 10 < old_mem
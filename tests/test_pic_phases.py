@@ -0,0 +1,69 @@
+"""Pictionary faz zamanlayıcısı: çizen ayrılınca eski fazın deadline'ı çarkta
+kurulu kalmamalı (soket yok, sahte bağlantılar)."""
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import server  # noqa: E402
+
+
+class FakeWS:
+    def __init__(self, pid):
+        self.state_pid = pid
+        self.sent = []
+
+    async def send_text(self, msg):
+        self.sent.append(msg)
+
+
+def make_room(room_id, n):
+    room = server.pic_room(room_id)
+    for i in range(n):
+        ws = FakeWS(f"{room_id}-{i}")
+        room["clients"].add(ws)
+        room["ws_by_pid"][ws.state_pid] = ws
+        room["players"][ws.state_pid] = {"name": str(i), "score": 0}
+        room["drawer_order"].append(ws.state_pid)
+    return room
+
+
+def armed():
+    return server.timer_wheel["pending"]
+
+
+def test_drawer_leave_leaves_no_timer_armed():
+    async def main():
+        before = armed()
+
+        # 2 kişi: çizen çıkınca oda boşta kalır, hiç deadline kurulu olmamalı
+        room = make_room("duo", 2)
+        await server.pic_start_round("duo")
+        await server.pic_phase_step("duo")              # seçim süresi doldu -> drawing
+        assert room["phase"] == "drawing" and armed() == before + 1
+        stale = room["timer"]
+        await server.pic_leave("duo", room["current_drawer"])
+        assert room["phase"] == "idle"
+        assert room["timer"] is None and room["deadline"] is None
+        assert not stale[3]
+        assert armed() == before
+
+        # 3 kişi: tur yeniden başlar; yalnızca yeni seçim deadline'ı kurulu olur
+        room = make_room("trio", 3)
+        await server.pic_start_round("trio")
+        await server.pic_phase_step("trio")
+        stale, drawer = room["timer"], room["current_drawer"]
+        await server.pic_leave("trio", drawer)
+        assert room["phase"] == "choosing" and room["current_drawer"] != drawer
+        assert not stale[3] and room["timer"][3]
+        assert armed() == before + 1
+
+        # son oyuncular da çıkınca oda silinir, çark boşalır
+        for pid in list(room["players"]):
+            await server.pic_leave("trio", pid)
+        await server.pic_leave("duo", next(iter(server.pic_rooms["duo"]["players"])))
+        assert "trio" not in server.pic_rooms and "duo" not in server.pic_rooms
+        assert armed() == before
+
+    asyncio.run(main())
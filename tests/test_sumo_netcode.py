@@ -0,0 +1,116 @@
+"""Sumo Bash netcode: tahmin / uzlaştırma, hız sınırı ve gecikme telafisi,
+süreç içinde simüle edilmiş gecikmeyle (soket yok, fizik adımı elle sürülür).
+
+Sayıları görmek için: python -m pytest -s tests/test_sumo_netcode.py
+"""
+import math
+import os
+import random
+import sys
+from collections import deque
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import server  # noqa: E402
+
+DT = 1 / server.SUMO_TICK_HZ
+STEP = server.SUMO_MAX_SPEED * DT      # adım başına en fazla yol (px)
+
+
+@pytest.fixture(autouse=True)
+def fresh_physics():
+    server.sumo_phys.update(server.sumo_phys_new())
+
+
+def arena(*xy):
+    """Oyunda bir oda; oyuncular verilen konumlarda, arena küçülmez."""
+    room = server.make_sumo_room("t")
+    server.sumo_phys_room_add(room)
+    players = []
+    for i, (x, y) in enumerate(xy):
+        p = {"id": i, "name": f"P{i}", "alive": True, "wins": 0}
+        room["players"][f"p{i}"] = p
+        server.sumo_phys_add(room, p, x, y)
+        players.append(p)
+    room["arena_radius"] = room["min_radius"] = 400.0
+    room["phase"] = "playing"
+    server.sumo_phys_room_set(room, True)
+    return room, players
+
+
+def test_prediction_matches_server_under_latency():
+    """İstemci her tick bir girdi üretip yerel tahmin yapar; girdiler ve snapshot'lar
+    4 tick gecikmeyle taşınır. Onaylanan her seq'te tahmin sunucuyla aynı olmalı."""
+    room, (me, _) = arena((0, 0), (0, 300))
+    lat, up, down = 4, deque(), deque()
+    rnd = random.Random(1)
+    seq, pred, pending, predicted_at, errs = 0, [0.0, 0.0], [], {}, []
+    for t in range(200):
+        seq += 1
+        dx, dy = rnd.uniform(-1, 1), rnd.uniform(-1, 1)
+        n = max(1.0, math.hypot(dx, dy))
+        dx, dy = dx / n, dy / n
+        pred[0] += dx * STEP
+        pred[1] += dy * STEP
+        pending.append((seq, dx, dy))
+        predicted_at[seq] = tuple(pred)
+        up.append((t + lat, (seq, dx, dy)))
+        while up and up[0][0] <= t:
+            _, (s, x, y) = up.popleft()
+            server.sumo_phys_queue_input(me, s, x, y)
+        server.sumo_step(DT)
+        down.append((t + lat, server.sumo_state_msg(room)))
+        while down and down[0][0] <= t:
+            _, msg = down.popleft()
+            snap = msg["players"]["p0"]
+            ack = snap["seq"]
+            if not ack:
+                continue
+            errs.append(math.hypot(predicted_at[ack][0] - snap["x"], predicted_at[ack][1] - snap["y"]))
+            # uzlaştırma: yetkili konum + onaylanmamış girdilerin yeniden oynatılması
+            pending = [p for p in pending if p[0] > ack]
+            pred = [snap["x"] + sum(p[1] for p in pending) * STEP, snap["y"] + sum(p[2] for p in pending) * STEP]
+    print(f"\nuzlaştırma: {len(errs)} snapshot, en büyük |tahmin - sunucu| = {max(errs):.3g} px")
+    assert len(errs) > 180
+    assert max(errs) < 1e-9
+
+
+def test_speed_is_bounded():
+    room, (a, b) = arena((0, 0), (0, 300))
+    server.sumo_phys_queue_input(a, 1, 50, 0)       # aşırı büyük yön vektörü
+    server.sumo_step(DT)
+    assert server.sumo_phys_xy(a)[0] == pytest.approx(STEP)
+    sx = server.sumo_phys_xy(b)[0]
+    server.sumo_phys_input(b, 1000, 300)            # eski "move": ışınlanma yok
+    server.sumo_step(DT)
+    assert server.sumo_phys_xy(b)[0] - sx == pytest.approx(STEP)
+
+
+def test_duplicate_seq_is_ignored():
+    room, (a, _) = arena((0, 0), (0, 300))
+    assert server.sumo_phys_queue_input(a, 1, 1, 0)
+    assert not server.sumo_phys_queue_input(a, 1, 1, 0)
+    assert not server.sumo_phys_queue_input(a, 0, 1, 0)
+
+
+def dash_displacement(lag_ticks):
+    """B 6 tick boyunca kaçar; A, B'yi gördüğü yere (lag_ticks önce) atılır."""
+    room, (a, b) = arena((0, 0), (40, 0))
+    for i in range(6):
+        server.sumo_phys_queue_input(b, i + 1, 0, 1)
+        server.sumo_step(DT)
+    server.sumo_phys["lag"][a["slot"]] = lag_ticks
+    before = server.sumo_phys_xy(b)
+    server.sumo_phys_queue_input(a, 1, 1, 0)
+    server.sumo_step(DT)
+    after = server.sumo_phys_xy(b)
+    return math.hypot(after[0] - before[0], after[1] - before[1])
+
+
+def test_lag_compensated_hit():
+    now, seen = dash_displacement(0), dash_displacement(6)
+    print(f"\nA'nın atılmasıyla B'nin yer değiştirmesi: gecikme 0 -> {now:.2f} px, gecikme 6 -> {seen:.2f} px")
+    assert now == 0.0
+    assert seen > 5.0
@@ -0,0 +1,137 @@
+"""Sumo Bash ikili snapshot'ları: kodla / çöz gidiş-dönüşü ve bağlantı başına
+biçim seçimi (snap:"bin" istemeyen bağlantı JSON state almaya devam eder).
+
+Kod çözücü sunucunun biçim sabitlerini kullanır; keyframe, delta (int8 ve
+int16 kayıtlar) ve GONE kayıtlarının hepsi sınanır.
+"""
+import asyncio
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import server  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def fresh_physics():
+    server.sumo_phys.update(server.sumo_phys_new())
+
+
+def arena(*xy):
+    room = server.make_sumo_room("t")
+    server.sumo_phys_room_add(room)
+    players = []
+    for i, (x, y) in enumerate(xy):
+        p = {"id": i, "name": f"P{i}", "alive": True, "wins": 0}
+        room["players"][f"p{i}"] = p
+        server.sumo_phys_add(room, p, x, y)
+        players.append(p)
+    room["phase"] = "playing"
+    return room, players
+
+
+def decode(data, frames):
+    """Frame'i (kuyruksuz) çözer: başlık alanları ve id -> (qx, qy, alive) karesi."""
+    kind, phase, seq, base, tick, radius, n, _ = server.SUMO_SNAP_HEAD.unpack_from(data, 0)
+    off = server.SUMO_SNAP_HEAD.size
+    cur = {} if kind == server.SUMO_SNAP_KEY else dict(frames[base])
+    for _ in range(n):
+        pid, flags = server.SUMO_SNAP_REC.unpack_from(data, off)
+        off += server.SUMO_SNAP_REC.size
+        if flags & server.SUMO_FLAG_GONE:
+            del cur[pid]
+        elif flags & server.SUMO_FLAG_SMALL:
+            dx, dy = server.SUMO_SNAP_DXY.unpack_from(data, off)
+            off += server.SUMO_SNAP_DXY.size
+            cur[pid] = (frames[base][pid][0] + dx, frames[base][pid][1] + dy, bool(flags & server.SUMO_FLAG_ALIVE))
+        else:
+            x, y = server.SUMO_SNAP_XY.unpack_from(data, off)
+            off += server.SUMO_SNAP_XY.size
+            cur[pid] = (x, y, bool(flags & server.SUMO_FLAG_ALIVE))
+    assert off == len(data)
+    frames[seq] = cur
+    return {"kind": kind, "phase": phase, "seq": seq, "base": base, "tick": tick, "radius": radius, "n": n}, cur
+
+
+def move(p, x, y):
+    server.sumo_phys["pos"][p["slot"]] = (x, y)
+
+
+def test_round_trip_keyframe_and_delta():
+    room, (a, b, c) = arena((0, 0), (50, 0), (-50, 20))
+    room["tick"] = 7
+    frames = {}
+
+    key = server.sumo_snap_encode(room, server.sumo_snap_frame(room), None)
+    head, got = decode(key, frames)
+    assert server.SUMO_SNAP_HEAD.size == 22
+    assert len(key) == 22 + 3 * (server.SUMO_SNAP_REC.size + server.SUMO_SNAP_XY.size)
+    assert (head["kind"], head["seq"], head["base"], head["tick"]) == (server.SUMO_SNAP_KEY, 1, 0, 7)
+    assert head["phase"] == server.SUMO_PHASE_CODES["playing"]
+    assert head["radius"] == 200 * server.SUMO_SNAP_SCALE
+    assert got == {0: (0, 0, True), 1: (200, 0, True), 2: (-200, 80, True)}
+
+    # a küçük adım (int8), b uzağa sıçrar (int16), c ayrılır (GONE), d yeni gelir
+    move(a, 1.25, -2.0)
+    move(b, 150.0, 0.0)
+    server.sumo_phys_free(c)
+    del room["players"]["p2"]
+    d = {"id": 3, "name": "P3", "alive": True, "wins": 0}
+    room["players"]["p3"] = d
+    server.sumo_phys_add(room, d, 10, 10)
+    d["alive"] = False
+    frame = server.sumo_snap_frame(room)
+    delta = server.sumo_snap_encode(room, frame, 1)
+    head, got = decode(delta, frames)
+    assert (head["kind"], head["seq"], head["base"], head["n"]) == (server.SUMO_SNAP_DELTA, 2, 1, 4)
+    assert got == frame == {0: (5, -8, True), 1: (600, 0, True), 3: (40, 40, False)}
+
+    # geçmişte olmayan taban keyframe'e düşer
+    head, got = decode(server.sumo_snap_encode(room, frame, 999), frames)
+    assert head["kind"] == server.SUMO_SNAP_KEY and got == frame
+
+
+class FakeWS:
+    def __init__(self, binary):
+        self.sumo_bin = binary
+        self.sumo_ack = None
+        self.texts, self.blobs = [], []
+
+    async def send_text(self, msg):
+        self.texts.append(json.loads(msg))
+
+    async def send_bytes(self, msg):
+        self.blobs.append(msg)
+
+
+def test_format_is_negotiated_per_connection():
+    room, (a, b) = arena((0, 0), (50, 0))
+    a["ws"], b["ws"] = FakeWS(False), FakeWS(True)
+    asyncio.run(server.sumo_push_state(room))
+
+    assert [m["type"] for m in a["ws"].texts] == ["state"]
+    assert set(a["ws"].texts[0]["players"]) == {"p0", "p1"}
+    assert not a["ws"].blobs
+    assert [m["type"] for m in b["ws"].texts] == ["roster"]
+    assert len(b["ws"].blobs) == 1
+
+    frames = {}
+    blob = b["ws"].blobs[0]
+    tail = server.SUMO_SNAP_TAIL.size
+    head, got = decode(blob[:-tail], frames)
+    assert head["kind"] == server.SUMO_SNAP_KEY
+    assert got == {0: (0, 0, True), 1: (200, 0, True)}
+
+    # onaylanan tabana göre delta; roster yalnızca full yayında gider
+    b["ws"].sumo_ack = head["seq"]
+    move(a, 2.0, 0.0)
+    asyncio.run(server.sumo_push_state(room, full=False))
+    assert [m["type"] for m in a["ws"].texts] == ["state", "state"]
+    assert len(b["ws"].texts) == 1
+    head, got = decode(b["ws"].blobs[1][:-tail], frames)
+    assert (head["kind"], head["base"], head["n"]) == (server.SUMO_SNAP_DELTA, 1, 1)
+    assert got == {0: (8, 0, True), 1: (200, 0, True)}